@@ -0,0 +1,102 @@
+# benchmarks/bench_breakpoints.py
+"""Micro-benchmark for the TTS breakpoint splitter.
+
+Compares `narratorx.tts._split_on_breakpoints` with the previous implementation, which rebuilt
+the chunk string for every word and rescanned it for every breakpoint, on synthetic run-on
+text in every language that has conjunction breakpoints. Both must return the same chunks.
+
+    python benchmarks/bench_breakpoints.py --words 200000 --max-chars 250 1000 4000
+"""
+
+import argparse
+import random
+import time
+
+from narratorx.tts import _split_on_breakpoints, language_breakpoints
+
+FILLER = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor".split()
+
+
+def reference_split(text, max_chars, breakpoints):
+    """The splitting loop of `split_by_natural_breakpoints` before it was made linear."""
+    words = text.split()
+    chunks = []
+    current_chunk = ""
+
+    for word in words:
+        tentative = (current_chunk + " " + word).strip() if current_chunk else word
+        if len(tentative) <= max_chars:
+            current_chunk = tentative
+        else:
+            if any(bp in current_chunk for bp in breakpoints):
+                for bp in breakpoints:
+                    if bp in current_chunk:
+                        parts = current_chunk.rsplit(bp, 1)
+                        if not parts[0].endswith(bp):
+                            parts[0] += bp
+                        chunks.append(parts[0].strip())
+                        current_chunk = (parts[1] + " " + word).strip()
+                        break
+            else:
+                chunks.append(current_chunk.strip())
+                current_chunk = word
+
+    if current_chunk:
+        chunks.append(current_chunk.strip())
+    return chunks
+
+
+def synthetic_text(language, words, seed=0):
+    """Builds one long unpunctuated run of text, like a sentence OCR failed to break up."""
+    rng = random.Random(seed)
+    conjunctions = [bp.strip() for bp in language_breakpoints[language]]
+    out = []
+    for _ in range(words):
+        roll = rng.random()
+        if roll < 0.03:
+            out.append(rng.choice(conjunctions))
+        elif roll < 0.04:
+            out.append(rng.choice(FILLER) + rng.choice(",;:"))
+        else:
+            out.append(rng.choice(FILLER))
+    return " ".join(out)
+
+
+def best_of(repeat, fn, *args):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--words", type=int, default=100000, help="Words per language.")
+    parser.add_argument("--max-chars", type=int, nargs="+", default=[250, 1000, 4000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(
+        f"{'language':<10}{'max_chars':>10}{'chunks':>9}"
+        f"{'before s':>11}{'after s':>10}{'speedup':>9}"
+    )
+    for language in language_breakpoints:
+        text = synthetic_text(language, args.words)
+        breakpoints = language_breakpoints[language] + [",", ";", ":"]
+        for max_chars in args.max_chars:
+            before, expected = best_of(args.repeat, reference_split, text, max_chars, breakpoints)
+            after, chunks = best_of(
+                args.repeat, _split_on_breakpoints, text, max_chars, breakpoints
+            )
+            if chunks != expected:
+                raise AssertionError(f"Chunk boundaries differ for {language}, {max_chars}")
+            print(
+                f"{language:<10}{max_chars:>10}{len(chunks):>9}{before:>11.3f}{after:>10.3f}"
+                f"{before / after:>8.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# benchmarks/bench_render.py
+"""Benchmark for adaptive page rendering ahead of OCR.
+
+Renders every page of the sample documents the way OCR input used to be rendered (PyMuPDF's
+default 72 dpi, RGB, whole page) and with `narratorx.ocr.render_page`, and compares the size
+of the images, both as rendered and as Surya sees them after converting them to RGB. With
+`--ocr`, both renderings also go through Surya and their text is scored against the page's
+embedded text layer, to check that accuracy is preserved.
+
+    python benchmarks/bench_render.py --ocr
+"""
+
+import argparse
+import difflib
+import time
+
+import pymupdf
+from PIL import Image
+
+from narratorx.ocr import RenderSettings, get_ocr_models, render_page, run_page_ocr
+
+SAMPLES = [("tests/docs/sample_en.pdf", "en"), ("tests/docs/sample_tr.pdf", "tr")]
+
+
+def default_render(page):
+    """How pages were rasterized before rendering became adaptive."""
+    pix = page.get_pixmap()
+    return Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+
+
+def similarity(text, reference):
+    """Returns how close `text` is to `reference`, ignoring whitespace, between 0 and 1."""
+    return difflib.SequenceMatcher(
+        None, " ".join(text.split()), " ".join(reference.split())
+    ).ratio()
+
+
+def ocr_text(images, language, ocr_models):
+    predictions = run_page_ocr(images, language, ocr_models)
+    return ["\n".join(line.text for line in prediction.text_lines) for prediction in predictions]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ocr", action="store_true", help="Also compare OCR accuracy.")
+    parser.add_argument("--min-dpi", type=int, default=RenderSettings().min_dpi)
+    parser.add_argument("--max-dpi", type=int, default=RenderSettings().max_dpi)
+    args = parser.parse_args()
+    settings = RenderSettings(min_dpi=args.min_dpi, max_dpi=args.max_dpi)
+    ocr_models = get_ocr_models() if args.ocr else None
+
+    header = (
+        f"{'document':<16}{'page':>5}{'dpi':>5}{'mode':>6}{'before MB':>11}{'after MB':>10}"
+        f"{'as RGB':>8}"
+    )
+    if args.ocr:
+        header += f"{'before acc':>12}{'after acc':>11}"
+    print(header)
+    totals = [0, 0, 0]
+    for pdf_path, language in SAMPLES:
+        with pymupdf.open(pdf_path) as doc:
+            for page in doc:
+                started = time.perf_counter()
+                before = default_render(page)
+                after, render = render_page(page, settings)
+                before_bytes = len(before.tobytes())
+                after_bytes = len(after.tobytes())
+                totals[0] += before_bytes
+                rgb_bytes = after.width * after.height * 3
+                totals[1] += after_bytes
+                totals[2] += rgb_bytes
+                line = (
+                    f"{pdf_path.rsplit('/', 1)[-1]:<16}{page.number:>5}{render.dpi:>5}"
+                    f"{after.mode:>6}{before_bytes / 1e6:>11.2f}{after_bytes / 1e6:>10.2f}"
+                    f"{rgb_bytes / 1e6:>8.2f}"
+                )
+                if args.ocr:
+                    reference = page.get_text("text")
+                    texts = ocr_text([before, after], language, ocr_models)
+                    line += f"{similarity(texts[0], reference):>12.3f}"
+                    line += f"{similarity(texts[1], reference):>11.3f}"
+                line += f"  ({time.perf_counter() - started:.2f}s)"
+                print(line)
+    print(
+        f"total image MB: before {totals[0] / 1e6:.2f}, after {totals[1] / 1e6:.2f}, "
+        f"after as RGB {totals[2] / 1e6:.2f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# benchmarks/bench_startup.py
+"""Startup benchmark for the narratorx command line.
+
+Times `import narratorx.cli` and `narratorx --help` in fresh interpreters, and lists any heavy
+dependency (torch, Coqui TTS, Surya, litellm, Streamlit, NLTK) that got imported on the way.
+None of them should be: they are loaded by the stage that needs them.
+
+    python benchmarks/bench_startup.py --repeat 10
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ["torch", "TTS", "surya", "litellm", "streamlit", "nltk"]
+
+IMPORT_CHECK = (
+    "import sys, narratorx.cli; "
+    f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+)
+
+
+def best_of(repeat, args):
+    """Returns the fastest wall-clock time of `repeat` runs of `args` and the last output."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = subprocess.run(args, capture_output=True, text=True, check=True)
+        best = min(best, time.perf_counter() - started)
+    return best, result.stdout
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    baseline, _ = best_of(args.repeat, [sys.executable, "-c", "pass"])
+    import_time, loaded = best_of(args.repeat, [sys.executable, "-c", IMPORT_CHECK])
+    help_time, _ = best_of(args.repeat, [sys.executable, "-m", "narratorx.cli", "--help"])
+
+    print(f"{'interpreter':<24}{baseline:>8.3f}s")
+    print(f"{'import narratorx.cli':<24}{import_time:>8.3f}s")
+    print(f"{'narratorx --help':<24}{help_time:>8.3f}s")
+    print(f"heavy modules imported: {loaded.strip() or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
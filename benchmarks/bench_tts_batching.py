@@ -0,0 +1,109 @@
+# benchmarks/bench_tts_batching.py
+"""Benchmark for batched XTTS synthesis.
+
+Splits the text layer of the sample documents into TTS chunks, groups the chunks of each
+synthesis window into batches the way `narratorx.tts.synthesize_batch` does, and reports the
+batch occupancy (chunks per batch) and the share of padding tokens. Grouping only chunks of
+exactly equal token length, as batching first did, is shown for comparison. With
+`--synthesize`, the first chunks are also synthesized at every batch size and timed.
+
+    python benchmarks/bench_tts_batching.py --batch-sizes 1 4 8 --synthesize 32
+"""
+
+import argparse
+import time
+
+import pymupdf
+
+from narratorx.ocr import extract_native_text
+from narratorx.tts import (
+    BATCH_WINDOW,
+    batch_by_length,
+    get_conditioning,
+    get_tts_model,
+    split_text_into_chunks,
+    synthesize_batch,
+)
+
+SAMPLES = [("tests/docs/sample_en.pdf", "en"), ("tests/docs/sample_tr.pdf", "tr")]
+
+
+def batch_by_equal_length(lengths, batch_size):
+    """How chunks were grouped before padding: only exactly equal token lengths together."""
+    groups = {}
+    for index, length in enumerate(lengths):
+        groups.setdefault(length, []).append(index)
+    return [
+        group[start : start + batch_size]
+        for group in groups.values()
+        for start in range(0, len(group), batch_size)
+    ]
+
+
+def occupancy(lengths, batch_size, grouping):
+    """Returns the mean chunks per batch and the share of padding tokens over all windows."""
+    window = batch_size * BATCH_WINDOW
+    batches = padded = 0
+    for start in range(0, len(lengths), window):
+        window_lengths = lengths[start : start + window]
+        for batch in grouping(window_lengths, batch_size):
+            width = max(window_lengths[index] for index in batch)
+            padded += sum(width - window_lengths[index] for index in batch)
+            batches += 1
+    return len(lengths) / batches, padded / (sum(lengths) + padded)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--max-chars", type=int, default=290, help="TTS chunk length.")
+    parser.add_argument(
+        "--synthesize", type=int, default=0, help="Chunks to synthesize at each batch size."
+    )
+    args = parser.parse_args()
+    tts_model = get_tts_model()
+    xtts = tts_model.synthesizer.tts_model
+
+    print(
+        f"{'document':<16}{'batch':>6}{'chunks':>8}{'equal occ':>11}{'similar occ':>13}"
+        f"{'padding':>9}"
+    )
+    for pdf_path, language in SAMPLES:
+        with pymupdf.open(pdf_path) as doc:
+            text = "\n".join(extract_native_text(page) for page in doc)
+        chunks = [
+            chunk.strip()
+            for chunk in split_text_into_chunks(text, args.max_chars, language=language)
+            if chunk.strip()
+        ]
+        lengths = [len(xtts.tokenizer.encode(chunk.lower(), lang=language)) for chunk in chunks]
+        for batch_size in args.batch_sizes:
+            equal, _ = occupancy(lengths, batch_size, batch_by_equal_length)
+            similar, padding = occupancy(lengths, batch_size, batch_by_length)
+            print(
+                f"{pdf_path.rsplit('/', 1)[-1]:<16}{batch_size:>6}{len(chunks):>8}"
+                f"{equal:>11.2f}{similar:>13.2f}{padding:>9.1%}"
+            )
+
+        if args.synthesize:
+            conditioning = get_conditioning(tts_model)
+            sample = chunks[: args.synthesize]
+            for batch_size in args.batch_sizes:
+                started = time.perf_counter()
+                for start in range(0, len(sample), batch_size * BATCH_WINDOW):
+                    synthesize_batch(
+                        tts_model,
+                        sample[start : start + batch_size * BATCH_WINDOW],
+                        language,
+                        batch_size=batch_size,
+                        conditioning=conditioning,
+                    )
+                elapsed = time.perf_counter() - started
+                print(
+                    f"  batch size {batch_size}: {elapsed:.1f}s for {len(sample)} chunks "
+                    f"({elapsed / len(sample):.2f}s per chunk)"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# narratorx/cache.py
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LLM_CACHE_BYTES = 256 * 1024 * 1024
+
+
+def make_cache_key(*parts) -> str:
+    """Hashes the given parts into a stable, content-addressed cache key."""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """Persistent key-value store backed by SQLite, bounded in size with LRU eviction.
+
+    The cache is safe to share between threads. Hits and misses are counted for the lifetime of
+    the object and reported by `stats()`."""
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_LLM_CACHE_BYTES):
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be a positive integer.")
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._last_access = 0.0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+            "last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)"
+        )
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()[0]
+
+    def _now(self) -> float:
+        # Strictly increasing within the process, so back-to-back accesses keep their order
+        self._last_access = max(time.time(), self._last_access + 1e-6)
+        return self._last_access
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Returns the value stored under `key`, or None on a miss."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE entries SET last_access = ? WHERE key = ?", (self._now(), key)
+            )
+            self.hits += 1
+            return bytes(row[0])
+
+    def put(self, key: str, value: bytes):
+        """Stores `value` under `key`, evicting the least recently used entries if needed."""
+        if len(value) > self.max_bytes:
+            logger.warning(f"Not caching a {len(value)} byte entry larger than the cache itself.")
+            return
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, sqlite3.Binary(value), len(value), self._now()),
+            )
+            self._total_bytes += len(value) - (old[0] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Other processes may share the file, so recount before deciding what to drop
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()[0]
+        excess = self._total_bytes - self.max_bytes
+        if excess <= 0:
+            return
+
+        evicted = []
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY last_access"):
+            evicted.append(key)
+            excess -= size
+            self._total_bytes -= size
+            if excess <= 0:
+                break
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k in evicted])
+        logger.debug(f"Evicted {len(evicted)} entries from {self.path}")
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters and the current size of the cache."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": entries,
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,124 @@
+# narratorx/checkpoint.py
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 3
+STAGES = ("ocr", "llm", "tts")
+
+
+def file_digest(path: str) -> str:
+    """Returns the sha256 of a file, used to tie a run directory to its input PDF."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _source_digest(source: str) -> bytes:
+    """Returns the sha256 of the input a unit was made from, stored with the unit."""
+    return hashlib.sha256(source.encode("utf-8")).digest()
+
+
+def atomic_write(path: str, data: bytes):
+    """Writes `data` so that readers only ever see the old file or the complete new one."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class RunDirectory:
+    """Persists the output of every pipeline unit so an interrupted run can be resumed.
+
+    OCR pages are stored one per file, cleaned text per LLM chunk and audio per TTS chunk, next
+    to a `manifest.json` recording the run settings. Each unit is written atomically, so after
+    a crash or Ctrl-C every file on disk is complete and only the missing units need to be
+    redone. Units are stored with a digest of the input they were made from, such as the LLM
+    chunk or the TTS text, and are only loaded back for the same input."""
+
+    def __init__(self, path: str, config: dict, resume: bool = False):
+        self.path = path
+        self.config = config
+        self.manifest_path = os.path.join(path, "manifest.json")
+
+        manifest = None
+        if resume and os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") != MANIFEST_VERSION or manifest.get("config") != config:
+                raise ValueError(
+                    f"Run directory {path} was created with different settings; "
+                    "start a new run instead of resuming."
+                )
+            logger.info(f"Resuming run from {path}")
+        elif resume:
+            logger.warning(f"Nothing to resume in {path}; starting a new run.")
+
+        if manifest is None:
+            # Start fresh, dropping anything a previous run left behind
+            for stage in STAGES:
+                shutil.rmtree(os.path.join(path, stage), ignore_errors=True)
+            manifest = {"version": MANIFEST_VERSION, "config": config}
+
+        for stage in STAGES:
+            os.makedirs(os.path.join(path, stage), exist_ok=True)
+        self.manifest = manifest
+        self._write_manifest()
+
+    def _write_manifest(self):
+        data = json.dumps(self.manifest, indent=2, ensure_ascii=False).encode("utf-8")
+        atomic_write(self.manifest_path, data)
+
+    def _unit_path(self, stage: str, index: int, extension: str) -> str:
+        if stage not in STAGES:
+            raise ValueError(f"Unknown pipeline stage: {stage}")
+        return os.path.join(self.path, stage, f"{index:06d}.{extension}")
+
+    def _save(self, path: str, data: bytes, source: str):
+        atomic_write(path, _source_digest(source) + data)
+
+    def _load(self, path: str, source: str) -> Optional[bytes]:
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = _source_digest(source)
+        if not data.startswith(digest):
+            logger.warning(f"Ignoring {path}: it was made from different input")
+            return None
+        return data[len(digest) :]
+
+    def save_text(self, stage: str, index: int, text: str, source: str = ""):
+        self._save(self._unit_path(stage, index, "txt"), text.encode("utf-8"), source)
+
+    def load_text(self, stage: str, index: int, source: str = "") -> Optional[str]:
+        """Returns the saved text for a unit, or None if it has not been completed from
+        `source`."""
+        data = self._load(self._unit_path(stage, index, "txt"), source)
+        return data.decode("utf-8") if data is not None else None
+
+    def save_audio(self, stage: str, index: int, wav: np.ndarray, source: str = ""):
+        data = np.asarray(wav, np.float32).tobytes()
+        self._save(self._unit_path(stage, index, "f32"), data, source)
+
+    def load_audio(self, stage: str, index: int, source: str = "") -> Optional[np.ndarray]:
+        """Returns the saved waveform for a unit, or None if it has not been completed from
+        `source`."""
+        data = self._load(self._unit_path(stage, index, "f32"), source)
+        return np.frombuffer(data, dtype=np.float32) if data is not None else None
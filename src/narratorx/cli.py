@@ -9,9 +9,15 @@ import sys
 import click
 import colorlog
 
+from narratorx.cache import DiskCache
+from narratorx.checkpoint import RunDirectory, file_digest
 from narratorx.llm import llm_process_text
-from narratorx.ocr import process_pdf
-from narratorx.tts import text_to_speech
+from narratorx.metrics import JsonLinesSink, Metrics, set_metrics
+from narratorx.ocr import OCRBatchSizes, RenderSettings, process_pdf
+from narratorx.pipeline import run_pipeline
+from narratorx.tts import DEFAULT_TTS_CACHE_BYTES, TTS_MODEL_NAME, text_to_speech
+from narratorx.utils import download_nltk_data, ensure_nltk_data
+from narratorx.voices import VoiceRegistry, voice_id
 
 
 def setup_logging(log_level, log_file=None):
@@ -62,13 +68,145 @@ def setup_logging(log_level, log_file=None):
 @click.option("--output", "-o", default="output.wav", help="Output audio file path.")
 @click.option("--language", "-l", default="en", help="Language code (e.g., en, tr).")
 @click.option("--model", "-m", default="ollama/llama3.1", help="LLM model name.")
-@click.option("--max-characters-llm", default=1000, help="Maximum characters per LLM chunk.")
-@click.option("--max-tokens", default=4000, help="Maximum output tokens for the LLM call.")
+@click.option(
+    "--max-characters-llm",
+    default=None,
+    type=click.IntRange(min=1),
+    help="Maximum characters per LLM chunk. By default chunks are only limited in tokens.",
+)
+@click.option(
+    "--max-tokens",
+    default=4000,
+    help="Maximum output tokens for the LLM call. LLM chunks are sized so the answer fits.",
+)
+@click.option(
+    "--llm-concurrency",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Number of LLM requests sent in parallel.",
+)
+@click.option(
+    "--llm-rpm",
+    default=None,
+    type=click.IntRange(min=1),
+    help="Maximum LLM requests per minute for the selected model.",
+)
+@click.option(
+    "--llm-retries",
+    default=0,
+    type=click.IntRange(min=0),
+    help="Number of times a failed LLM request is retried.",
+)
+@click.option(
+    "--llm-skip-threshold",
+    default=None,
+    type=click.FloatRange(min=0, max=1),
+    help="Local quality score above which a chunk skips the LLM, e.g. 0.98. By default every "
+    "chunk goes to the LLM.",
+)
 @click.option(
     "--max-characters-tts",
     default=250,
     help="Maximum characters per TTS chunk. This is enforced by the TTS model, please refer to the model documentation for the exact limit.",  # noqa: E501
 )
+@click.option(
+    "--tts-batch-size",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Number of TTS chunks of similar token length padded and synthesized in one forward "
+    "pass.",
+)
+@click.option(
+    "--tts-workers",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Number of TTS worker processes, each loading its own model.",
+)
+@click.option(
+    "--voice",
+    default=None,
+    help="Built-in XTTS speaker name or path to a reference WAV file to clone the voice from.",
+)
+@click.option(
+    "--llm-tts-splitting",
+    is_flag=True,
+    default=False,
+    help="Ask the LLM to split sentences too long for TTS instead of splitting them locally.",
+)
+@click.option(
+    "--ocr-batch-size",
+    default=8,
+    type=click.IntRange(min=1),
+    help="Number of pages rendered and recognized at once during OCR.",
+)
+@click.option(
+    "--ocr-min-dpi",
+    default=RenderSettings().min_dpi,
+    type=click.IntRange(min=1),
+    help="Lowest resolution pages are rendered at for OCR.",
+)
+@click.option(
+    "--ocr-max-dpi",
+    default=RenderSettings().max_dpi,
+    type=click.IntRange(min=1),
+    help="Highest resolution pages are rendered at for OCR.",
+)
+@click.option(
+    "--ocr-render-workers",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Number of processes rendering pages for OCR, each opening its own copy of the PDF.",
+)
+@click.option(
+    "--ocr-detection-batch-size",
+    default=None,
+    type=click.IntRange(min=1),
+    help="Number of pages Surya detects text in at once. Default: derived from free memory.",
+)
+@click.option(
+    "--ocr-recognition-batch-size",
+    default=None,
+    type=click.IntRange(min=1),
+    help="Number of text lines Surya recognizes at once. Default: derived from free memory.",
+)
+@click.option(
+    "--force-ocr",
+    is_flag=True,
+    default=False,
+    help="Run OCR on every page, even when the PDF has a usable embedded text layer.",
+)
+@click.option(
+    "--keep-headers",
+    is_flag=True,
+    default=False,
+    help="Leave page numbers and running headers and footers to the LLM instead of "
+    "stripping them locally.",
+)
+@click.option(
+    "--pipelined",
+    is_flag=True,
+    default=False,
+    help="Run OCR, LLM cleanup and TTS concurrently instead of one after another.",
+)
+@click.option(
+    "--cache-dir",
+    default=None,
+    type=click.Path(file_okay=False),
+    help="Directory for caching LLM results and synthesized audio across runs. "
+    "Caching is off when not set.",
+)
+@click.option(
+    "--run-dir",
+    default=None,
+    type=click.Path(file_okay=False),
+    help="Directory where every page, chunk and audio segment is saved as it completes.",
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    default=False,
+    help="Resume an interrupted run from --run-dir, redoing only the unfinished work.",
+)
 @click.option(
     "--log-level",
     default="ERROR",
@@ -76,6 +214,12 @@ def setup_logging(log_level, log_file=None):
     help="Logging level.",
 )
 @click.option("--log-file", default=None, help="Path to log file.")
+@click.option(
+    "--metrics-file",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help="Path to a JSON lines file receiving per-stage timing and throughput records.",
+)
 def main(
     pdf_path,
     output,
@@ -83,14 +227,42 @@ def main(
     model,
     max_characters_llm,
     max_tokens,
+    llm_concurrency,
+    llm_rpm,
+    llm_retries,
+    llm_skip_threshold,
     max_characters_tts,
+    tts_batch_size,
+    tts_workers,
+    voice,
+    llm_tts_splitting,
+    ocr_batch_size,
+    ocr_min_dpi,
+    ocr_max_dpi,
+    ocr_render_workers,
+    ocr_detection_batch_size,
+    ocr_recognition_batch_size,
+    force_ocr,
+    keep_headers,
+    pipelined,
+    cache_dir,
+    run_dir,
+    resume,
     log_level,
     log_file,
+    metrics_file,
 ):
     """
     NarratorX: Convert a PDF to an audiobook.
     """
+    if resume and not run_dir:
+        raise click.UsageError("--resume requires --run-dir.")
+    if ocr_min_dpi > ocr_max_dpi:
+        raise click.UsageError("--ocr-min-dpi must not be greater than --ocr-max-dpi.")
+    render_settings = RenderSettings(min_dpi=ocr_min_dpi, max_dpi=ocr_max_dpi)
+    ocr_batch_sizes = OCRBatchSizes(ocr_detection_batch_size, ocr_recognition_batch_size)
 
+    metrics = None
     try:
         # Set up logging
         logger = setup_logging(log_level, log_file)
@@ -102,28 +274,148 @@ def main(
             logger.error(f"Missing required environment variables: {', '.join(missing_env_vars)}")
             sys.exit(1)
 
+        # Check for the sentence tokenizer data now rather than after OCR has run
+        try:
+            ensure_nltk_data()
+        except RuntimeError as e:
+            logger.error(str(e))
+            sys.exit(1)
+
         logger.info("Starting NarratorX...")
 
+        metrics = Metrics(sinks=[JsonLinesSink(metrics_file)] if metrics_file else [])
+        set_metrics(metrics)
+
+        checkpoint = None
+        if run_dir:
+            run_config = {
+                "pdf_sha256": file_digest(pdf_path),
+                "language": language,
+                "model": model,
+                "max_characters_llm": max_characters_llm,
+                "max_tokens": max_tokens,
+                "llm_skip_threshold": llm_skip_threshold,
+                "max_characters_tts": max_characters_tts,
+                "llm_tts_splitting": llm_tts_splitting,
+                "voice": voice_id(voice) if voice else None,
+                "use_text_layer": not force_ocr,
+                "ocr_dpi": [ocr_min_dpi, ocr_max_dpi],
+                "strip_headers": not keep_headers,
+                "pipelined": pipelined,
+            }
+            checkpoint = RunDirectory(run_dir, run_config, resume=resume)
+
+        llm_cache = DiskCache(os.path.join(cache_dir, "llm.sqlite")) if cache_dir else None
+        tts_cache = (
+            DiskCache(os.path.join(cache_dir, "tts.sqlite"), max_bytes=DEFAULT_TTS_CACHE_BYTES)
+            if cache_dir
+            else None
+        )
+        voices = (
+            VoiceRegistry(os.path.join(cache_dir, "voices"), model_name=TTS_MODEL_NAME)
+            if cache_dir
+            else None
+        )
+
+        if pipelined:
+            # All three stages run concurrently
+            logger.info("Starting pipelined OCR, LLM and text-to-speech processing...")
+            run_pipeline(
+                pdf_path,
+                language,
+                output,
+                model_name=model,
+                max_chars_llm=max_characters_llm,
+                max_tokens=max_tokens,
+                max_characters_tts=max_characters_tts,
+                tts_batch_size=tts_batch_size,
+                tts_workers=tts_workers,
+                voice=voice,
+                voices=voices,
+                use_llm_splitter=llm_tts_splitting,
+                ocr_batch_size=ocr_batch_size,
+                use_text_layer=not force_ocr,
+                render_settings=render_settings,
+                render_workers=ocr_render_workers,
+                ocr_batch_sizes=ocr_batch_sizes,
+                strip_headers=not keep_headers,
+                llm_concurrency=llm_concurrency,
+                requests_per_minute=llm_rpm,
+                max_retries=llm_retries,
+                llm_skip_threshold=llm_skip_threshold,
+                llm_cache=llm_cache,
+                tts_cache=tts_cache,
+                checkpoint=checkpoint,
+            )
+            logger.info(f"Pipelined processing completed. Audio saved to {output}")
+            click.echo(f"Run summary:\n{metrics.format_summary()}")
+            return
+
         # Step 1: OCR processing
         logger.info("Starting OCR processing...")
-        text = process_pdf(pdf_path, language)
+        text = process_pdf(
+            pdf_path,
+            language,
+            batch_size=ocr_batch_size,
+            use_text_layer=not force_ocr,
+            checkpoint=checkpoint,
+            render_settings=render_settings,
+            render_workers=ocr_render_workers,
+            ocr_batch_sizes=ocr_batch_sizes,
+            strip_headers=not keep_headers,
+        )
         logger.info("OCR processing completed.")
 
         # Step 2: LLM text processing
         logger.info("Starting LLM text processing...")
         fixed_text = llm_process_text(
-            text, language, model_name=model, max_chars=max_characters_llm, max_tokens=max_tokens
+            text,
+            language,
+            model_name=model,
+            max_chars=max_characters_llm,
+            max_tokens=max_tokens,
+            concurrency=llm_concurrency,
+            requests_per_minute=llm_rpm,
+            cache=llm_cache,
+            max_retries=llm_retries,
+            checkpoint=checkpoint,
+            skip_threshold=llm_skip_threshold,
         )
         logger.info("LLM text processing completed.")
 
         # Step 3: Text-to-speech synthesis
         logger.info("Starting text-to-speech synthesis...")
-        text_to_speech(fixed_text, language, output, max_characters_tts)
+        text_to_speech(
+            fixed_text,
+            language,
+            output,
+            max_characters_tts,
+            cache=tts_cache,
+            checkpoint=checkpoint,
+            batch_size=tts_batch_size,
+            workers=tts_workers,
+            voice=voice,
+            voices=voices,
+            use_llm_splitter=llm_tts_splitting,
+        )
         logger.info(f"Text-to-speech synthesis completed. Audio saved to {output}")
+        click.echo(f"Run summary:\n{metrics.format_summary()}")
 
     except Exception as e:
         logger.exception(f"An error occurred: {e}")
         sys.exit(1)
+    finally:
+        # Close the metrics file even when the run fails
+        if metrics is not None:
+            metrics.close()
+
+
+@click.command()
+def setup():
+    """Downloads the data NarratorX needs at run time. Run it once after installing."""
+    click.echo("Downloading the NLTK sentence tokenizer data...")
+    download_nltk_data()
+    click.echo("Setup complete.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,155 @@
+# narratorx/layout.py
+
+import difflib
+import re
+from collections import deque
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from narratorx.metrics import get_metrics
+
+# Running headers, footers and page numbers
+EDGE_LINES = 3  # lines at the top and at the bottom of a page that can be headers or footers
+EDGE_ZONE = 0.15  # share of the page height at the top and bottom where they can sit
+HEADER_WINDOW = 4  # pages before and after a page that are searched for the same line
+MIN_REPEATS = 2  # other pages in the window a line must appear on to count as running
+MIN_HEADER_CHARS = 3  # shorter lines are too common to be told apart from body text
+MAX_HEADER_CHARS = 100  # longer lines are body text
+MIN_SIMILARITY = 0.8  # fuzzy match ratio above which two lines are the same header
+POSITION_TOLERANCE = 0.03  # share of the page height two copies of a header may be apart
+
+PAGE_NUMBER_PATTERN = re.compile(
+    r"(?:(?i:page|pg\.|p\.)\s*)?[-–—(\[]?\s*"
+    r"(?:\d{1,4}|(?=[ivxlcdm])m{0,3}(?:cm|cd|d?c{0,3})(?:xc|xl|l?x{0,3})(?:ix|iv|v?i{0,3}))"
+    r"\s*[-–—)\]]?(?:\s*(?:/|(?i:of))\s*\d{1,4})?"
+)
+
+
+class EdgeLine(NamedTuple):
+    index: int  # position of the line on its page
+    side: str  # "top" or "bottom"
+    key: str  # text used for matching, with digits masked
+    center: Optional[float]  # vertical position as a share of the page height, if known
+
+
+def is_page_number(text: str) -> bool:
+    """Returns whether `text` is a page number on its own, like "12", "- 12 -", "xiv" or
+    "Page 12 of 300"."""
+    return PAGE_NUMBER_PATTERN.fullmatch(text.strip()) is not None
+
+
+def _match_key(text: str) -> str:
+    return re.sub(r"\d+", "#", " ".join(text.lower().split()))
+
+
+def _similar(key: str, other: str) -> bool:
+    matcher = difflib.SequenceMatcher(None, key, other)
+    return matcher.quick_ratio() >= MIN_SIMILARITY and matcher.ratio() >= MIN_SIMILARITY
+
+
+def _edge_lines(page) -> List[EdgeLine]:
+    """Returns the lines of `page` that are close enough to its top or bottom edge."""
+    edges = []
+    count = len(page.lines)
+    for index, line in enumerate(page.lines):
+        if index < EDGE_LINES:
+            side = "top"
+        elif index >= count - EDGE_LINES:
+            side = "bottom"
+        else:
+            continue
+        center = None
+        if line.bbox is not None and page.height:
+            center = (line.bbox[1] + line.bbox[3]) / 2 / page.height
+            in_zone = center <= EDGE_ZONE if side == "top" else center >= 1 - EDGE_ZONE
+            if not in_zone:
+                continue
+        if len(line.text) <= MAX_HEADER_CHARS:
+            edges.append(EdgeLine(index, side, _match_key(line.text), center))
+    return edges
+
+
+def _is_repeated(edge: EdgeLine, other_pages) -> bool:
+    repeats = 0
+    for other in other_pages:
+        for candidate in other:
+            if candidate.side != edge.side:
+                continue
+            if edge.center is not None and candidate.center is not None:
+                if abs(edge.center - candidate.center) > POSITION_TOLERANCE:
+                    continue
+            if _similar(edge.key, candidate.key):
+                repeats += 1
+                break
+        if repeats >= MIN_REPEATS:
+            return True
+    return False
+
+
+def _strip_page(page, edges, other_pages):
+    """Drops the page numbers and running lines of `page`, counting each kind."""
+    dropped = {}
+    for edge in edges:
+        if is_page_number(page.lines[edge.index].text):
+            dropped[edge.index] = "page_number"
+        elif _is_repeated(edge, other_pages):
+            dropped[edge.index] = "header"
+    if not dropped:
+        return page, 0, 0
+    lines = tuple(line for index, line in enumerate(page.lines) if index not in dropped)
+    page_numbers = sum(kind == "page_number" for kind in dropped.values())
+    return page._replace(lines=lines), page_numbers, len(dropped) - page_numbers
+
+
+def strip_headers_and_footers(pages: Iterable, window: int = HEADER_WINDOW) -> Iterator:
+    """Yields `OCRPage` records without their page numbers, running headers and footers.
+
+    A line near the top or bottom of a page is dropped when it is a page number, or when a
+    similar line sits at the same edge of at least `MIN_REPEATS` of the `window` pages before
+    and after it. Digits are ignored when comparing, so headers carrying the page number still
+    match. Line positions are used when the pages have them; otherwise the first and last
+    `EDGE_LINES` lines are the candidates. Pages are consumed lazily, `window` pages ahead."""
+    buffer = deque()
+    position = 0  # index in `buffer` of the next page to yield
+    page_numbers = headers = 0
+
+    def strip(position):
+        nonlocal page_numbers, headers
+        page, edges = buffer[position]
+        others = [other for i, (_, other) in enumerate(buffer) if i != position]
+        page, numbers_dropped, headers_dropped = _strip_page(page, edges, others)
+        page_numbers += numbers_dropped
+        headers += headers_dropped
+        return page
+
+    try:
+        for page in pages:
+            buffer.append((page, _edge_lines(page)))
+            if len(buffer) > position + window:
+                yield strip(position)
+                position += 1
+                if position > window:
+                    buffer.popleft()
+                    position -= 1
+        while position < len(buffer):
+            yield strip(position)
+            position += 1
+    finally:
+        metrics = get_metrics()
+        metrics.count("layout.page_numbers_stripped", page_numbers)
+        metrics.count("layout.header_lines_stripped", headers)
+
+
+def find_page_furniture(text: str) -> Tuple[bool, bool]:
+    """Returns whether `text` still seems to contain page numbers, and running headers or
+    footers, judging from lines that are page numbers or short lines that occur twice."""
+    has_page_numbers = has_headers = False
+    seen = set()
+    for line in text.splitlines():
+        line = line.strip()
+        if is_page_number(line):
+            has_page_numbers = True
+        elif MIN_HEADER_CHARS <= len(line) <= MAX_HEADER_CHARS:
+            key = _match_key(line)
+            has_headers = has_headers or key in seen
+            seen.add(key)
+    return has_page_numbers, has_headers
@@ -0,0 +1,35 @@
+# narratorx/lazy.py
+
+import importlib
+from typing import Optional
+
+
+class LazyImport:
+    """Stands in for a module, or one of its attributes, and imports it on first use.
+
+    Torch, Coqui TTS, Surya, litellm and Streamlit take seconds to import. Module-level names
+    bound to a `LazyImport` keep `import narratorx.cli` (and so `narratorx --help`) fast, while
+    the dependency is only loaded once a stage actually uses it."""
+
+    def __init__(self, module: str, attribute: Optional[str] = None):
+        self._module = module
+        self._attribute = attribute
+        self._target = None
+
+    def _load(self):
+        if self._target is None:
+            target = importlib.import_module(self._module)
+            if self._attribute is not None:
+                target = getattr(target, self._attribute)
+            self._target = target
+        return self._target
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._load()(*args, **kwargs)
+
+    def __repr__(self):
+        name = f"{self._module}.{self._attribute}" if self._attribute else self._module
+        return f"<lazy import of {name}>"
@@ -1,12 +1,37 @@
 # narratorx/llm.py
 
 import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 
-import litellm
-from litellm import completion
 from pydantic import BaseModel
 
-from narratorx.utils import split_text_into_chunks
+from narratorx.cache import DiskCache, make_cache_key
+from narratorx.checkpoint import RunDirectory
+from narratorx.layout import find_page_furniture
+from narratorx.lazy import LazyImport
+from narratorx.metrics import get_metrics
+from narratorx.quality import reflow_text, score_text
+from narratorx.utils import (
+    CHARS_PER_TOKEN,
+    count_tokens,
+    join_segmented,
+    resegment,
+    split_text_into_chunks,
+)
+
+completion = LazyImport("litellm", "completion")
+get_model_info = LazyImport("litellm", "get_model_info")
+
+logger = logging.getLogger(__name__)
+
+# Request sizing
+DEFAULT_CONTEXT_WINDOW = 8192  # for models litellm has no information about
+OUTPUT_EXPANSION = 1.3  # answer tokens per chunk token: the fixed text, the thinking and the JSON
+MIN_CHUNK_TOKENS = 256  # smaller chunks would take an LLM call for every few words
 
 
 class FixedTextResponse(BaseModel):
@@ -14,17 +39,44 @@ class FixedTextResponse(BaseModel):
     fixed_text: str
 
 
-def llm_process_text(
-    text: str,
-    language: str,
-    model_name: str = "gpt-4o-mini",
-    max_chars: int = 8000,
-    max_tokens: int = 4000,
-) -> str:
-    """Processes the text by chunking and using llms to fix the text."""
-    chunks = split_text_into_chunks(text, max_chars=max_chars, model_name=model_name)
-    fixed_chunks = []
+class RateLimiter:
+    """Spaces out requests so that no more than `requests_per_minute` start in any minute."""
+
+    def __init__(self, requests_per_minute: int):
+        if requests_per_minute <= 0:
+            raise ValueError("requests_per_minute must be a positive integer.")
+        self.requests_per_minute = requests_per_minute
+        self.interval = 60.0 / requests_per_minute
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Blocks until the caller is allowed to send its next request."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+# Rate limiters are shared per model, so concurrent runs against the same model share a budget
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(model_name: str, requests_per_minute: int) -> RateLimiter:
+    """Returns the process-wide rate limiter for `model_name`."""
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(model_name)
+        if limiter is None or limiter.requests_per_minute != requests_per_minute:
+            limiter = RateLimiter(requests_per_minute)
+            _rate_limiters[model_name] = limiter
+    return limiter
 
+
+def load_prompts(language: str):
+    """Returns the rendered system prompt and the user prompt template for `language`."""
     with open("src/narratorx/prompts/user_prompt.txt", "r", encoding="utf-8") as f:
         user_prompt_template = f.read()
     with open("src/narratorx/prompts/system_prompt.txt", "r", encoding="utf-8") as f:
@@ -32,26 +84,245 @@ def llm_process_text(
 
     system_prompt = system_prompt_template.format(language=language)
 
+    import litellm
+
     litellm.enable_json_schema_validation = True
 
-    # Process each chunk individually
-    for chunk in chunks:
-        user_prompt = user_prompt_template.format(
-            content=chunk, do_pages_have_page_numbers=True, do_pages_have_headers_or_footers=True
+    return system_prompt, user_prompt_template
+
+
+def fix_chunk(
+    chunk: str,
+    system_prompt: str,
+    user_prompt_template: str,
+    model_name: str,
+    max_tokens: int,
+    rate_limiter: Optional[RateLimiter] = None,
+    api_base: Optional[str] = None,
+    cache: Optional[DiskCache] = None,
+    max_retries: int = 0,
+) -> str:
+    """Sends a single chunk to the LLM and returns its fixed text.
+
+    With a `cache`, results are keyed by the chunk, the rendered prompts, the model and
+    `max_tokens`, and a cached result is returned without calling the model. Failed calls are
+    retried up to `max_retries` times with exponential backoff.
+
+    The prompt only asks the model to look for page numbers and running headers or footers
+    when some still seem to be left in the chunk after local stripping."""
+    has_page_numbers, has_headers = find_page_furniture(chunk)
+    user_prompt = user_prompt_template.format(
+        content=chunk,
+        do_pages_have_page_numbers=has_page_numbers,
+        do_pages_have_headers_or_footers=has_headers,
+    )
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
+    extra_kwargs = {"api_base": api_base} if api_base else {}
+
+    if cache is not None:
+        cache_key = make_cache_key(
+            "llm", str(chunk), system_prompt, user_prompt, model_name, max_tokens
+        )
+        cached = cache.get(cache_key)
+        if cached is not None:
+            get_metrics().count("llm.cache_hits")
+            return cached.decode("utf-8")
+
+    with get_metrics().span("llm.call", model=model_name, chars=len(str(chunk))) as span:
+        for attempt in range(max_retries + 1):
+            if rate_limiter is not None:
+                rate_limiter.wait()
+            try:
+                response_text = completion(
+                    model=model_name,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    response_format=FixedTextResponse,
+                    **extra_kwargs,
+                )
+                break
+            except Exception as e:
+                if attempt == max_retries:
+                    raise
+                delay = 2**attempt
+                logger.warning(f"LLM call failed ({e}); retrying in {delay}s...")
+                time.sleep(delay)
+        span["retries"] = attempt
+
+        usage = getattr(response_text, "usage", None)
+        for attr, key in (("prompt_tokens", "tokens_in"), ("completion_tokens", "tokens_out")):
+            value = getattr(usage, attr, None)
+            if isinstance(value, int):
+                span[key] = value
+
+    json_res = response_text.choices[0].message.content
+    logger.debug(f"Response text: {json_res}")
+    parsed_res = json.loads(json_res)
+    fixed_text = parsed_res["fixed_text"]
+
+    if cache is not None:
+        cache.put(cache_key, fixed_text.encode("utf-8"))
+
+    return fixed_text
+
+
+def chunk_token_budget(
+    model_name: str, max_tokens: int, system_prompt: str, user_prompt_template: str
+) -> int:
+    """Returns the number of text tokens a single request to `model_name` should carry.
+
+    The answer, which repeats the fixed text with some thinking, has to fit in `max_tokens`
+    (or the model's own output limit if lower), and the prompts, the text and the answer
+    together in the model's context window. When `max_tokens` leaves too little of the window
+    for the text, the window is shared between the text and its answer instead. Raises
+    `ValueError` if the prompts leave room for less than `MIN_CHUNK_TOKENS`."""
+    try:
+        info = get_model_info(model_name)
+    except Exception:
+        logger.warning(f"No context window known for {model_name}; using {DEFAULT_CONTEXT_WINDOW}")
+        info = {}
+    context_window = info.get("max_input_tokens") or DEFAULT_CONTEXT_WINDOW
+    output_tokens = min(max_tokens, info.get("max_output_tokens") or max_tokens)
+
+    prompt_tokens = count_tokens(system_prompt + user_prompt_template, model_name)
+    by_output = int(output_tokens / OUTPUT_EXPANSION)
+    # The chunk and an answer of the expected length have to fit next to the prompts
+    by_context = int((context_window - prompt_tokens) / (1 + OUTPUT_EXPANSION))
+    if by_context < MIN_CHUNK_TOKENS:
+        raise ValueError(
+            f"The prompts take {prompt_tokens} of the {context_window} tokens {model_name} "
+            "accepts, leaving too little room for the text; use a model with a larger context "
+            "window."
+        )
+    if output_tokens + prompt_tokens + by_output > context_window:
+        logger.warning(
+            f"max_tokens={max_tokens} does not fit {model_name}'s {context_window}-token "
+            f"context window next to a full chunk; chunks are limited to {by_context} tokens"
+        )
+    return min(by_output, by_context)
+
+
+def is_clean_chunk(chunk: str, threshold: Optional[float]) -> bool:
+    """Returns whether `chunk` scores above `threshold` and can skip the LLM."""
+    return threshold is not None and score_text(chunk) > threshold
+
+
+def pass_through_chunk(chunk: str, system_prompt: str, user_prompt_template: str) -> str:
+    """Returns a chunk that skips the LLM, with its lines reflowed locally.
+
+    The skipped chunk is counted, together with an estimate of the tokens its LLM call would
+    have used: the prompts and the chunk in, and the chunk out again."""
+    chars = len(system_prompt) + len(user_prompt_template) + 2 * len(chunk)
+    metrics = get_metrics()
+    metrics.count("llm.chunks_skipped")
+    metrics.count("llm.tokens_saved_estimate", chars // CHARS_PER_TOKEN)
+    return reflow_text(chunk)
+
+
+def llm_process_text(
+    text: str,
+    language: str,
+    model_name: str = "gpt-4o-mini",
+    max_chars: Optional[int] = None,
+    max_tokens: int = 4000,
+    concurrency: int = 1,
+    requests_per_minute: Optional[int] = None,
+    api_base: Optional[str] = None,
+    cache: Optional[DiskCache] = None,
+    checkpoint: Optional[RunDirectory] = None,
+    max_retries: int = 0,
+    skip_threshold: Optional[float] = None,
+) -> str:
+    """Processes the text by chunking and using llms to fix the text.
+
+    Chunks are as large as `chunk_token_budget` allows for the model and `max_tokens`, counted
+    with the model's tokenizer, and end at paragraph boundaries where possible. `max_chars`
+    additionally caps their length in characters.
+
+    Up to `concurrency` chunks are sent to the model at once, optionally throttled to
+    `requests_per_minute` for the model. The fixed chunks are always returned in their original
+    order. Chunks already fixed with the same prompts and model are served from `cache`, and
+    with a `checkpoint` every fixed chunk is saved so a resumed run only processes the rest.
+    Failed calls are retried up to `max_retries` times. Chunks whose local quality score is
+    above `skip_threshold` are only reflowed locally and never sent to the model.
+
+    The text is segmented into sentences once. Each fixed chunk is segmented as it comes back,
+    or keeps the index of its input when the LLM left it unchanged, and the returned text
+    carries the sentence index on to TTS chunking."""
+    if concurrency <= 0:
+        raise ValueError("concurrency must be a positive integer.")
+
+    system_prompt, user_prompt_template = load_prompts(language)
+
+    with get_metrics().span("llm.chunking", chars=len(text)) as span:
+        token_budget = chunk_token_budget(
+            model_name, max_tokens, system_prompt, user_prompt_template
         )
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ]
-        response_text = completion(
-            model=model_name,
-            messages=messages,
-            max_tokens=max_tokens,
-            response_format=FixedTextResponse,
+        chunks = split_text_into_chunks(
+            text,
+            max_chars=max_chars,
+            model_name=model_name,
+            language=language,
+            max_tokens=token_budget,
         )
-        json_res = response_text.choices[0].message.content
-        print("Response text:", json_res)
-        parsed_res = json.loads(json_res)
-        fixed_chunks.append(parsed_res["fixed_text"])
+        span["chunks"] = len(chunks)
+    logger.info(f"Text split into {len(chunks)} LLM chunks of up to {token_budget} tokens")
+
+    rate_limiter = (
+        get_rate_limiter(model_name, requests_per_minute) if requests_per_minute else None
+    )
+
+    skipped = []
+
+    def process_chunk(index, chunk):
+        if checkpoint is not None:
+            saved = checkpoint.load_text("llm", index, source=chunk)
+            if saved is not None:
+                return resegment(saved, chunk, language)
+
+        if is_clean_chunk(chunk, skip_threshold):
+            skipped.append(index)
+            fixed_text = pass_through_chunk(chunk, system_prompt, user_prompt_template)
+        else:
+            fixed_text = fix_chunk(
+                chunk,
+                system_prompt,
+                user_prompt_template,
+                model_name,
+                max_tokens,
+                rate_limiter=rate_limiter,
+                api_base=api_base,
+                cache=cache,
+                max_retries=max_retries,
+            )
+        if checkpoint is not None:
+            checkpoint.save_text("llm", index, fixed_text, source=chunk)
+        return resegment(fixed_text, chunk, language)
+
+    if concurrency == 1 or len(chunks) <= 1:
+        # Process each chunk individually
+        fixed_chunks = [process_chunk(index, chunk) for index, chunk in enumerate(chunks)]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [
+                executor.submit(process_chunk, index, chunk) for index, chunk in enumerate(chunks)
+            ]
+            try:
+                # Collect results in submission order, not completion order
+                fixed_chunks = [future.result() for future in futures]
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+    if skip_threshold is not None:
+        logger.info(f"LLM skipped {len(skipped)} of {len(chunks)} chunks as already clean")
+
+    if cache is not None:
+        stats = cache.stats()
+        logger.info(f"LLM cache: {stats['hits']} hits, {stats['misses']} misses")
 
-    return "\n\n".join(fixed_chunks)
+    return join_segmented(fixed_chunks, "\n\n")
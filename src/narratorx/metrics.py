@@ -0,0 +1,175 @@
+# narratorx/metrics.py
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from numbers import Number
+from typing import Dict, List, Optional
+
+
+class MetricsSink:
+    """Receives every span and counter record as a flat dict. The base class ignores them."""
+
+    def emit(self, record: Dict):
+        pass
+
+    def close(self):
+        pass
+
+
+class JsonLinesSink(MetricsSink):
+    """Appends each record to a file as one JSON object per line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def emit(self, record: Dict):
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class ListSink(MetricsSink):
+    """Keeps every record in memory, e.g. to hand them from a worker process to its parent."""
+
+    def __init__(self):
+        self.records = []
+
+    def emit(self, record: Dict):
+        self.records.append(record)
+
+
+class _Aggregate:
+    __slots__ = ("count", "total", "max", "sums")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.sums = {}
+
+    def add(self, value: float, attrs: Dict):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        for key, attr in attrs.items():
+            if isinstance(attr, Number) and not isinstance(attr, bool):
+                self.sums[key] = self.sums.get(key, 0) + attr
+
+
+class Metrics:
+    """Collects timing spans and counters for a run and forwards them to pluggable sinks.
+
+    Aggregates (count, total and max duration, and sums of numeric attributes) are kept in
+    memory for the end-of-run summary; individual records are only kept by the sinks."""
+
+    def __init__(self, sinks: Optional[List[MetricsSink]] = None):
+        self.sinks = list(sinks or [])
+        self._spans = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def _emit(self, record: Dict):
+        for sink in self.sinks:
+            sink.emit(record)
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """Times the enclosed block. Attributes can be added to the yielded dict while it runs."""
+        start = time.perf_counter()
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs["error"] = type(e).__name__
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            with self._lock:
+                self._spans.setdefault(name, _Aggregate()).add(duration, attrs)
+            self._emit(
+                {"type": "span", "name": name, "time": time.time(), "seconds": duration, **attrs}
+            )
+
+    def count(self, name: str, value: float = 1, **attrs):
+        """Adds `value` to the counter `name`."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+        self._emit({"type": "counter", "name": name, "time": time.time(), "value": value, **attrs})
+
+    def record(self, record: Dict):
+        """Adds a span or counter record emitted by another collector, such as one running in
+        a worker process, as if it had been recorded here."""
+        name = record["name"]
+        if record["type"] == "span":
+            attrs = {
+                key: value
+                for key, value in record.items()
+                if key not in ("type", "name", "time", "seconds")
+            }
+            with self._lock:
+                self._spans.setdefault(name, _Aggregate()).add(record["seconds"], attrs)
+        else:
+            with self._lock:
+                self._counters[name] = self._counters.get(name, 0) + record["value"]
+        self._emit(record)
+
+    def summary(self) -> Dict:
+        """Returns the aggregated spans and counters recorded so far."""
+        with self._lock:
+            spans = {
+                name: {"count": agg.count, "seconds": agg.total, "max_seconds": agg.max, **agg.sums}
+                for name, agg in self._spans.items()
+            }
+            return {"spans": spans, "counters": dict(self._counters)}
+
+    def format_summary(self) -> str:
+        """Renders the summary as a plain-text table."""
+        summary = self.summary()
+        lines = [f"{'span':<22}{'count':>8}{'total s':>11}{'mean s':>10}{'max s':>10}  details"]
+        for name, span in sorted(summary["spans"].items()):
+            count, seconds = span["count"], span["seconds"]
+            details = {
+                key: value
+                for key, value in span.items()
+                if key not in ("count", "seconds", "max_seconds")
+            }
+            if details.get("audio_seconds"):
+                details["rtf"] = seconds / details["audio_seconds"]
+            details_text = " ".join(
+                f"{key}={value:.2f}" if isinstance(value, float) else f"{key}={value}"
+                for key, value in details.items()
+            )
+            lines.append(
+                f"{name:<22}{count:>8}{seconds:>11.2f}{seconds / count:>10.3f}"
+                f"{span['max_seconds']:>10.3f}  {details_text}".rstrip()
+            )
+        for name, value in sorted(summary["counters"].items()):
+            lines.append(f"{name:<22}{value:>8}")
+        return "\n".join(lines)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+_metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    """Returns the process-wide metrics collector used by every pipeline stage."""
+    return _metrics
+
+
+def set_metrics(metrics: Metrics) -> Metrics:
+    """Replaces the process-wide metrics collector and returns the previous one."""
+    global _metrics
+    previous, _metrics = _metrics, metrics
+    return previous
@@ -1,42 +1,715 @@
 # narratorx/ocr.py
 
+import gc
+import json
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import time
+import unicodedata
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
 import pymupdf
 from PIL import Image
-from surya.model.detection.model import load_model as load_det_model
-from surya.model.detection.model import load_processor as load_det_processor
-from surya.model.recognition.model import load_model as load_rec_model
-from surya.model.recognition.processor import load_processor as load_rec_processor
-from surya.ocr import run_ocr
 
+from narratorx.layout import strip_headers_and_footers
+from narratorx.lazy import LazyImport
+from narratorx.metrics import get_metrics
+
+batch_text_detection = LazyImport("surya.detection", "batch_text_detection")
+load_det_model = LazyImport("surya.model.detection.model", "load_model")
+load_det_processor = LazyImport("surya.model.detection.model", "load_processor")
+load_rec_model = LazyImport("surya.model.recognition.model", "load_model")
+load_rec_processor = LazyImport("surya.model.recognition.processor", "load_processor")
+run_recognition = LazyImport("surya.ocr", "run_recognition")
+sort_text_lines = LazyImport("surya.postprocessing.text", "sort_text_lines")
+
+logger = logging.getLogger(__name__)
+
+# Thresholds used to decide whether a page's embedded text layer can be used as is
+MIN_TEXT_LAYER_CHARS = 20  # fewer visible glyphs than this is treated as "no text layer"
+MIN_ALNUM_RATIO = 0.7  # share of visible glyphs that must be letters or digits
+MAX_BAD_CHAR_RATIO = 0.01  # replacement, private-use and control characters
+SCANNED_IMAGE_COVERAGE = 0.5  # pages mostly covered by images...
+SCANNED_TEXT_COVERAGE = 0.05  # ...with hardly any text on top are treated as scans
+
+# Page rendering for OCR
+COLOR_PROBE_DPI = 18  # resolution of the thumbnail searched for coloured pixels
+COLOR_TOLERANCE = 24  # channel spread up to which a pixel still counts as gray
+COLOR_PIXEL_RATIO = 0.001  # share of coloured pixels above which a page is rendered in colour
+CONTENT_MARGIN = 18  # points kept around the page content when clipping to it
+
+# OCR batching. Memory per batch item is taken from Surya's documentation.
+SIZE_BUCKET_STEPS = 2  # size classes per doubling of a page's width or height
+DETECTION_ITEM_BYTES = 440 * 2**20
+RECOGNITION_ITEM_BYTES = 50 * 2**20
+OCR_MEMORY_FRACTION = 0.5  # share of the available memory OCR batches may take
+MAX_DETECTION_BATCH_SIZE = 64
+MAX_RECOGNITION_BATCH_SIZE = 512
+
+
+class RenderSettings(NamedTuple):
+    """How pages that need OCR are rasterized.
+
+    The resolution is chosen per page so that the body text is about `text_height` pixels tall,
+    falling back to `default_dpi` on pages without font information. It never exceeds the
+    resolution of a scanned page image, keeps the rendered area within `max_pixels`, and is
+    clamped to `min_dpi`..`max_dpi`. Pages without colour are rendered in grayscale, and with
+    `clip_to_content` blank margins are cut off."""
+
+    min_dpi: int = 72
+    max_dpi: int = 200
+    default_dpi: int = 96
+    text_height: float = 20.0
+    max_pixels: int = 4_000_000
+    grayscale: bool = True
+    clip_to_content: bool = True
+
+
+class PageRender(NamedTuple):
+    dpi: int
+    grayscale: bool
+    clip: Any
+
+
+class PageFrame(NamedTuple):
+    """A rendered page as raw pixel bytes, cheap to send between processes."""
+
+    page: int
+    mode: str
+    width: int
+    height: int
+    samples: bytes
+    dpi: int
+    origin: Tuple[float, float]  # top-left corner of the rendered area, in PDF points
+
+    def to_image(self):
+        return Image.frombytes(self.mode, (self.width, self.height), self.samples)
+
+
+class OCRLine(NamedTuple):
+    """A line of text with its bounding box in PDF points and its OCR confidence.
+
+    Lines read from the text layer have no confidence. Lines restored from a checkpoint keep
+    what they were saved with."""
+
+    text: str
+    bbox: Optional[Tuple[float, float, float, float]] = None
+    confidence: Optional[float] = None
+
+
+class OCRPage(NamedTuple):
+    """The lines of a page in reading order. `source` is "ocr", "text_layer" or "checkpoint"."""
+
+    number: int
+    width: float
+    height: float
+    source: str
+    lines: Tuple[OCRLine, ...]
+
+    @property
+    def text(self) -> str:
+        return "".join(f"{line.text}\n" for line in self.lines)
+
+
+def _dump_lines(lines) -> str:
+    """Serializes `OCRLine` records for a checkpoint, keeping their boxes and confidences so
+    restored pages are stripped of headers and footers the same way as fresh ones."""
+    return json.dumps([list(line) for line in lines], ensure_ascii=False)
+
+
+def _load_lines(data: str) -> List[OCRLine]:
+    """Restores the `OCRLine` records saved by `_dump_lines`."""
+    return [
+        OCRLine(text, tuple(bbox) if bbox is not None else None, confidence)
+        for text, bbox, confidence in json.loads(data)
+    ]
+
+
+class OCRDocument(NamedTuple):
+    pages: Tuple[OCRPage, ...]
+
+    @property
+    def full_text(self) -> str:
+        return "\n\n".join(page.text for page in self.pages)
+
+
+class OCRBatchSizes(NamedTuple):
+    """Number of page images Surya detects text in at once, and of text lines it recognizes at
+    once. `None` lets `resolve_ocr_batch_sizes` derive the value from the available memory."""
+
+    detection: Optional[int] = None
+    recognition: Optional[int] = None
+
+
+class OCRModels(NamedTuple):
+    det_model: Any
+    det_processor: Any
+    rec_model: Any
+    rec_processor: Any
+
+
+# Process-wide OCR models, keyed by (device, detection checkpoint, recognition checkpoint).
+# `None` entries in the key stand for Surya's configured defaults.
+_ocr_models = {}
+_ocr_models_lock = threading.Lock()
+
+
+def _load_ocr_models(device, det_checkpoint, rec_checkpoint):
+    """Loads the Surya detection and recognition models, falling back to Surya's defaults."""
+    det_kwargs = {"checkpoint": det_checkpoint} if det_checkpoint else {}
+    rec_kwargs = {"checkpoint": rec_checkpoint} if rec_checkpoint else {}
+    device_kwargs = {"device": device} if device else {}
+
+    logger.info(f"Loading OCR models (device={device or 'default'})...")
+    det_processor = load_det_processor(**det_kwargs)
+    det_model = load_det_model(**det_kwargs, **device_kwargs)
+    rec_model = load_rec_model(**rec_kwargs, **device_kwargs)
+    rec_processor = load_rec_processor()
+    return OCRModels(det_model, det_processor, rec_model, rec_processor)
+
+
+def get_ocr_models(device=None, det_checkpoint=None, rec_checkpoint=None):
+    """Returns the shared OCR models for the given device and variant, loading them on first use.
+
+    The models are loaded once per process and reused by every later call, so documents
+    processed by the same worker don't pay the model loading cost again."""
+    key = (device, det_checkpoint, rec_checkpoint)
+    with _ocr_models_lock:
+        models = _ocr_models.get(key)
+        if models is None:
+            models = _load_ocr_models(device, det_checkpoint, rec_checkpoint)
+            _ocr_models[key] = models
+    return models
+
+
+def warmup_ocr_models(device=None, det_checkpoint=None, rec_checkpoint=None):
+    """Loads the OCR models ahead of time, e.g. when a worker or the web app starts up."""
+    return get_ocr_models(device, det_checkpoint, rec_checkpoint)
+
+
+def unload_ocr_models(device=None, det_checkpoint=None, rec_checkpoint=None, all_variants=False):
+    """Drops the shared OCR models for the given variant (or every variant) and frees memory."""
+    with _ocr_models_lock:
+        if all_variants:
+            _ocr_models.clear()
+        else:
+            _ocr_models.pop((device, det_checkpoint, rec_checkpoint), None)
+
+    gc.collect()
+    import torch
+
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+def _coverage(rects, page_rect):
+    """Returns the share of the page area covered by the given rectangles."""
+    page_area = abs(page_rect)
+    if not page_area:
+        return 0.0
+    covered = sum(abs(pymupdf.Rect(rect) & page_rect) for rect in rects)
+    return min(covered / page_area, 1.0)
+
+
+def has_trustworthy_text_layer(page):
+    """Decides whether the page's embedded text can be used instead of running OCR on it.
+
+    The text layer is trusted when it has enough glyphs, the glyphs look like real text rather
+    than broken font encodings, and the page is not an image with a thin layer of text on top.
+    Pages with neither text nor images are blank and are trusted as well."""
+    text = page.get_text("text")
+    glyphs = [c for c in text if not c.isspace()]
+    images = page.get_image_info()
+
+    # Image-only check
+    if len(glyphs) < MIN_TEXT_LAYER_CHARS:
+        return not images
+
+    # Character sanity
+    alnum_ratio = sum(c.isalnum() for c in glyphs) / len(glyphs)
+    bad_chars = sum(
+        c == "\ufffd" or unicodedata.category(c) in ("Cc", "Cn", "Co", "Cs") for c in glyphs
+    )
+    if alnum_ratio < MIN_ALNUM_RATIO or bad_chars / len(glyphs) > MAX_BAD_CHAR_RATIO:
+        return False
+
+    # Glyph coverage
+    text_blocks = [block[:4] for block in page.get_text("blocks") if block[6] == 0]
+    text_coverage = _coverage(text_blocks, page.rect)
+    image_coverage = _coverage([image["bbox"] for image in images], page.rect)
+    if image_coverage >= SCANNED_IMAGE_COVERAGE and text_coverage < SCANNED_TEXT_COVERAGE:
+        return False
+
+    return True
+
+
+def _body_font_size(page) -> Optional[float]:
+    """Returns the font size that covers the most characters on the page, if it has any text."""
+    chars_by_size = {}
+    for block in page.get_text("dict", flags=pymupdf.TEXTFLAGS_TEXT)["blocks"]:
+        for line in block.get("lines", []):
+            for span in line["spans"]:
+                chars = len(span["text"].strip())
+                if chars and span["size"] >= 1:
+                    size = round(span["size"], 1)
+                    chars_by_size[size] = chars_by_size.get(size, 0) + chars
+    return max(chars_by_size, key=chars_by_size.get) if chars_by_size else None
+
+
+def _scan_dpi(page) -> Optional[float]:
+    """Returns the resolution of the image the page is scanned from, if it is mostly an image."""
+    page_area = abs(page.rect)
+    for image in page.get_image_info():
+        bbox = pymupdf.Rect(image["bbox"])
+        if page_area and abs(bbox & page.rect) / page_area >= SCANNED_IMAGE_COVERAGE:
+            return max(image["width"], image["height"]) * 72 / max(bbox.width, bbox.height)
+    return None
+
+
+def _content_rect(page):
+    """Returns the part of the page with visible content plus a margin, or the whole page."""
+    content = pymupdf.EMPTY_RECT()
+    for block in page.get_text("blocks"):
+        content |= pymupdf.Rect(block[:4])
+    for kind, bbox in page.get_bboxlog():
+        if not kind.startswith("ignore") and "clip" not in kind:
+            content |= bbox
+    if content.is_empty:
+        return page.rect
+    margin = (-CONTENT_MARGIN, -CONTENT_MARGIN, CONTENT_MARGIN, CONTENT_MARGIN)
+    clip = (content + margin) & page.rect
+    return page.rect if clip.is_empty else clip
+
+
+def _has_color(page) -> bool:
+    """Looks for coloured pixels on a low-resolution rendering of the page."""
+    pix = page.get_pixmap(dpi=COLOR_PROBE_DPI, colorspace=pymupdf.csRGB, alpha=False)
+    pixels = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, 3)
+    spread = pixels.max(axis=2) - pixels.min(axis=2)
+    return np.count_nonzero(spread > COLOR_TOLERANCE) > COLOR_PIXEL_RATIO * spread.size
+
+
+def choose_page_render(page, settings: RenderSettings = RenderSettings()) -> PageRender:
+    """Picks the resolution, colour mode and area to render `page` with for OCR."""
+    font_size = _body_font_size(page)
+    dpi = settings.text_height * 72 / font_size if font_size else settings.default_dpi
+
+    # Rendering a scan above its own resolution only adds pixels
+    scan_dpi = _scan_dpi(page)
+    if scan_dpi:
+        dpi = min(dpi, scan_dpi)
+
+    clip = _content_rect(page) if settings.clip_to_content else page.rect
+    square_inches = clip.width * clip.height / 72**2
+    if square_inches:
+        dpi = min(dpi, math.sqrt(settings.max_pixels / square_inches))
+    dpi = round(min(max(dpi, settings.min_dpi), settings.max_dpi))
+
+    grayscale = settings.grayscale and not _has_color(page)
+    return PageRender(dpi, grayscale, clip)
+
+
+def _rasterize(page, settings: RenderSettings):
+    render = choose_page_render(page, settings)
+    pix = page.get_pixmap(
+        dpi=render.dpi,
+        colorspace=pymupdf.csGRAY if render.grayscale else pymupdf.csRGB,
+        clip=render.clip,
+        alpha=False,
+    )
+    mode = "L" if render.grayscale else "RGB"
+    origin = (render.clip.x0, render.clip.y0)
+    frame = PageFrame(page.number, mode, pix.width, pix.height, pix.samples, render.dpi, origin)
+    return frame, render
+
+
+def render_frame(page, settings: RenderSettings = RenderSettings()) -> PageFrame:
+    """Rasterizes `page` for OCR into raw pixel bytes."""
+    return _rasterize(page, settings)[0]
+
+
+def render_page(page, settings: RenderSettings = RenderSettings()):
+    """Rasterizes `page` for OCR and returns the image together with the settings used."""
+    frame, render = _rasterize(page, settings)
+    return frame.to_image(), render
+
+
+# PDF document opened by each worker process of a RenderWorkerPool
+_worker_doc = None
+_worker_settings = None
+
+
+def _init_render_worker(pdf_path, settings):
+    global _worker_doc, _worker_settings
+    _worker_doc = pymupdf.open(pdf_path)
+    _worker_settings = settings
+
+
+def _worker_render(page_numbers):
+    return [render_frame(_worker_doc[number], _worker_settings) for number in page_numbers]
+
+
+class RenderWorkerPool:
+    """Renders pages of one PDF in worker processes that each open their own copy of it.
+
+    Rendering is CPU-bound and holds the GIL, so on scanned books it is spread over processes.
+    Pages come back as `PageFrame` byte buffers rather than pickled images."""
+
+    def __init__(self, pdf_path: str, workers: int, settings: Optional[RenderSettings] = None):
+        if workers <= 0:
+            raise ValueError("workers must be a positive integer.")
+        self.workers = workers
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_render_worker,
+            initargs=(pdf_path, settings or RenderSettings()),
+        )
+        logger.info(f"Starting {workers} page rendering workers")
+
+    def render(self, page_numbers: List[int]) -> List[Future]:
+        """Splits the pages into one contiguous range per worker and queues them.
+
+        Each future resolves to the frames of its range; together they are in page order."""
+        size = -(-len(page_numbers) // self.workers)
+        return [
+            self._executor.submit(_worker_render, page_numbers[i : i + size])
+            for i in range(0, len(page_numbers), size)
+        ]
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def extract_native_lines(page) -> List[OCRLine]:
+    """Extracts the page's embedded text lines in reading order, skipping blank ones."""
+    lines = []
+    blocks = page.get_text("dict", sort=True, flags=pymupdf.TEXTFLAGS_TEXT)["blocks"]
+    for block in blocks:
+        for line in block.get("lines", ()):
+            text = "".join(span["text"] for span in line["spans"]).strip()
+            if text:
+                lines.append(OCRLine(text, tuple(line["bbox"])))
+    return lines
+
+
+def extract_native_text(page):
+    """Extracts the page's embedded text in reading order, one line per row like OCR output."""
+    return "".join(f"{line.text}\n" for line in extract_native_lines(page))
+
+
+def _ocr_lines(prediction, frame) -> List[OCRLine]:
+    """Converts Surya's text lines on a rendered frame to lines in PDF points."""
+    scale = 72 / frame.dpi
+    x0, y0 = frame.origin
+    return [
+        OCRLine(
+            line.text,
+            (
+                x0 + line.bbox[0] * scale,
+                y0 + line.bbox[1] * scale,
+                x0 + line.bbox[2] * scale,
+                y0 + line.bbox[3] * scale,
+            ),
+            getattr(line, "confidence", None),
+        )
+        for line in prediction.text_lines
+    ]
+
+
+def _available_memory(device) -> Optional[int]:
+    """Returns the free memory in bytes of `device`, or None when it can't be determined."""
+    if str(device).startswith("cuda"):
+        import torch
+
+        return torch.cuda.mem_get_info(torch.device(device))[0]
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def resolve_ocr_batch_sizes(batch_sizes=None, device="cpu") -> OCRBatchSizes:
+    """Fills in the batch sizes left unset in `batch_sizes` from the memory free on `device`.
+
+    When the free memory is unknown, unset sizes stay `None` and Surya's defaults apply."""
+    batch_sizes = batch_sizes or OCRBatchSizes()
+    memory = _available_memory(device)
+    if memory is None:
+        return batch_sizes
+    budget = memory * OCR_MEMORY_FRACTION
+    return OCRBatchSizes(
+        detection=batch_sizes.detection
+        or max(1, min(MAX_DETECTION_BATCH_SIZE, int(budget // DETECTION_ITEM_BYTES))),
+        recognition=batch_sizes.recognition
+        or max(1, min(MAX_RECOGNITION_BATCH_SIZE, int(budget // RECOGNITION_ITEM_BYTES))),
+    )
+
+
+def _size_bucket(image):
+    """Groups images of the same mode whose width and height are in the same size class."""
+    width, height = image.size
+    return (
+        image.mode,
+        round(math.log2(max(width, 1)) * SIZE_BUCKET_STEPS),
+        round(math.log2(max(height, 1)) * SIZE_BUCKET_STEPS),
+    )
+
+
+def run_page_ocr(images, language, ocr_models, batch_sizes=None):
+    """Runs text detection and recognition on a batch of page images.
+
+    This is what Surya's `run_ocr` does, split in two so each step can be timed on its own.
+    Sizes set in `batch_sizes` are passed on to Surya, the others use Surya's defaults."""
+    batch_sizes = batch_sizes or OCRBatchSizes()
+    det_kwargs = {"batch_size": batch_sizes.detection} if batch_sizes.detection else {}
+    rec_kwargs = {"batch_size": batch_sizes.recognition} if batch_sizes.recognition else {}
+    metrics = get_metrics()
+    with metrics.span("ocr.detect", pages=len(images)):
+        det_predictions = batch_text_detection(
+            images, ocr_models.det_model, ocr_models.det_processor, **det_kwargs
+        )
+
+    polygons = [[box.polygon for box in det_pred.bboxes] for det_pred in det_predictions]
+    with metrics.span("ocr.recognize", pages=len(images), lines=sum(map(len, polygons))):
+        predictions = run_recognition(
+            images,
+            [[language]] * len(images),
+            ocr_models.rec_model,
+            ocr_models.rec_processor,
+            polygons=polygons,
+            **rec_kwargs,
+        )
+
+    # Drop empty lines and put the rest in reading order, like `run_ocr`
+    for prediction in predictions:
+        prediction.text_lines = sort_text_lines(
+            [line for line in prediction.text_lines if line.text]
+        )
+    return predictions
+
+
+def run_bucketed_ocr(images, language, ocr_models, batch_sizes=None):
+    """Runs OCR on page images grouped by size, and returns the predictions in input order.
+
+    Surya pads the images of a batch to a common size, so a cover or a plate in a batch of text
+    pages wastes memory and time. Each group of similarly sized pages is sent on its own, and
+    its timing is logged and recorded as an `ocr.batch` span."""
+    buckets: Dict[Any, List[int]] = {}
+    for index, image in enumerate(images):
+        buckets.setdefault(_size_bucket(image), []).append(index)
+
+    metrics = get_metrics()
+    predictions = [None] * len(images)
+    for indices in buckets.values():
+        width, height = images[indices[0]].size
+        started = time.perf_counter()
+        with metrics.span("ocr.batch", pages=len(indices), size=f"{width}x{height}"):
+            bucket_predictions = run_page_ocr(
+                [images[i] for i in indices], language, ocr_models, batch_sizes
+            )
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"OCR batch of {len(indices)} pages around {width}x{height} px: {elapsed:.2f}s "
+            f"({elapsed / len(indices):.2f}s per page)"
+        )
+        for index, prediction in zip(indices, bucket_predictions):
+            predictions[index] = prediction
+    return predictions
+
+
+def iter_document_pages(
+    pdf_path,
+    language,
+    batch_size=8,
+    use_text_layer=True,
+    ocr_models=None,
+    checkpoint=None,
+    render_settings=None,
+    render_workers=1,
+    ocr_batch_sizes=None,
+) -> Iterator[OCRPage]:
+    """Yields each page as an `OCRPage`, rendering and recognizing `batch_size` pages at a time.
+
+    Only one batch of page images is held in memory at once, so callers can start working on
+    the first pages while the rest of the document is still being recognized. When
+    `use_text_layer` is set, pages with a trustworthy embedded text layer skip OCR entirely.
+    OCR models come from the process-wide registry unless `ocr_models` is given. With a
+    `checkpoint`, every page is saved as it completes and pages saved by an earlier run are
+    reused instead of being processed again. Pages are rasterized according to
+    `render_settings`, or `RenderSettings()` when not given. With several `render_workers`,
+    pages are rendered in worker processes while the previous batch is being recognized.
+    Within a batch, pages are sent to OCR grouped by rendered size, with Surya batch sizes from
+    `ocr_batch_sizes` completed by `resolve_ocr_batch_sizes`."""
+    from surya.languages import CODE_TO_LANGUAGE
+
+    if batch_size <= 0:
+        raise ValueError("batch_size must be a positive integer.")
+    if render_workers <= 0:
+        raise ValueError("render_workers must be a positive integer.")
+    if language not in CODE_TO_LANGUAGE:
+        raise ValueError(f"Unsupported OCR language: {language}")
+    if render_settings is None:
+        render_settings = RenderSettings()
 
-def process_pdf(pdf_path, language):
     # Load the PDF
     doc = pymupdf.open(pdf_path)
-    images = []
-    for page in doc:
-        pix = page.get_pixmap()
-        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-        images.append(img)
-
-    # Load models
-    det_processor, det_model = load_det_processor(), load_det_model()
-    rec_model, rec_processor = load_rec_model(), load_rec_processor()
-
-    # Run OCR
-    langs = [language]
-    predictions = run_ocr(
-        images, [langs] * len(images), det_model, det_processor, rec_model, rec_processor
-    )
+    metrics = get_metrics()
+    native_pages = ocr_pages = resumed_pages = 0
+    pool = None
+    resolved_batch_sizes = None
+
+    def make_page(number, source, lines):
+        rect = doc[number].rect
+        return OCRPage(number, rect.width, rect.height, source, tuple(lines))
+
+    def plan(start):
+        # Fill in the pages that need no OCR and queue the rendering of the others
+        nonlocal native_pages, resumed_pages, pool
+        stop = min(start + batch_size, doc.page_count)
+        pages = [None] * (stop - start)
+        page_numbers = []
+        for slot, page in enumerate(doc.pages(start, stop)):
+            if checkpoint is not None:
+                saved = checkpoint.load_text("ocr", start + slot)
+                if saved is not None:
+                    pages[slot] = make_page(start + slot, "checkpoint", _load_lines(saved))
+                    resumed_pages += 1
+                    continue
+            if use_text_layer and has_trustworthy_text_layer(page):
+                pages[slot] = make_page(start + slot, "text_layer", extract_native_lines(page))
+                native_pages += 1
+                if checkpoint is not None:
+                    checkpoint.save_text("ocr", start + slot, _dump_lines(pages[slot].lines))
+                continue
+            page_numbers.append(start + slot)
+
+        renders = None
+        if page_numbers and render_workers > 1:
+            if pool is None:
+                pool = RenderWorkerPool(pdf_path, render_workers, render_settings)
+            renders = pool.render(page_numbers)
+        return start, pages, page_numbers, renders
+
+    def rasterize(page_numbers, renders):
+        if renders is not None:
+            with metrics.span("ocr.rasterize_wait", pages=len(page_numbers)) as span:
+                frames = [frame for future in renders for frame in future.result()]
+                span["pixels"] = sum(frame.width * frame.height for frame in frames)
+        else:
+            frames = []
+            for number in page_numbers:
+                with metrics.span("ocr.rasterize", page=number) as span:
+                    frames.append(render_frame(doc[number], render_settings))
+                    span["pixels"] = frames[-1].width * frames[-1].height
+        for frame in frames:
+            logger.debug(
+                f"Page {frame.page}: {frame.dpi} dpi, {frame.mode}, {frame.width}x{frame.height}"
+            )
+        return frames
+
+    try:
+        # With render workers, the next batch is rendered while this one is recognized
+        planned = deque()
+        next_start = 0
+        while planned or next_start < doc.page_count:
+            while next_start < doc.page_count and len(planned) < (2 if render_workers > 1 else 1):
+                planned.append(plan(next_start))
+                next_start += batch_size
+            start, pages, page_numbers, renders = planned.popleft()
+
+            if page_numbers:
+                frames = rasterize(page_numbers, renders)
+                images = [frame.to_image() for frame in frames]
+
+                # Fetch models only once a page actually needs them
+                if ocr_models is None:
+                    ocr_models = get_ocr_models()
+                if resolved_batch_sizes is None:
+                    device = getattr(ocr_models.det_model, "device", "cpu")
+                    resolved_batch_sizes = resolve_ocr_batch_sizes(ocr_batch_sizes, device)
+                    logger.info(f"OCR batch sizes: {resolved_batch_sizes}")
+
+                # Run OCR
+                predictions = run_bucketed_ocr(images, language, ocr_models, resolved_batch_sizes)
+                del images
+
+                # Collect the recognized lines
+                for frame, prediction in zip(frames, predictions):
+                    page = make_page(frame.page, "ocr", _ocr_lines(prediction, frame))
+                    pages[frame.page - start] = page
+                    if checkpoint is not None:
+                        checkpoint.save_text("ocr", frame.page, _dump_lines(page.lines))
+                ocr_pages += len(page_numbers)
+
+            yield from pages
+    finally:
+        if pool is not None:
+            pool.close()
+        doc.close()
+        metrics.count("ocr.pages_text_layer", native_pages)
+        metrics.count("ocr.pages_ocr", ocr_pages)
+        logger.info(
+            f"Pages read from the text layer: {native_pages}, pages OCR'd: {ocr_pages}, "
+            f"pages resumed from checkpoint: {resumed_pages}"
+        )
+
+
+def iter_pdf_pages(pdf_path, language, strip_headers=False, **options):
+    """Yields the text of each page, one line per row. See `iter_document_pages`.
+
+    With `strip_headers`, page numbers and running headers and footers are left out."""
+    pages = iter_document_pages(pdf_path, language, **options)
+    try:
+        for page in strip_headers_and_footers(pages) if strip_headers else pages:
+            yield page.text
+    finally:
+        pages.close()
+
+
+def read_pdf_document(pdf_path, language, strip_headers=False, **options) -> OCRDocument:
+    """Reads the whole PDF into an `OCRDocument`. See `iter_document_pages`.
 
-    # Extract text
-    pages_text = []
-    for page_ocr_result in predictions:
-        page_text = ""
-        for line in page_ocr_result.text_lines:
-            page_text += line.text + "\n"
-        pages_text.append(page_text)
+    With `strip_headers`, page numbers and running headers and footers are left out."""
+    pages = iter_document_pages(pdf_path, language, **options)
+    if strip_headers:
+        pages = strip_headers_and_footers(pages)
+    return OCRDocument(tuple(pages))
 
-    # Combine pages
-    full_text = "\n\n".join(pages_text)
 
-    return full_text
+def process_pdf(
+    pdf_path,
+    language,
+    batch_size=8,
+    use_text_layer=True,
+    ocr_models=None,
+    checkpoint=None,
+    render_settings=None,
+    render_workers=1,
+    ocr_batch_sizes=None,
+    strip_headers=False,
+):
+    return read_pdf_document(
+        pdf_path,
+        language,
+        batch_size=batch_size,
+        use_text_layer=use_text_layer,
+        ocr_models=ocr_models,
+        checkpoint=checkpoint,
+        render_settings=render_settings,
+        render_workers=render_workers,
+        ocr_batch_sizes=ocr_batch_sizes,
+        strip_headers=strip_headers,
+    ).full_text
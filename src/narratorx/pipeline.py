@@ -0,0 +1,378 @@
+# narratorx/pipeline.py
+
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from narratorx.llm import (
+    chunk_token_budget,
+    fix_chunk,
+    get_rate_limiter,
+    is_clean_chunk,
+    load_prompts,
+    pass_through_chunk,
+)
+from narratorx.ocr import iter_pdf_pages
+from narratorx.tts import (
+    DEFAULT_SPEAKER,
+    TTSWorkerPool,
+    create_tts_model,
+    get_conditioning,
+    iter_synthesized_chunks,
+    open_audio_output,
+)
+from narratorx.tts import split_text_into_chunks as split_text_for_tts
+from narratorx.utils import (
+    CHARS_PER_TOKEN,
+    join_segmented,
+    pack_text,
+    resegment,
+    segment_text,
+)
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of a stage's output
+_END = object()
+
+
+class PipelineStopped(Exception):
+    """Raised inside a stage when another stage has failed and the pipeline is shutting down."""
+
+
+class StageStats:
+    """Throughput and queue depth counters for a single pipeline stage."""
+
+    def __init__(self, name, unit):
+        self.name = name
+        self.unit = unit
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.max_queue_depth = 0
+        self.started = time.monotonic()
+        self.finished = None
+
+    def record(self, busy_seconds, queue_depth=None):
+        self.items += 1
+        self.busy_seconds += busy_seconds
+        if queue_depth is not None:
+            self.max_queue_depth = max(self.max_queue_depth, queue_depth)
+        logger.debug(
+            f"{self.name}: {self.items} {self.unit} done"
+            + (f", output queue depth {queue_depth}" if queue_depth is not None else "")
+        )
+
+    def finish(self):
+        self.finished = time.monotonic()
+
+    def summary(self):
+        elapsed = (self.finished or time.monotonic()) - self.started
+        rate = self.items / elapsed if elapsed > 0 else 0.0
+        return (
+            f"{self.name}: {self.items} {self.unit} in {elapsed:.1f}s ({rate:.2f} {self.unit}/s), "
+            f"busy {self.busy_seconds:.1f}s, max output queue depth {self.max_queue_depth}"
+        )
+
+
+def _put(q, item, stop):
+    """Puts `item` on a bounded queue, blocking while it is full unless the pipeline stops."""
+    while True:
+        if stop.is_set():
+            raise PipelineStopped()
+        try:
+            q.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+def _get(q, stop):
+    """Takes the next item off a queue, blocking while it is empty unless the pipeline stops."""
+    while True:
+        if stop.is_set():
+            raise PipelineStopped()
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+
+
+def _ocr_stage(pages, page_queue, stop, stats):
+    try:
+        started = time.monotonic()
+        for page_text in pages:
+            busy_seconds = time.monotonic() - started
+            _put(page_queue, page_text, stop)
+            stats.record(busy_seconds, page_queue.qsize())
+            started = time.monotonic()
+        _put(page_queue, _END, stop)
+    finally:
+        pages.close()
+        stats.finish()
+
+
+def _llm_stage(
+    page_queue, chunk_queue, stop, stats, fix, language, concurrency, max_chars, max_tokens, model
+):
+    pending = deque()
+    # Rough chunk length in characters; twice as much text is buffered before packing
+    chunk_chars = min(max_chars or max_tokens * CHARS_PER_TOKEN, max_tokens * CHARS_PER_TOKEN)
+    next_index = 0
+
+    def timed_fix(index, chunk):
+        started = time.monotonic()
+        return fix(index, chunk), time.monotonic() - started
+
+    def submit(executor, chunk):
+        nonlocal next_index
+        pending.append(executor.submit(timed_fix, next_index, chunk))
+        next_index += 1
+
+    def drain(limit):
+        # Hand finished chunks downstream in order, keeping at most `limit` requests in flight
+        while len(pending) > limit:
+            fixed_text, busy_seconds = pending.popleft().result()
+            _put(chunk_queue, fixed_text, stop)
+            stats.record(busy_seconds, chunk_queue.qsize())
+
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        buffer = ""
+        while True:
+            page_text = _get(page_queue, stop)
+            if page_text is _END:
+                break
+            # Each page is segmented once; the held-back tail keeps its sentence index
+            page = segment_text(page_text, language)
+            buffer = join_segmented([buffer, page]) if buffer else page
+
+            # Send every complete chunk, keeping the tail back in case the next page extends it
+            if len(buffer) >= 2 * chunk_chars:
+                chunks = pack_text(buffer, max_chars, max_tokens, model)
+                for chunk in chunks[:-1]:
+                    submit(executor, chunk)
+                    drain(concurrency - 1)
+                buffer = chunks[-1] if chunks else ""
+
+        if buffer.strip():
+            for chunk in pack_text(buffer, max_chars, max_tokens, model):
+                submit(executor, chunk)
+                drain(concurrency - 1)
+        drain(0)
+        _put(chunk_queue, _END, stop)
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+        stats.finish()
+    return next_index
+
+
+def run_pipeline(
+    pdf_path,
+    language,
+    output_path,
+    model_name="gpt-4o-mini",
+    max_chars_llm=None,
+    max_tokens=4000,
+    max_characters_tts=290,
+    tts_batch_size=1,
+    tts_workers=1,
+    voice=None,
+    voices=None,
+    use_llm_splitter=False,
+    ocr_batch_size=8,
+    use_text_layer=True,
+    render_settings=None,
+    render_workers=1,
+    ocr_batch_sizes=None,
+    strip_headers=True,
+    llm_concurrency=1,
+    requests_per_minute=None,
+    max_retries=0,
+    llm_skip_threshold=None,
+    tts_model=None,
+    llm_cache=None,
+    tts_cache=None,
+    checkpoint=None,
+    queue_size=16,
+):
+    """Converts a PDF to an audiobook with OCR, LLM cleanup and TTS running concurrently.
+
+    OCR streams pages into a bounded queue, the LLM stage turns them into fixed chunks on a
+    second bounded queue, and TTS writes each chunk to the output as soon as it arrives. Full
+    queues block the stage feeding them, so wall-clock time approaches that of the slowest
+    stage instead of the sum of all three. Per-stage throughput is logged when the run ends."""
+    if llm_concurrency <= 0:
+        raise ValueError("llm_concurrency must be a positive integer.")
+    if queue_size <= 0:
+        raise ValueError("queue_size must be a positive integer.")
+    if tts_batch_size <= 0:
+        raise ValueError("tts_batch_size must be a positive integer.")
+
+    if tts_workers <= 0:
+        raise ValueError("tts_workers must be a positive integer.")
+
+    pool = None
+    if tts_workers > 1:
+        pool = TTSWorkerPool(tts_workers, voices_path=voices.path if voices else None)
+        samplerate = pool.output_sample_rate
+    else:
+        if tts_model is None:
+            tts_model = create_tts_model()
+        samplerate = tts_model.synthesizer.output_sample_rate
+    conditioning = None
+    if pool is None and (voice or tts_batch_size > 1):
+        conditioning = get_conditioning(tts_model, voice or DEFAULT_SPEAKER, voices)
+
+    system_prompt, user_prompt_template = load_prompts(language)
+    token_budget = chunk_token_budget(model_name, max_tokens, system_prompt, user_prompt_template)
+    rate_limiter = (
+        get_rate_limiter(model_name, requests_per_minute) if requests_per_minute else None
+    )
+
+    def fix(index, chunk):
+        if checkpoint is not None:
+            saved = checkpoint.load_text("llm", index, source=chunk)
+            if saved is not None:
+                return resegment(saved, chunk, language)
+        if is_clean_chunk(chunk, llm_skip_threshold):
+            fixed_text = pass_through_chunk(chunk, system_prompt, user_prompt_template)
+        else:
+            fixed_text = fix_chunk(
+                chunk,
+                system_prompt,
+                user_prompt_template,
+                model_name,
+                max_tokens,
+                rate_limiter=rate_limiter,
+                cache=llm_cache,
+                max_retries=max_retries,
+            )
+        if checkpoint is not None:
+            checkpoint.save_text("llm", index, fixed_text, source=chunk)
+        # Segmenting here keeps sentence tokenization off the TTS thread
+        return resegment(fixed_text, chunk, language)
+
+    page_queue = queue.Queue(maxsize=queue_size)
+    chunk_queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+    ocr_stats = StageStats("OCR", "pages")
+    llm_stats = StageStats("LLM", "chunks")
+    tts_stats = StageStats("TTS", "chunks")
+
+    def run_stage(target, *args):
+        try:
+            target(*args)
+        except PipelineStopped:
+            pass
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+
+    pages = iter_pdf_pages(
+        pdf_path,
+        language,
+        batch_size=ocr_batch_size,
+        use_text_layer=use_text_layer,
+        checkpoint=checkpoint,
+        render_settings=render_settings,
+        render_workers=render_workers,
+        ocr_batch_sizes=ocr_batch_sizes,
+        strip_headers=strip_headers,
+    )
+    threads = [
+        threading.Thread(
+            target=run_stage,
+            args=(_ocr_stage, pages, page_queue, stop, ocr_stats),
+            name="narratorx-ocr",
+            daemon=True,
+        ),
+        threading.Thread(
+            target=run_stage,
+            args=(
+                _llm_stage,
+                page_queue,
+                chunk_queue,
+                stop,
+                llm_stats,
+                fix,
+                language,
+                llm_concurrency,
+                max_chars_llm,
+                token_budget,
+                model_name,
+            ),
+            name="narratorx-llm",
+            daemon=True,
+        ),
+    ]
+    for thread in threads:
+        thread.start()
+
+    # TTS runs on the calling thread, writing each chunk as soon as it is synthesized
+    frames_written = 0
+    tts_index = 0
+    try:
+        with open_audio_output(output_path, samplerate) as out:
+            while True:
+                fixed_text = _get(chunk_queue, stop)
+                if fixed_text is _END:
+                    break
+                started = time.monotonic()
+                chunk_texts = [
+                    chunk_text.strip()
+                    for chunk_text in split_text_for_tts(
+                        fixed_text,
+                        max_characters_tts,
+                        language=language,
+                        model_name=model_name,
+                        use_llm_splitter=use_llm_splitter,
+                    )
+                    if chunk_text.strip()
+                ]
+                wavs = iter_synthesized_chunks(
+                    tts_model,
+                    chunk_texts,
+                    language,
+                    first_index=tts_index,
+                    batch_size=tts_batch_size,
+                    conditioning=conditioning,
+                    cache=tts_cache,
+                    checkpoint=checkpoint,
+                    pool=pool,
+                    voice=voice,
+                )
+                for wav in wavs:
+                    if len(wav) > 0:
+                        out.write(wav)
+                        out.flush()
+                        frames_written += len(wav)
+                tts_index += len(chunk_texts)
+                tts_stats.record(time.monotonic() - started)
+    except PipelineStopped:
+        pass
+    finally:
+        # Upstream stages are done once TTS has seen the end marker; otherwise make them stop
+        stop.set()
+        tts_stats.finish()
+        for thread in threads:
+            thread.join()
+        if pool is not None:
+            pool.close()
+
+    if errors:
+        raise errors[0]
+
+    for stats in (ocr_stats, llm_stats, tts_stats):
+        logger.info(stats.summary())
+
+    if not frames_written:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise ValueError("No audio data was generated; the input text may be empty or invalid.")
@@ -0,0 +1,44 @@
+# narratorx/progress.py
+
+from typing import Optional
+
+from tqdm import tqdm
+
+
+class ProgressReporter:
+    """Receives the progress of a long-running stage, independently of any user interface.
+
+    `start` is called once with the number of items, `advance` after each finished item and
+    `finish` at the end, also when the stage fails. `event` carries stage-specific details such
+    as the text of the chunk just synthesized. The base class ignores everything."""
+
+    def start(self, total: int, description: str = ""):
+        pass
+
+    def advance(self, count: int = 1):
+        pass
+
+    def event(self, name: str, **fields):
+        pass
+
+    def finish(self):
+        pass
+
+
+class TqdmProgress(ProgressReporter):
+    """Shows progress as a terminal progress bar."""
+
+    def __init__(self):
+        self._bar: Optional[tqdm] = None
+
+    def start(self, total: int, description: str = ""):
+        self._bar = tqdm(total=total, desc=description)
+
+    def advance(self, count: int = 1):
+        if self._bar is not None:
+            self._bar.update(count)
+
+    def finish(self):
+        if self._bar is not None:
+            self._bar.close()
+            self._bar = None
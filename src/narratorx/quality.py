@@ -0,0 +1,96 @@
+# narratorx/quality.py
+
+import re
+import unicodedata
+from typing import Iterator, Tuple
+
+from narratorx.layout import find_page_furniture
+
+# Text that ends a line without the sentence going on to the next one
+TERMINAL_PUNCTUATION = '.!?…:;"”»’)]'
+# Characters that may surround a word without making it suspect
+WORD_PUNCTUATION = "\"'“”‘’«»„()[]{}.,;:!?…—–-*"
+
+WORD_PATTERN = re.compile(r"[^\W\d_]+(?:['’-][^\W\d_]+)*")
+NUMBER_PATTERN = re.compile(r"\d+(?:[.,:/]\d+)*(?:%|st|nd|rd|th|'s|’s)?")
+BREAK_PATTERN = re.compile(r"[ \t]*\n\s*")
+# Lines at least this share of the usual line width, taken at this percentile, are wrapped
+WRAP_RATIO = 0.75
+WRAP_PERCENTILE = 0.9
+
+
+def _line_breaks(text: str) -> Iterator[Tuple[re.Match, str]]:
+    """Yields each line break of `text` with what it most likely is.
+
+    "join" is a line wrapped mid-sentence, "keep" the end of a sentence, paragraph or heading,
+    "hyphen" a word hyphenated across lines, and "broken" a short line that the sentence goes
+    on from, as left by figures, columns or OCR errors. The last two can't be joined safely."""
+    lengths = sorted(len(line.strip()) for line in text.splitlines() if line.strip())
+    wrap_width = lengths[int(len(lengths) * WRAP_PERCENTILE)] * WRAP_RATIO if lengths else 0
+    for match in BREAK_PATTERN.finditer(text):
+        if match.start() == 0 or match.end() == len(text):
+            continue
+        last, first = text[match.start() - 1], text[match.end()]
+        line_start = text.rfind("\n", 0, match.start()) + 1
+        wrapped = match.start() - line_start >= wrap_width
+        if last == "-" and first.islower():
+            yield match, "hyphen"
+        elif last in TERMINAL_PUNCTUATION:
+            yield match, "keep"
+        elif wrapped or last == ",":
+            yield match, "join"
+        elif first.islower():
+            yield match, "broken"
+        else:
+            yield match, "keep"
+
+
+def _is_clean_word(token: str) -> bool:
+    """Returns whether `token` looks like a correctly recognized word or number."""
+    token = token.strip(WORD_PUNCTUATION)
+    if not token or NUMBER_PATTERN.fullmatch(token):
+        return True
+    if not WORD_PATTERN.fullmatch(token):
+        return False
+    for part in re.split(r"['’-]", token):
+        if not (part.islower() or part.isupper() or part.istitle()):
+            return False
+    scripts = {unicodedata.name(char, "?").split(" ")[0] for char in token if char.isalpha()}
+    return len(scripts) == 1
+
+
+def score_text(text: str) -> float:
+    """Scores how clean `text` is, from 0 to 1, without a language model.
+
+    The score is the share of words that look correctly recognized: letters of one script in a
+    plain casing pattern, or numbers. Lines without any letter or digit, words hyphenated
+    across lines and broken lines count as suspect too. Text with page numbers or running
+    headers left in it scores 0, since removing them is part of the LLM's job."""
+    if any(find_page_furniture(text)):
+        return 0.0
+    tokens = [token for token in text.split() if token.strip(WORD_PUNCTUATION)]
+    clean = sum(_is_clean_word(token) for token in tokens)
+    uncertain = sum(kind in ("hyphen", "broken") for _, kind in _line_breaks(text))
+    uncertain += sum(
+        1 for line in text.splitlines() if line.strip() and not any(map(str.isalnum, line))
+    )
+    total = len(tokens) + uncertain
+    return clean / total if total else 1.0
+
+
+def reflow_text(text: str) -> str:
+    """Joins lines wrapped mid-sentence and words hyphenated across lines, as the LLM would.
+
+    Broken lines are joined too, as the best guess for text that skips the LLM."""
+    parts = []
+    position = 0
+    for match, kind in _line_breaks(text):
+        if kind == "hyphen":
+            parts.append(text[position : match.start() - 1])
+        elif kind in ("join", "broken"):
+            parts.append(text[position : match.start()] + " ")
+        else:
+            continue
+        position = match.end()
+    parts.append(text[position:])
+    return "".join(parts)
@@ -1,19 +1,45 @@
 import json
+import logging
+import multiprocessing
 import os
-from typing import List
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import List, Optional
 
-import nltk
 import numpy as np
 import soundfile as sf
-import streamlit as st
-import torch
-from litellm import completion
-from nltk.tokenize import sent_tokenize
 from pydantic import BaseModel
-from tqdm import tqdm
-from TTS.api import TTS
 
-nltk.download("punkt_tab")
+from narratorx.cache import DiskCache, make_cache_key
+from narratorx.lazy import LazyImport
+from narratorx.metrics import ListSink, Metrics, get_metrics, set_metrics
+from narratorx.progress import ProgressReporter, TqdmProgress
+from narratorx.utils import segment_text
+from narratorx.voices import VoiceRegistry, voice_id
+
+torch = LazyImport("torch")
+TTS = LazyImport("TTS.api", "TTS")
+completion = LazyImport("litellm", "completion")
+
+logger = logging.getLogger(__name__)
+
+TTS_MODEL_NAME = "xtts_v2.0.2"
+DEFAULT_SPEAKER = "Asya Anara"
+DEFAULT_TTS_CACHE_BYTES = 4 * 1024 * 1024 * 1024
+# Samples of silence the TTS synthesizer appends after each sentence
+SENTENCE_SILENCE = 10000
+# Chunks looked at together when grouping them into batches, as a multiple of the batch size
+BATCH_WINDOW = 4
+# Share of a chunk's token length it may be padded by to share a batch with longer chunks
+MAX_BATCH_PADDING = 0.25
+# Where overlong TTS fragments are cut first, before conjunctions or plain whitespace
+CLAUSE_PUNCTUATION = [",", ";", ":", "—", "–", "，", "；", "：", "、", "،", "؛"]
+# libsndfile command that rewrites the file header after every write
+SFC_SET_UPDATE_HEADER_AUTO = 0x1061
+
+# Voices resolved for callers that do not pass a registry of their own
+_default_voices = VoiceRegistry(model_name=TTS_MODEL_NAME)
 
 # Define language-specific breakpoints
 language_breakpoints = {
@@ -35,36 +61,17 @@ language_breakpoints = {
     "kr": [" 그리고 ", " 그러나 ", " 또는 "],  # Korean
 }
 
-with open("src/narratorx/prompts/splitter_user_prompt.txt", "r", encoding="utf-8") as f:
-    user_prompt_template = f.read()
-with open("src/narratorx/prompts/splitter_system_prompt.txt", "r", encoding="utf-8") as f:
-    system_prompt_template = f.read()
-
-convert_language_code = {
-    "en": "english",
-    "es": "spanish",
-    "fr": "french",
-    "de": "german",
-    "it": "italian",
-    "pt": "portuguese",
-    "pl": "polish",
-    "tr": "turkish",
-    "ru": "russian",
-    "nl": "dutch",
-    "cz": "czech",
-    "ar": "english",  # there is no arabic in nltk
-    "cn": "english",  # there is no chinese in nltk
-    "jp": "english",  # there is no japanese in nltk
-    "hu": "english",  # there is no hungarian in nltk
-    "kr": "english",  # there is no korean in nltk
-}
-
 
 class LLMChunkSplitter(BaseModel):
     chunks: List[str]
 
 
 def split_with_llm(model_name, text, max_chars, language="en"):
+    with open("src/narratorx/prompts/splitter_user_prompt.txt", "r", encoding="utf-8") as f:
+        user_prompt_template = f.read()
+    with open("src/narratorx/prompts/splitter_system_prompt.txt", "r", encoding="utf-8") as f:
+        system_prompt_template = f.read()
+
     user_prompt = user_prompt_template.format(content=text, max_chars=max_chars)
     messages = [
         {"role": "system", "content": system_prompt_template},
@@ -81,145 +88,759 @@ def split_with_llm(model_name, text, max_chars, language="en"):
     return parsed_res["chunks"]
 
 
-def split_by_natural_breakpoints(text, max_chars, language="en", model_name="gpt-4o-mini"):
-    breakpoints = language_breakpoints.get(language, []) + [",", ";", ":"]
-    words = text.split()
-    chunks = []
-    current_chunk = ""
+def _split_on_breakpoints(text, max_chars, breakpoints):
+    """Packs the words of `text` into chunks of at most `max_chars`, breaking on `breakpoints`.
 
-    for word in words:
-        tentative = (current_chunk + " " + word).strip() if current_chunk else word
-        if len(tentative) <= max_chars:
-            current_chunk = tentative
-        else:
-            # If we can split on a breakpoint
-            if any(bp in current_chunk for bp in breakpoints):
-                for bp in breakpoints:
-                    if bp in current_chunk:
-                        parts = current_chunk.rsplit(bp, 1)
-                        # Append part before the breakpoint
-                        if not parts[0].endswith(bp):
-                            parts[0] += bp
-                        chunks.append(parts[0].strip())
-                        # Start new chunk after breakpoint + current word
-                        current_chunk = (parts[1] + " " + word).strip()
-                        break
+    When the next word does not fit, the chunk is cut after the last occurrence of the first
+    breakpoint (in list order) it contains and the remainder carries over; without one it is
+    cut before the word. Chunks are only as long as `max_chars` when the text allows it.
+
+    The current chunk is always a slice of the text with whitespace collapsed to single spaces,
+    so it is tracked by offsets alone: the words that still fit are found with one `rfind` for
+    the last space within reach, and breakpoints are only searched for when a chunk is cut."""
+    normalized = " ".join(text.split())
+    length = len(normalized)
+
+    chunks = []
+    start = end = 0  # the current chunk is normalized[start:end]
+    while True:
+        # Take every following word that still fits. A cut can leave a remainder that is
+        # already too long to take any.
+        limit = start + max_chars
+        if limit >= length:
+            end = length
+            break
+        if end < limit:
+            if normalized[limit] == " ":
+                end = limit
             else:
-                # No breakpoint found; finalize this chunk and start a new one
-                chunks.append(current_chunk.strip())
-                current_chunk = word
+                end = max(end, normalized.rfind(" ", end, limit))
+        if end == length:
+            break
+
+        # The next word does not fit
+        word_start = end + 1 if normalized[end] == " " else end
+        word_end = normalized.find(" ", word_start)
+        if word_end < 0:
+            word_end = length
+
+        for bp in breakpoints:
+            cut = normalized.rfind(bp, start, end)
+            if cut >= 0:
+                # Append part before the breakpoint
+                before = normalized[start:cut]
+                if not before.endswith(bp):
+                    before += bp
+                chunks.append(before.strip())
+                # Start new chunk after breakpoint + current word
+                start = cut + len(bp)
+                if normalized[start : start + 1] == " ":
+                    start += 1
+                break
+        else:
+            # No breakpoint found; finalize this chunk and start a new one
+            chunks.append(normalized[start:end])
+            start = word_start
+        end = word_end
+
+    if end > start:
+        chunks.append(normalized[start:end])
+    return chunks
+
+
+def _last_cut(text, max_chars, separators, after):
+    """Returns where to cut `text` at the last separator that keeps the head within
+    `max_chars`, cutting after the separator when `after` is set and before it otherwise."""
+    best = None
+    for sep in separators:
+        # The head must fit: it ends at the separator's end when cutting after it
+        pos = text.rfind(sep, 0, max_chars + (0 if after else len(sep)))
+        cut = pos + len(sep) if after else pos
+        if pos >= 0 and cut > 0 and (best is None or cut > best):
+            best = cut
+    return best
+
+
+def _midpoint_cut(text):
+    """Returns the position of the whitespace nearest the middle of `text`, if there is any."""
+    middle = len(text) // 2
+    before = text.rfind(" ", 0, middle + 1)
+    after = text.find(" ", middle)
+    candidates = [pos for pos in (before, after) if pos > 0]
+    return min(candidates, key=lambda pos: abs(pos - middle)) if candidates else None
+
+
+def split_locally(text, max_chars, language="en"):
+    """Splits `text` into pieces of at most `max_chars` characters without calling an LLM.
+
+    Each overlong piece is cut at the first of these that applies: the last clause punctuation
+    that fits, the last conjunction from `language_breakpoints` that fits (the conjunction
+    starts the next piece), the whitespace nearest the middle, and finally `max_chars`
+    itself. The result only depends on the input, and takes no longer than a few string scans
+    per piece."""
+    if max_chars <= 0:
+        raise ValueError("max_chars must be a positive integer.")
+    conjunctions = language_breakpoints.get(language, [])
+
+    pieces = []
+    stack = [" ".join(text.split())]
+    while stack:
+        piece = stack.pop().strip()
+        if len(piece) <= max_chars:
+            if piece:
+                pieces.append(piece)
+            continue
 
-    if current_chunk:
-        chunks.append(current_chunk.strip())
+        cut = _last_cut(piece, max_chars, CLAUSE_PUNCTUATION, after=True)
+        if cut is None:
+            cut = _last_cut(piece, max_chars, conjunctions, after=False)
+        if cut is None:
+            cut = _midpoint_cut(piece)
+        if cut is None:
+            cut = max_chars
+        # Push the tail first so the head is handled next
+        stack.append(piece[cut:])
+        stack.append(piece[:cut])
+    return pieces
+
+
+def split_by_natural_breakpoints(
+    text, max_chars, language="en", model_name="gpt-4o-mini", use_llm_splitter=False
+):
+    breakpoints = language_breakpoints.get(language, []) + [",", ";", ":"]
+    chunks = _split_on_breakpoints(text, max_chars, breakpoints)
 
     # At this point, we have chunks split by breakpoints, but they might still be too long.
-    # We involve LLM to split them further if needed.
+    # Split them further locally, or with the LLM when asked to.
     final_chunks = []
     for c in chunks:
         if len(c) > max_chars:
-            new_cs = split_with_llm(model_name, c, max_chars, language)
-            final_chunks.extend(new_cs)
+            if use_llm_splitter:
+                final_chunks.extend(split_with_llm(model_name, c, max_chars, language))
+            else:
+                final_chunks.extend(split_locally(c, max_chars, language))
         else:
             final_chunks.append(c)
     return final_chunks
 
 
-def split_text_into_chunks(text, max_chars, language="en", model_name="gpt-4o-mini"):
-    # Split text into paragraphs
-    paragraphs = text.strip().split("\n")
+def split_text_into_chunks(
+    text, max_chars, language="en", model_name="gpt-4o-mini", use_llm_splitter=False
+):
+    """Splits text into one chunk per sentence, cutting sentences longer than `max_chars`.
+
+    Text segmented by the LLM stage keeps its sentence index; plain text is segmented here."""
+    segmented = segment_text(text, language)
     all_chunks = []
 
-    for para in paragraphs:
-        para = para.strip()
-        # Split into sentences
-        sentences = sent_tokenize(para, language=convert_language_code[language])
-        for sent in sentences:
-            if len(sent) <= max_chars:
-                all_chunks.append(sent.strip())
-            else:
-                # Try splitting by natural breakpoints
-                chunks = split_by_natural_breakpoints(sent, max_chars, language, model_name)
-                all_chunks.extend(chunks)
+    for sent in segmented.sentence_texts():
+        if len(sent) <= max_chars:
+            all_chunks.append(sent.strip())
+        else:
+            # Try splitting by natural breakpoints
+            chunks = split_by_natural_breakpoints(
+                sent, max_chars, language, model_name, use_llm_splitter=use_llm_splitter
+            )
+            all_chunks.extend(chunks)
 
     return all_chunks
 
 
-@st.cache_resource
-def load_tts_model():
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    tts_model = TTS("xtts_v2.0.2").to(device)
+def create_tts_model(device=None):
+    if device is None:
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    tts_model = TTS(TTS_MODEL_NAME).to(device)
     return tts_model
 
 
+# Process-wide TTS models, keyed by device (`None` picks CUDA when available)
+_tts_models = {}
+_tts_models_lock = threading.Lock()
+
+
+def get_tts_model(device=None):
+    """Returns the shared TTS model for `device`, loading it on first use.
+
+    The model is loaded once per process and reused by every later call, so a long-running
+    process such as the web app or a batch worker does not pay the loading cost again."""
+    with _tts_models_lock:
+        tts_model = _tts_models.get(device)
+        if tts_model is None:
+            logger.info(f"Loading TTS model (device={device or 'default'})...")
+            tts_model = create_tts_model(device)
+            _tts_models[device] = tts_model
+    return tts_model
+
+
+def unload_tts_model(device=None):
+    """Drops the shared TTS model for `device` so its memory can be freed."""
+    with _tts_models_lock:
+        _tts_models.pop(device, None)
+
+
+def _audio_cache_key(chunk_text, language, speaker):
+    normalized_text = " ".join(chunk_text.split())
+    return make_cache_key("tts", normalized_text, language, voice_id(speaker), TTS_MODEL_NAME)
+
+
+def _inference_settings(xtts):
+    config = xtts.config
+    return {
+        "temperature": config.temperature,
+        "length_penalty": config.length_penalty,
+        "repetition_penalty": config.repetition_penalty,
+        "top_k": config.top_k,
+        "top_p": config.top_p,
+    }
+
+
+def _with_silence(wav):
+    # Synthesizer.tts() follows every sentence with the same stretch of silence
+    wav = np.asarray(wav, dtype=np.float32)
+    return np.concatenate([wav, np.zeros(SENTENCE_SILENCE, dtype=np.float32)])
+
+
+def synthesize_chunk(
+    tts_model,
+    chunk_text: str,
+    language: str,
+    speaker: str = DEFAULT_SPEAKER,
+    cache: Optional[DiskCache] = None,
+    conditioning=None,
+) -> np.ndarray:
+    """Synthesizes a single chunk, reusing cached audio for text that was already spoken.
+
+    With `conditioning` from `get_conditioning` the chunk goes straight to XTTS inference;
+    otherwise `speaker` must be a built-in speaker, resolved by `TTS.tts`. Cached waveforms are
+    stored as raw float32 samples, keyed by the whitespace-normalized text, language, speaker
+    and TTS model."""
+    if cache is not None:
+        cache_key = _audio_cache_key(chunk_text, language, speaker)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            get_metrics().count("tts.cache_hits")
+            return np.frombuffer(cached, dtype=np.float32)
+
+    with get_metrics().span("tts.synthesize", chars=len(chunk_text)) as span:
+        if conditioning is not None:
+            xtts = tts_model.synthesizer.tts_model
+            out = xtts.inference(
+                chunk_text,
+                language,
+                conditioning[0],
+                conditioning[1],
+                **_inference_settings(xtts),
+            )
+            wav = _with_silence(out["wav"])
+        else:
+            wav = tts_model.tts(
+                text=chunk_text, language=language, speaker=speaker, split_sentences=False
+            )
+            wav = np.asarray(wav, dtype=np.float32)
+        span["audio_seconds"] = len(wav) / tts_model.synthesizer.output_sample_rate
+
+    if cache is not None and len(wav) > 0:
+        cache.put(cache_key, wav.tobytes())
+
+    return wav
+
+
+def get_conditioning(
+    tts_model, voice: str = DEFAULT_SPEAKER, voices: Optional[VoiceRegistry] = None
+):
+    """Returns the XTTS GPT conditioning latents and speaker embedding for a voice.
+
+    `voice` is a built-in speaker or a reference WAV file. Resolving it once per run, through
+    the `voices` registry when given, saves repeating it for every chunk."""
+    return (voices or _default_voices).get(tts_model, voice)
+
+
+def _padded_prefix(gpt, gpt_cond_latent, token_batch, device):
+    """Builds the GPT prefix `GPT.compute_embeddings` would build for each chunk, padded to the
+    longest chunk after its end-of-text token, with the attention mask hiding the padding and
+    the inputs that start the audio codes."""
+    width = max(len(tokens) for tokens in token_batch)
+    prefixes = []
+    for tokens in token_batch:
+        text = torch.IntTensor([[gpt.start_text_token, *tokens, gpt.stop_text_token]]).to(device)
+        emb = gpt.text_embedding(text) + gpt.text_pos_embedding(text)
+        padding = emb.new_zeros(1, width - len(tokens), emb.shape[-1])
+        prefixes.append(torch.cat([gpt_cond_latent, emb, padding], dim=1))
+    prefix = torch.cat(prefixes)
+    prefix_len = prefix.shape[1]
+
+    # One more input for the start-of-audio token, after which the codes are generated
+    attention_mask = torch.ones(len(token_batch), prefix_len + 1, dtype=torch.long)
+    for row, tokens in enumerate(token_batch):
+        attention_mask[row, prefix_len - (width - len(tokens)) : prefix_len] = 0
+    attention_mask = attention_mask.to(device)
+    gpt_inputs = torch.ones_like(attention_mask)
+    gpt_inputs[:, -1] = gpt.start_audio_token
+    return prefix, attention_mask, gpt_inputs
+
+
+def _generate_batch(tts_model, token_batch, conditioning):
+    """Runs XTTS on several chunks of similar token length.
+
+    Mirrors `Xtts.inference` for a single sentence, except that the autoregressive GPT decoding,
+    which dominates synthesis time, runs for the whole batch in one `generate` call. Shorter
+    chunks are padded after their end-of-text token and the padding is masked out, so every
+    text and audio token keeps the position it would have if the chunk were decoded alone."""
+    xtts = tts_model.synthesizer.tts_model
+    gpt = xtts.gpt
+    device = xtts.device
+    gpt_cond_latent = conditioning[0].to(device)
+    speaker_embedding = conditioning[1].to(device)
+
+    wavs = []
+    with torch.inference_mode():
+        prefix, attention_mask, gpt_inputs = _padded_prefix(
+            gpt, gpt_cond_latent, token_batch, device
+        )
+        gpt.gpt_inference.store_prefix_emb(prefix)
+        gpt_codes = gpt.gpt_inference.generate(
+            gpt_inputs,
+            attention_mask=attention_mask,
+            bos_token_id=gpt.start_audio_token,
+            pad_token_id=gpt.stop_audio_token,
+            eos_token_id=gpt.stop_audio_token,
+            max_length=gpt.max_gen_mel_tokens + gpt_inputs.shape[-1],
+            do_sample=True,
+            num_return_sequences=1,
+            num_beams=1,
+            output_attentions=False,
+            **_inference_settings(xtts),
+        )[:, gpt_inputs.shape[-1] :]
+
+        for row, tokens in enumerate(token_batch):
+            # Finished sequences are padded with the stop token; cut each at its own end
+            codes = gpt_codes[row : row + 1]
+            stops = (codes[0] == gpt.stop_audio_token).nonzero()
+            if len(stops):
+                codes = codes[:, : stops[0].item() + 1]
+            expected_output_len = torch.tensor(
+                [codes.shape[-1] * gpt.code_stride_len], device=device
+            )
+            gpt_latents = gpt(
+                torch.IntTensor([tokens]).to(device),
+                torch.tensor([len(tokens)], device=device),
+                codes,
+                expected_output_len,
+                cond_latents=gpt_cond_latent,
+                return_attentions=False,
+                return_latent=True,
+            )
+            wav = xtts.hifigan_decoder(gpt_latents, g=speaker_embedding).cpu().squeeze()
+            wavs.append(_with_silence(wav.numpy()))
+    return wavs
+
+
+def batch_by_length(lengths: List[int], batch_size: int) -> List[List[int]]:
+    """Splits the indices of `lengths` into batches of up to `batch_size` similar lengths.
+
+    Indices are taken shortest first, and a batch is closed once the next length would pad its
+    shortest member by more than `MAX_BATCH_PADDING` of that member's length."""
+    batches = []
+    for index in sorted(range(len(lengths)), key=lengths.__getitem__):
+        batch = batches[-1] if batches else None
+        if (
+            batch is not None
+            and len(batch) < batch_size
+            and lengths[index] - lengths[batch[0]] <= MAX_BATCH_PADDING * lengths[batch[0]]
+        ):
+            batch.append(index)
+        else:
+            batches.append([index])
+    return batches
+
+
+def _synthesize_grouped(tts_model, chunk_texts, language, speaker, batch_size, conditioning):
+    """Groups chunks by token length and decodes each group in batches of up to `batch_size`."""
+    xtts = tts_model.synthesizer.tts_model
+    token_lists = [
+        xtts.tokenizer.encode(text.strip().lower(), lang=language.split("-")[0])
+        for text in chunk_texts
+    ]
+
+    if conditioning is None:
+        conditioning = get_conditioning(tts_model, speaker)
+
+    wavs = [None] * len(chunk_texts)
+    for batch in batch_by_length([len(tokens) for tokens in token_lists], batch_size):
+        chars = sum(len(chunk_texts[index]) for index in batch)
+        width = max(len(token_lists[index]) for index in batch)
+        padding = sum(width - len(token_lists[index]) for index in batch)
+        with get_metrics().span(
+            "tts.synthesize", chars=chars, chunks=len(batch), padding_tokens=padding
+        ) as span:
+            batch_wavs = _generate_batch(
+                tts_model, [token_lists[index] for index in batch], conditioning
+            )
+            span["audio_seconds"] = (
+                sum(len(wav) for wav in batch_wavs) / tts_model.synthesizer.output_sample_rate
+            )
+        for index, wav in zip(batch, batch_wavs):
+            wavs[index] = wav
+    return wavs
+
+
+def synthesize_batch(
+    tts_model,
+    chunk_texts: List[str],
+    language: str,
+    speaker: str = DEFAULT_SPEAKER,
+    batch_size: int = 1,
+    conditioning=None,
+    cache: Optional[DiskCache] = None,
+) -> List[np.ndarray]:
+    """Synthesizes several chunks, returning their waveforms in the order given.
+
+    Chunks are grouped by token length and each group of up to `batch_size` similar lengths is
+    decoded in a single forward pass, using the speaker `conditioning` from `get_conditioning`
+    (looked up here when not given). With `batch_size=1` every chunk goes through
+    `synthesize_chunk`."""
+    if batch_size <= 0:
+        raise ValueError("batch_size must be a positive integer.")
+    if batch_size == 1:
+        return [
+            synthesize_chunk(
+                tts_model, text, language, speaker=speaker, cache=cache, conditioning=conditioning
+            )
+            for text in chunk_texts
+        ]
+
+    wavs = [None] * len(chunk_texts)
+    cache_keys = [None] * len(chunk_texts)
+    if cache is not None:
+        for index, text in enumerate(chunk_texts):
+            cache_keys[index] = _audio_cache_key(text, language, speaker)
+            cached = cache.get(cache_keys[index])
+            if cached is not None:
+                get_metrics().count("tts.cache_hits")
+                wavs[index] = np.frombuffer(cached, dtype=np.float32)
+
+    missing = [index for index, wav in enumerate(wavs) if wav is None]
+    if missing:
+        synthesized = _synthesize_grouped(
+            tts_model,
+            [chunk_texts[index] for index in missing],
+            language,
+            speaker,
+            batch_size,
+            conditioning,
+        )
+        for index, wav in zip(missing, synthesized):
+            wavs[index] = wav
+            if cache is not None and len(wav) > 0:
+                cache.put(cache_keys[index], wav.tobytes())
+    return wavs
+
+
+# TTS model and voices loaded by each worker process of a TTSWorkerPool
+_worker_model = None
+_worker_voices = None
+
+
+def _init_tts_worker(threads, voices_path):
+    global _worker_model, _worker_voices
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+    _worker_model = create_tts_model()
+    _worker_voices = VoiceRegistry(voices_path, model_name=TTS_MODEL_NAME)
+
+
+def _worker_sample_rate():
+    return _worker_model.synthesizer.output_sample_rate
+
+
+def _worker_synthesize(chunk_texts, language, voice, batch_size):
+    # Metrics recorded here are returned with the waveforms and recorded again in the parent
+    sink = ListSink()
+    previous = set_metrics(Metrics(sinks=[sink]))
+    try:
+        conditioning = _worker_voices.get(_worker_model, voice) if voice else None
+        wavs = synthesize_batch(
+            _worker_model,
+            chunk_texts,
+            language,
+            speaker=voice or DEFAULT_SPEAKER,
+            batch_size=batch_size,
+            conditioning=conditioning,
+        )
+    finally:
+        set_metrics(previous)
+    return wavs, sink.records
+
+
+def _finish_worker_future(future, worker_future):
+    """Records the metrics a worker collected and resolves `future` to its waveforms."""
+    if not future.set_running_or_notify_cancel():
+        return
+    try:
+        wavs, records = worker_future.result()
+    except BaseException as e:
+        future.set_exception(e)
+        return
+    metrics = get_metrics()
+    for record in records:
+        metrics.record(record)
+    future.set_result(wavs)
+
+
+class TTSWorkerPool:
+    """Synthesizes chunks in worker processes that each load their own TTS model.
+
+    PyTorch stops scaling well past a few intra-op threads, so on a many-core CPU several
+    single-model processes with a few threads each are faster than one model using every core.
+    The threads per worker default to the CPU count divided by the number of workers."""
+
+    def __init__(
+        self,
+        workers: int,
+        threads_per_worker: Optional[int] = None,
+        voices_path: Optional[str] = None,
+    ):
+        if workers <= 0:
+            raise ValueError("workers must be a positive integer.")
+        if threads_per_worker is None:
+            threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+        self.workers = workers
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_tts_worker,
+            initargs=(threads_per_worker, voices_path),
+        )
+        logger.info(f"Starting {workers} TTS workers with {threads_per_worker} threads each")
+        self.output_sample_rate = self._executor.submit(_worker_sample_rate).result()
+
+    def submit(
+        self, chunk_texts: List[str], language: str, voice: Optional[str] = None, batch_size=1
+    ) -> Future:
+        """Queues chunks for the next free worker; the future resolves to their waveforms.
+
+        Without a `voice` the default built-in speaker is used. The spans the worker records
+        are added to this process's metrics when the chunks are done."""
+        future = Future()
+        worker_future = self._executor.submit(
+            _worker_synthesize, chunk_texts, language, voice, batch_size
+        )
+        future.add_done_callback(lambda done: done.cancelled() and worker_future.cancel())
+        worker_future.add_done_callback(lambda done: _finish_worker_future(future, done))
+        return future
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_synthesized_chunks(
+    tts_model,
+    chunk_texts: List[str],
+    language: str,
+    first_index: int = 0,
+    batch_size: int = 1,
+    conditioning=None,
+    cache: Optional[DiskCache] = None,
+    checkpoint=None,
+    pool: Optional[TTSWorkerPool] = None,
+    voice: Optional[str] = None,
+):
+    """Yields the waveform of each chunk, numbered from `first_index`, in order.
+
+    Audio found in the `checkpoint` or the `cache` is reused and newly synthesized audio is saved
+    to both. Chunks are synthesized a window at a time so batches can group chunks of similar
+    length; with a worker `pool`, windows are handed to the workers as they free up and a few
+    windows per worker are kept in flight while finished ones are yielded. `voice` selects the
+    speaker, with `conditioning` holding its precomputed latents when synthesizing locally."""
+    speaker = voice or DEFAULT_SPEAKER
+    window = 1 if batch_size == 1 else batch_size * BATCH_WINDOW
+    max_pending = 2 * pool.workers if pool is not None else 1
+    pending = deque()
+
+    def submit(start):
+        texts = chunk_texts[start : start + window]
+        wavs = [None] * len(texts)
+        cache_keys = [None] * len(texts)
+        for offset, text in enumerate(texts):
+            if checkpoint is not None:
+                wavs[offset] = checkpoint.load_audio(
+                    "tts", first_index + start + offset, source=text
+                )
+            if wavs[offset] is None and cache is not None:
+                cache_keys[offset] = _audio_cache_key(text, language, speaker)
+                cached = cache.get(cache_keys[offset])
+                if cached is not None:
+                    get_metrics().count("tts.cache_hits")
+                    wavs[offset] = np.frombuffer(cached, dtype=np.float32)
+
+        missing = [offset for offset, wav in enumerate(wavs) if wav is None]
+        missing_texts = [texts[offset] for offset in missing]
+        if not missing:
+            result = []
+        elif pool is not None:
+            result = pool.submit(missing_texts, language, voice=voice, batch_size=batch_size)
+        else:
+            result = synthesize_batch(
+                tts_model,
+                missing_texts,
+                language,
+                speaker=speaker,
+                batch_size=batch_size,
+                conditioning=conditioning,
+            )
+        pending.append((start, texts, wavs, cache_keys, missing, result))
+
+    def finish():
+        start, texts, wavs, cache_keys, missing, result = pending.popleft()
+        synthesized = result.result() if isinstance(result, Future) else result
+        for offset, wav in zip(missing, synthesized):
+            wavs[offset] = wav
+            if cache is not None and len(wav) > 0:
+                cache.put(cache_keys[offset], wav.tobytes())
+            if checkpoint is not None:
+                checkpoint.save_audio(
+                    "tts", first_index + start + offset, wav, source=texts[offset]
+                )
+        return wavs
+
+    try:
+        for start in range(0, len(chunk_texts), window):
+            submit(start)
+            while len(pending) >= max_pending:
+                yield from finish()
+        while pending:
+            yield from finish()
+    finally:
+        for *_, result in pending:
+            if isinstance(result, Future):
+                result.cancel()
+
+
+def open_audio_output(output_path, samplerate):
+    """Opens a mono WAV file for incremental writing.
+
+    libsndfile is told to update the header with every write, and callers flush after each
+    one, so an interrupted run leaves a valid, playable partial file behind."""
+    if "/" in output_path:
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    out = sf.SoundFile(output_path, mode="w", samplerate=samplerate, channels=1, format="WAV")
+    # soundfile has no API for this, so the command goes to the libsndfile handle directly
+    handle = getattr(out, "_file", None)
+    if isinstance(handle, sf._ffi.CData):
+        sf._snd.sf_command(handle, SFC_SET_UPDATE_HEADER_AUTO, sf._ffi.NULL, 1)
+    return out
+
+
 def text_to_speech(
     text,
     language,
     output_path,
     max_characters=290,
     tts_model=None,
-    use_streamlit=False,
-    streamlit_container=None,
+    progress: Optional[ProgressReporter] = None,
     model_name="gpt-4o-mini",
+    cache=None,
+    checkpoint=None,
+    batch_size=1,
+    workers=1,
+    voice=None,
+    voices=None,
+    use_llm_splitter=False,
 ):
     # Validate that text is a string
     if not isinstance(text, str):
         raise TypeError("Input text must be a string.")
-
-    if tts_model is None:
-        # Load the model if not provided
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        tts_model = TTS("xtts_v2.0.2").to(device)
+    if batch_size <= 0:
+        raise ValueError("batch_size must be a positive integer.")
+    if workers <= 0:
+        raise ValueError("workers must be a positive integer.")
 
     # Use the custom splitting method instead of unstructured
-    chunks = split_text_into_chunks(text, max_characters, language=language, model_name=model_name)
-
-    # Initialize a list to store audio data
-    audio_data = []
+    with get_metrics().span("tts.chunking", chars=len(text)) as span:
+        chunks = [
+            chunk.strip()
+            for chunk in split_text_into_chunks(
+                text,
+                max_characters,
+                language=language,
+                model_name=model_name,
+                use_llm_splitter=use_llm_splitter,
+            )
+            if chunk.strip()
+        ]
+        span["chunks"] = len(chunks)
+
+    if not chunks:
+        raise ValueError("No audio data was generated; the input text may be empty or invalid.")
 
-    # Set up progress bar depending on the environment
-    total_chunks = len(chunks)
-    if use_streamlit:
-        with streamlit_container:
-            progress_bar = st.progress(0)
+    # Load the model if not provided; with several workers each one loads its own instead
+    pool = None
+    if workers > 1:
+        pool = TTSWorkerPool(workers, voices_path=voices.path if voices else None)
+        samplerate = pool.output_sample_rate
     else:
-        progress_bar = tqdm(total=total_chunks, desc="Synthesizing speech")
-
-    # Process each chunk
-    for idx, chunk_text in enumerate(chunks):
-        chunk_text = chunk_text.strip()
-        if not chunk_text:
-            continue
-
-        # Generate speech for the chunk
-        wav = tts_model.tts(
-            text=chunk_text, language=language, speaker="Asya Anara", split_sentences=False
-        )
-
-        # Append the audio data only if it contains data
-        if len(wav) > 0:
-            audio_data.append(wav)
-
-        # Update progress bar
-        if use_streamlit:
-            with streamlit_container:
-                progress_bar.progress((idx + 1) / total_chunks)
-        else:
-            progress_bar.update(1)
-
-    # Check if audio_data has content before concatenating
-    if not audio_data:
+        if tts_model is None:
+            tts_model = create_tts_model()
+        samplerate = tts_model.synthesizer.output_sample_rate
+    conditioning = None
+    if pool is None and (voice or batch_size > 1):
+        conditioning = get_conditioning(tts_model, voice or DEFAULT_SPEAKER, voices)
+
+    # Report progress to the caller's interface, or to a terminal progress bar by default
+    total_chunks = len(chunks)
+    if progress is None:
+        progress = TqdmProgress()
+    progress.start(total_chunks, "Synthesizing speech")
+
+    # Stream each chunk straight into the output file instead of collecting the whole book
+    frames_written = 0
+    try:
+        with open_audio_output(output_path, samplerate) as out:
+            wavs = iter_synthesized_chunks(
+                tts_model,
+                chunks,
+                language,
+                batch_size=batch_size,
+                conditioning=conditioning,
+                cache=cache,
+                checkpoint=checkpoint,
+                pool=pool,
+                voice=voice,
+            )
+            for idx, wav in enumerate(wavs):
+                # Write the audio data only if it contains data
+                if len(wav) > 0:
+                    out.write(wav)
+                    out.flush()
+                    frames_written += len(wav)
+
+                progress.event(
+                    "chunk_synthesized",
+                    index=idx,
+                    text=chunks[idx],
+                    audio_seconds=len(wav) / samplerate,
+                )
+                progress.advance()
+    finally:
+        if pool is not None:
+            pool.close()
+        progress.finish()
+
+    # Check if any audio was written
+    if not frames_written:
+        if os.path.exists(output_path):
+            os.remove(output_path)
         raise ValueError("No audio data was generated; the input text may be empty or invalid.")
 
-    # Concatenate all audio chunks
-    combined_audio = np.concatenate(audio_data)
-
-    # Save the combined audio to the output file
-    if "/" in output_path:
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    sf.write(output_path, combined_audio, samplerate=tts_model.synthesizer.output_sample_rate)
-
-    # Finalize the progress bar
-    if use_streamlit:
-        progress_bar.empty()
-    else:
-        progress_bar.close()
+    if cache is not None:
+        stats = cache.stats()
+        logger.info(
+            f"TTS cache: {stats['hits']} hits, {stats['misses']} misses, "
+            f"{stats['entries']} entries, {stats['bytes'] / 1024 / 1024:.1f} MB"
+        )
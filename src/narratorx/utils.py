@@ -1,13 +1,78 @@
 # narratorx/utils.py
 
-from typing import List
+from typing import Iterable, List, NamedTuple, Optional, Tuple
 
-from surya.languages import CODE_TO_LANGUAGE
-from unstructured.chunking.basic import chunk_elements
-from unstructured.documents.elements import NarrativeText
+from narratorx.lazy import LazyImport
+
+sent_tokenize = LazyImport("nltk.tokenize", "sent_tokenize")
+token_counter = LazyImport("litellm", "token_counter")
+
+# Rough size of a token in characters, for estimates where the tokenizer isn't worth running
+CHARS_PER_TOKEN = 4
+# How full a chunk must be before it is ended early at a paragraph boundary
+PARAGRAPH_FILL = 0.8
+# Characters that end a sentence at the end of a line, making the line break a paragraph end
+PARAGRAPH_END_PUNCTUATION = '.!?…:"”»)'
+# Share of the estimated size used when a chunk has to be packed again to fit its tokens
+TOKEN_MARGIN = 0.95
+
+convert_language_code = {
+    "en": "english",
+    "es": "spanish",
+    "fr": "french",
+    "de": "german",
+    "it": "italian",
+    "pt": "portuguese",
+    "pl": "polish",
+    "tr": "turkish",
+    "ru": "russian",
+    "nl": "dutch",
+    "cz": "czech",
+    "ar": "english",  # there is no arabic in nltk
+    "cn": "english",  # there is no chinese in nltk
+    "jp": "english",  # there is no japanese in nltk
+    "hu": "english",  # there is no hungarian in nltk
+    "kr": "english",  # there is no korean in nltk
+}
+
+
+# NLTK resource holding the sentence tokenizer models
+NLTK_SENTENCE_DATA = "punkt_tab"
+
+_nltk_data_ready = False
+
+
+def download_nltk_data():
+    """Downloads the NLTK sentence tokenizer data. Run once per machine by `narratorx-setup`."""
+    import nltk
+
+    if not nltk.download(NLTK_SENTENCE_DATA, quiet=True, raise_on_error=True):
+        raise RuntimeError(f"Could not download the NLTK '{NLTK_SENTENCE_DATA}' data.")
+
+
+def ensure_nltk_data():
+    """Raises a `RuntimeError` pointing to `narratorx-setup` if the NLTK sentence tokenizer
+    data is not installed. Nothing is downloaded at run time.
+
+    Only the first call in a process does any work; later calls return immediately."""
+    global _nltk_data_ready
+    if _nltk_data_ready:
+        return
+    import nltk
+
+    try:
+        nltk.data.find(f"tokenizers/{NLTK_SENTENCE_DATA}")
+    except LookupError:
+        raise RuntimeError(
+            f"The NLTK sentence tokenizer data ('{NLTK_SENTENCE_DATA}') is not installed. "
+            "Run `narratorx-setup` once to download it."
+        ) from None
+    _nltk_data_ready = True
 
 
 def get_valid_languages() -> List[str]:
+    from surya.languages import CODE_TO_LANGUAGE
+
     ocr_langs = list(CODE_TO_LANGUAGE.keys())
     tts_langs = [
         # https://docs.coqui.ai/en/latest/models/xtts.html#languages
@@ -32,24 +97,216 @@ def get_valid_languages() -> List[str]:
     return valid_languages
 
 
-def split_text_into_chunks(
-    text: str, max_chars: int = 8000, model_name: str = "gpt-4o"
-) -> List[str]:
-    """Uses `semchunk` to split text into chunks that fit within a specified token limit,
-    respecting sentence boundaries."""
-    if not isinstance(text, str):
-        raise TypeError("Input text must be a string.")
+class Sentence(NamedTuple):
+    start: int
+    end: int
+    paragraph: int
+
+
+class SegmentedText(str):
+    """Text carrying the offsets of its sentences, so it is only tokenized once.
+
+    It is a plain `str` everywhere else; stages that know about it read `sentences` instead of
+    running sentence tokenization again. Paragraphs are the lines of the text."""
+
+    def __new__(cls, text: str, sentences: Iterable[Sentence] = ()):
+        segmented = super().__new__(cls, text)
+        segmented.sentences = tuple(sentences)
+        return segmented
+
+    @property
+    def text(self) -> str:
+        return str(self)
+
+    def sentence_texts(self) -> List[str]:
+        return [self[s.start : s.end] for s in self.sentences]
+
+    def slice(self, start: int, end: int) -> "SegmentedText":
+        """Returns `self[start:end]` with the sentences that lie inside it."""
+        return SegmentedText(
+            self[start:end],
+            (
+                Sentence(s.start - start, s.end - start, s.paragraph)
+                for s in self.sentences
+                if s.start >= start and s.end <= end
+            ),
+        )
+
+
+def segment_text(text: str, language: str = "en") -> SegmentedText:
+    """Splits `text` into paragraphs and sentences and records their offsets."""
+    if isinstance(text, SegmentedText):
+        return text
+    ensure_nltk_data()
+    nltk_language = convert_language_code.get(language, "english")
+    sentences = []
+    offset = 0
+    for paragraph, line in enumerate(text.split("\n")):
+        position = 0
+        for sent in sent_tokenize(line, language=nltk_language):
+            sent = sent.strip()
+            if not sent:
+                continue
+            start = line.find(sent, position)
+            if start < 0:
+                # The tokenizer altered the sentence; keep the rest of the line as one sentence
+                rest = line[position:].strip()
+                if rest:
+                    start = line.index(rest, position)
+                    sentences.append(
+                        Sentence(offset + start, offset + start + len(rest), paragraph)
+                    )
+                break
+            position = start + len(sent)
+            sentences.append(Sentence(offset + start, offset + position, paragraph))
+        offset += len(line) + 1
+    return SegmentedText(text, sentences)
+
+
+def join_segmented(parts: Iterable[SegmentedText], separator: str = "\n\n") -> SegmentedText:
+    """Joins segmented texts, shifting their sentence offsets instead of tokenizing again."""
+    texts = []
+    sentences = []
+    offset = 0
+    paragraph = 0
+    for part in parts:
+        if texts:
+            offset += len(separator)
+            paragraph += separator.count("\n")
+        sentences.extend(
+            Sentence(s.start + offset, s.end + offset, s.paragraph + paragraph)
+            for s in part.sentences
+        )
+        texts.append(part)
+        offset += len(part)
+        paragraph += part.count("\n")
+    return SegmentedText(separator.join(texts), sentences)
+
+
+def resegment(text: str, source: SegmentedText, language: str = "en") -> SegmentedText:
+    """Segments `text`, reusing the index of `source` when the text was left unchanged."""
+    if isinstance(source, SegmentedText) and text == source:
+        return source
+    return segment_text(text, language)
+
+
+def _word_windows(text: str, start: int, end: int, max_chars: int) -> List[Tuple[int, int]]:
+    """Splits `text[start:end]` at whitespace into windows of at most `max_chars`."""
+    windows = []
+    while end - start > max_chars:
+        cut = text.rfind(" ", start + 1, start + max_chars + 1)
+        if cut < 0:
+            cut = start + max_chars
+        windows.append((start, cut))
+        start = cut
+        while start < end and text[start].isspace():
+            start += 1
+    if start < end:
+        windows.append((start, end))
+    return windows
+
+
+def _ends_paragraph(text: SegmentedText, index: int) -> bool:
+    """Returns whether the sentence at `index` ends its line and closes a sentence there."""
+    sentences = text.sentences
+    if index + 1 >= len(sentences):
+        return True
+    ends_sentence = text[sentences[index].end - 1] in PARAGRAPH_END_PUNCTUATION
+    return ends_sentence and sentences[index + 1].paragraph != sentences[index].paragraph
+
+
+def pack_sentences(
+    text: SegmentedText, max_chars: int, paragraph_fill: float = 1.0
+) -> List[SegmentedText]:
+    """Packs consecutive sentences of `text` into chunks of at most `max_chars` characters.
+
+    Sentences longer than `max_chars` are split at whitespace into chunks of their own. With a
+    `paragraph_fill` below 1, a chunk that is at least that full ends at the last paragraph
+    boundary it contains rather than in the middle of a paragraph."""
     if max_chars <= 0:
         raise ValueError("max_chars must be a positive integer.")
 
-    # Create a NarrativeText element with the input text
-    element = NarrativeText(text)
+    chunks = []
+    sentences = text.sentences
+    first = 0
+    while first < len(sentences):
+        s = sentences[first]
+        if s.end - s.start > max_chars:
+            for start, end in _word_windows(text, s.start, s.end, max_chars):
+                piece = SegmentedText(text[start:end], [Sentence(0, end - start, s.paragraph)])
+                chunks.append(piece)
+            first += 1
+            continue
+
+        last = first
+        while last + 1 < len(sentences) and sentences[last + 1].end - s.start <= max_chars:
+            last += 1
+        if paragraph_fill < 1 and last + 1 < len(sentences):
+            for index in range(last, first, -1):
+                if sentences[index].end - s.start < paragraph_fill * max_chars:
+                    break
+                if _ends_paragraph(text, index):
+                    last = index
+                    break
+        chunks.append(text.slice(s.start, sentences[last].end))
+        first = last + 1
+    return chunks
 
-    # Chunk the text using unstructured
-    chunks = chunk_elements(
-        elements=[element],
-        max_characters=max_chars,
-        overlap=0,
-    )
 
+def count_tokens(text: str, model_name: str) -> int:
+    """Counts the tokens of `text` with the tokenizer of `model_name`."""
+    return token_counter(model=model_name, text=text)
+
+
+def pack_text(
+    text: SegmentedText,
+    max_chars: Optional[int] = None,
+    max_tokens: Optional[int] = None,
+    model_name: str = "gpt-4o",
+) -> List[SegmentedText]:
+    """Packs the sentences of `text` into chunks within `max_chars` characters, `max_tokens`
+    tokens of `model_name`, or both, preferably ending at paragraph boundaries.
+
+    Tokens are counted once for the whole text to size the chunks in characters, then once
+    per chunk; a chunk that turns out to be over `max_tokens` is packed again more tightly."""
+    if max_tokens is None:
+        if max_chars is None:
+            raise ValueError("max_chars or max_tokens must be given.")
+        return pack_sentences(text, max_chars, PARAGRAPH_FILL)
+    if max_tokens <= 0:
+        raise ValueError("max_tokens must be a positive integer.")
+    if not text.sentences:
+        return []
+
+    chars_per_token = len(text) / max(count_tokens(text, model_name), 1)
+    char_budget = max(int(max_tokens * chars_per_token), 1)
+    if max_chars is not None:
+        char_budget = min(char_budget, max_chars)
+
+    chunks = []
+    for chunk in pack_sentences(text, char_budget, PARAGRAPH_FILL):
+        tokens = count_tokens(chunk, model_name)
+        if tokens > max_tokens and len(chunk) > 1:
+            tighter = min(int(len(chunk) * max_tokens / tokens * TOKEN_MARGIN), len(chunk) - 1)
+            chunks.extend(pack_text(chunk, tighter, max_tokens, model_name))
+        else:
+            chunks.append(chunk)
     return chunks
+
+
+def split_text_into_chunks(
+    text: str,
+    max_chars: Optional[int] = 8000,
+    model_name: str = "gpt-4o",
+    language: str = "en",
+    max_tokens: Optional[int] = None,
+) -> List[SegmentedText]:
+    """Splits text into chunks of at most `max_chars` characters and, when given, `max_tokens`
+    tokens of `model_name`, respecting sentence and preferably paragraph boundaries. Each chunk
+    keeps its sentence offsets for the later stages."""
+    if not isinstance(text, str):
+        raise TypeError("Input text must be a string.")
+    if max_chars is not None and max_chars <= 0:
+        raise ValueError("max_chars must be a positive integer.")
+
+    return pack_text(segment_text(text, language), max_chars, max_tokens, model_name)
@@ -0,0 +1,123 @@
+# narratorx/voices.py
+
+import io
+import logging
+import os
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+
+from narratorx.cache import make_cache_key
+from narratorx.checkpoint import atomic_write, file_digest
+from narratorx.lazy import LazyImport
+
+torch = LazyImport("torch")
+
+logger = logging.getLogger(__name__)
+
+
+def is_reference_wav(voice: str) -> bool:
+    """Returns whether `voice` names a reference recording rather than a built-in speaker."""
+    return os.path.isfile(voice)
+
+
+# Digests of reference recordings, keyed by path, modification time and size
+_wav_digests = {}
+
+
+def voice_id(voice: str) -> str:
+    """Returns a stable identifier for a voice, used in cache keys.
+
+    Built-in speakers are identified by name and reference recordings by their content, so an
+    edited WAV file is not mistaken for the old one."""
+    if not is_reference_wav(voice):
+        return voice
+    stat = os.stat(voice)
+    key = (os.path.realpath(voice), stat.st_mtime_ns, stat.st_size)
+    if key not in _wav_digests:
+        _wav_digests[key] = file_digest(voice)
+    return f"wav:{_wav_digests[key]}"
+
+
+def builtin_conditioning(tts_model, speaker: str):
+    """Returns the GPT conditioning latents and speaker embedding of a built-in XTTS speaker."""
+    xtts = tts_model.synthesizer.tts_model
+    speakers = xtts.speaker_manager.speakers
+    if speaker not in speakers:
+        raise ValueError(
+            f"Unknown voice {speaker!r}: not a built-in speaker or an existing reference WAV file."
+        )
+    return speakers[speaker]["gpt_cond_latent"], speakers[speaker]["speaker_embedding"]
+
+
+def compute_conditioning(tts_model, wav_path: str):
+    """Encodes a reference recording into GPT conditioning latents and a speaker embedding."""
+    xtts = tts_model.synthesizer.tts_model
+    config = xtts.config
+    return xtts.get_conditioning_latents(
+        audio_path=[wav_path],
+        gpt_cond_len=config.gpt_cond_len,
+        gpt_cond_chunk_len=config.gpt_cond_chunk_len,
+        max_ref_length=config.max_ref_len,
+        sound_norm_refs=config.sound_norm_refs,
+    )
+
+
+class VoiceRegistry:
+    """Resolves voices to XTTS speaker conditioning, computing it once per voice.
+
+    A voice is either the name of a built-in XTTS speaker or the path to a reference WAV file.
+    Conditioning is kept in memory for the lifetime of the registry; for reference recordings,
+    whose encoding is expensive, it is also saved as `.npz` under `path` so later runs skip the
+    encoder entirely. Built-in speakers are already stored with the model and are not copied."""
+
+    def __init__(self, path: Optional[str] = None, model_name: str = ""):
+        if path:
+            os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.model_name = model_name
+        self._voices = {}
+        self._lock = threading.Lock()
+
+    def _file_path(self, key: str) -> Optional[str]:
+        return os.path.join(self.path, f"{key}.npz") if self.path else None
+
+    def _load(self, file_path: str):
+        with np.load(file_path) as data:
+            return (
+                torch.from_numpy(data["gpt_cond_latent"]),
+                torch.from_numpy(data["speaker_embedding"]),
+            )
+
+    def _save(self, file_path: str, conditioning):
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            gpt_cond_latent=conditioning[0].detach().cpu().numpy(),
+            speaker_embedding=conditioning[1].detach().cpu().numpy(),
+        )
+        atomic_write(file_path, buffer.getvalue())
+
+    def get(self, tts_model, voice: str) -> Tuple:
+        """Returns `(gpt_cond_latent, speaker_embedding)` for `voice`."""
+        key = make_cache_key("voice", voice_id(voice), self.model_name)
+        with self._lock:
+            if key in self._voices:
+                return self._voices[key]
+
+            if not is_reference_wav(voice):
+                conditioning = builtin_conditioning(tts_model, voice)
+            else:
+                file_path = self._file_path(key)
+                if file_path and os.path.exists(file_path):
+                    logger.debug(f"Loading conditioning for {voice} from {file_path}")
+                    conditioning = self._load(file_path)
+                else:
+                    logger.info(f"Computing speaker conditioning for {voice}...")
+                    conditioning = compute_conditioning(tts_model, voice)
+                    if file_path:
+                        self._save(file_path, conditioning)
+
+            self._voices[key] = conditioning
+            return conditioning
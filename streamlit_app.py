@@ -4,12 +4,49 @@ import tempfile
 import streamlit as st
 
 from narratorx.llm import llm_process_text
-from narratorx.ocr import process_pdf
-from narratorx.tts import load_tts_model, text_to_speech
+from narratorx.ocr import process_pdf, warmup_ocr_models
+from narratorx.pipeline import run_pipeline
+from narratorx.progress import ProgressReporter
+from narratorx.tts import get_tts_model, text_to_speech
 from narratorx.utils import get_valid_languages
 
 os.environ["PYTORCH_CUDA_ALLOC_CONF"] = "expandable_segments:True"
 
+
+@st.cache_resource
+def load_ocr_models():
+    return warmup_ocr_models()
+
+
+@st.cache_resource
+def load_tts_model():
+    return get_tts_model()
+
+
+class StreamlitProgress(ProgressReporter):
+    """Shows synthesis progress as a progress bar inside a Streamlit container."""
+
+    def __init__(self, container):
+        self.container = container
+        self.total = 0
+        self.done = 0
+        self.bar = None
+
+    def start(self, total, description=""):
+        self.total = total
+        with self.container:
+            self.bar = st.progress(0, text=description)
+
+    def advance(self, count=1):
+        self.done += count
+        with self.container:
+            self.bar.progress(self.done / self.total)
+
+    def finish(self):
+        if self.bar is not None:
+            self.bar.empty()
+
+
 # Page configuration
 st.set_page_config(
     page_title="NarratorX - PDF to Audiobook Converter",
@@ -70,6 +107,11 @@ with st.expander("Advanced Settings"):
         value=235,
         step=50,
     )
+    pipelined = st.checkbox(
+        "Run OCR, LLM and TTS concurrently",
+        value=False,
+        help="Faster on large books, but progress is only shown once the whole run is done.",
+    )
 
 
 if st.button("Convert to Audiobook", use_container_width=True):
@@ -88,43 +130,61 @@ if st.button("Convert to Audiobook", use_container_width=True):
                     tmp_file.write(uploaded_file.read())
                     tmp_pdf_path = tmp_file.name
 
-                # Step 1: OCR Processing
                 expander = st.expander("Task Logs", expanded=True, icon=":material/web_stories:")
-                with expander:
-                    st.info("Processing PDF with OCR...")
-                text = process_pdf(tmp_pdf_path, language)
-                with expander:
-                    st.success("OCR processing completed.")
-
-                # Step 2: LLM Text Processing
-                with expander:
-                    st.info("Processing text with LLM...")
-                fixed_text = llm_process_text(
-                    text,
-                    language,
-                    model_name=model,
-                    max_chars=max_characters_llm,
-                    max_tokens=max_tokens,
-                )
-                with expander:
-                    st.success("Text processing completed.")
-
-                # Step 3: Text-to-Speech Synthesis
-                with expander:
-                    st.info("Synthesizing speech...")
                 output_audio_path = os.path.join(tempfile.gettempdir(), "output.wav")
-                tts_model = load_tts_model()
-                text_to_speech(
-                    fixed_text,
-                    language,
-                    output_audio_path,
-                    max_characters_tts,
-                    tts_model=tts_model,
-                    use_streamlit=True,
-                    streamlit_container=container,
-                )
-                with expander:
-                    st.success("Speech synthesis completed.")
+
+                if pipelined:
+                    with expander:
+                        st.info("Processing PDF with OCR, LLM and TTS concurrently...")
+                    run_pipeline(
+                        tmp_pdf_path,
+                        language,
+                        output_audio_path,
+                        model_name=model,
+                        max_chars_llm=max_characters_llm,
+                        max_tokens=max_tokens,
+                        max_characters_tts=max_characters_tts,
+                        tts_model=load_tts_model(),
+                    )
+                    with expander:
+                        st.success("Processing completed.")
+                else:
+                    # Step 1: OCR Processing
+                    with expander:
+                        st.info("Processing PDF with OCR...")
+                    text = process_pdf(
+                        tmp_pdf_path, language, ocr_models=load_ocr_models(), strip_headers=True
+                    )
+                    with expander:
+                        st.success("OCR processing completed.")
+
+                    # Step 2: LLM Text Processing
+                    with expander:
+                        st.info("Processing text with LLM...")
+                    fixed_text = llm_process_text(
+                        text,
+                        language,
+                        model_name=model,
+                        max_chars=max_characters_llm,
+                        max_tokens=max_tokens,
+                    )
+                    with expander:
+                        st.success("Text processing completed.")
+
+                    # Step 3: Text-to-Speech Synthesis
+                    with expander:
+                        st.info("Synthesizing speech...")
+                    tts_model = load_tts_model()
+                    text_to_speech(
+                        fixed_text,
+                        language,
+                        output_audio_path,
+                        max_characters_tts,
+                        tts_model=tts_model,
+                        progress=StreamlitProgress(container),
+                    )
+                    with expander:
+                        st.success("Speech synthesis completed.")
 
                 # Display audio player
                 audio_file = open(output_audio_path, "rb")
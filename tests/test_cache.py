@@ -0,0 +1,74 @@
+# tests/test_cache.py
+
+import os
+import tempfile
+import unittest
+
+from narratorx.cache import DiskCache, make_cache_key
+
+
+class TestDiskCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "cache", "test.sqlite")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_make_cache_key(self):
+        """Test that cache keys are stable and depend on every part."""
+        key = make_cache_key("llm", "chunk", "gpt-4o", 4000)
+        self.assertEqual(key, make_cache_key("llm", "chunk", "gpt-4o", 4000))
+        self.assertNotEqual(key, make_cache_key("llm", "chunk", "gpt-4o", 2000))
+        self.assertNotEqual(key, make_cache_key("llm", "chunk", "gpt-4o-mini", 4000))
+
+    def test_get_put_and_counters(self):
+        """Test that stored values are returned and hits and misses are counted."""
+        with DiskCache(self.path) as cache:
+            self.assertIsNone(cache.get("missing"))
+            cache.put("key", b"value")
+            self.assertEqual(cache.get("key"), b"value")
+
+            stats = cache.stats()
+            self.assertEqual(stats["hits"], 1)
+            self.assertEqual(stats["misses"], 1)
+            self.assertEqual(stats["entries"], 1)
+            self.assertEqual(stats["bytes"], len(b"value"))
+
+    def test_persists_across_instances(self):
+        """Test that entries survive reopening the cache."""
+        with DiskCache(self.path) as cache:
+            cache.put("key", b"value")
+        with DiskCache(self.path) as cache:
+            self.assertEqual(cache.get("key"), b"value")
+            self.assertEqual(cache.stats()["bytes"], len(b"value"))
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entries are evicted first."""
+        with DiskCache(self.path, max_bytes=30) as cache:
+            cache.put("a", b"x" * 10)
+            cache.put("b", b"x" * 10)
+            cache.put("c", b"x" * 10)
+            cache.get("a")  # "b" is now the least recently used entry
+            cache.put("d", b"x" * 10)
+
+            self.assertIsNone(cache.get("b"))
+            for key in ("a", "c", "d"):
+                self.assertIsNotNone(cache.get(key), f"'{key}' should still be cached.")
+            self.assertLessEqual(cache.stats()["bytes"], 30)
+
+    def test_oversized_entry_is_skipped(self):
+        """Test that entries larger than the whole cache are not stored."""
+        with DiskCache(self.path, max_bytes=4) as cache:
+            cache.put("key", b"too large")
+            self.assertIsNone(cache.get("key"))
+
+    def test_invalid_max_bytes(self):
+        """Test that a non-positive size limit is rejected."""
+        with self.assertRaises(ValueError):
+            DiskCache(self.path, max_bytes=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+# tests/test_checkpoint.py
+
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from narratorx.checkpoint import RunDirectory
+
+
+class TestRunDirectory(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "run")
+        self.config = {"pdf_sha256": "abc", "language": "en", "model": "gpt-4o"}
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_manifest_is_written(self):
+        """Test that a new run directory records its settings."""
+        RunDirectory(self.path, self.config)
+
+        with open(os.path.join(self.path, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        self.assertEqual(manifest["config"], self.config)
+        for stage in ("ocr", "llm", "tts"):
+            self.assertTrue(os.path.isdir(os.path.join(self.path, stage)))
+
+    def test_units_round_trip(self):
+        """Test that saved text and audio units are loaded back unchanged."""
+        run = RunDirectory(self.path, self.config)
+        self.assertIsNone(run.load_text("ocr", 0))
+        self.assertIsNone(run.load_audio("tts", 0))
+
+        run.save_text("ocr", 0, "Page one.\n")
+        run.save_audio("tts", 0, np.array([0.0, 0.5, -0.5]))
+
+        self.assertEqual(run.load_text("ocr", 0), "Page one.\n")
+        np.testing.assert_array_equal(run.load_audio("tts", 0), [0.0, 0.5, -0.5])
+
+    def test_resume_keeps_completed_units(self):
+        """Test that resuming keeps the units saved by the earlier run."""
+        run = RunDirectory(self.path, self.config)
+        run.save_text("llm", 3, "Fixed chunk.", source="Fixed chunk")
+
+        resumed = RunDirectory(self.path, self.config, resume=True)
+        self.assertEqual(resumed.load_text("llm", 3, source="Fixed chunk"), "Fixed chunk.")
+
+    def test_units_from_different_input_are_ignored(self):
+        """Test that a unit is not reused when the input it was made from has changed."""
+        run = RunDirectory(self.path, self.config)
+        run.save_text("llm", 0, "Fixed chunk.", source="Fixed chunk")
+        run.save_audio("tts", 0, np.array([0.5]), source="Fixed chunk.")
+
+        self.assertIsNone(run.load_text("llm", 0, source="A different chunk"))
+        self.assertIsNone(run.load_audio("tts", 0, source="A different chunk."))
+        np.testing.assert_array_equal(run.load_audio("tts", 0, source="Fixed chunk."), [0.5])
+
+    def test_new_run_clears_previous_units(self):
+        """Test that starting without resume discards an earlier run's output."""
+        run = RunDirectory(self.path, self.config)
+        run.save_text("llm", 0, "Fixed chunk.")
+
+        fresh = RunDirectory(self.path, self.config)
+        self.assertIsNone(fresh.load_text("llm", 0))
+
+    def test_resume_with_different_settings(self):
+        """Test that resuming with different settings is rejected."""
+        RunDirectory(self.path, self.config)
+
+        with self.assertRaises(ValueError):
+            RunDirectory(self.path, {**self.config, "language": "tr"}, resume=True)
+
+    def test_unknown_stage(self):
+        """Test that unknown stage names are rejected."""
+        run = RunDirectory(self.path, self.config)
+        with self.assertRaises(ValueError):
+            run.save_text("unknown", 0, "text")
+
+
+if __name__ == "__main__":
+    unittest.main()
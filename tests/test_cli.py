@@ -1,18 +1,25 @@
 # tests/test_cli.py
 
 import os
+import subprocess
+import sys
 import unittest
 from unittest.mock import patch
 
 from click.testing import CliRunner
 
-from narratorx.cli import main
+from narratorx.cli import main, setup
 
 
 class TestCLI(unittest.TestCase):
 
+    def setUp(self):
+        patcher = patch("narratorx.cli.ensure_nltk_data")
+        self.mock_ensure_nltk_data = patcher.start()
+        self.addCleanup(patcher.stop)
+
     @patch("narratorx.cli.process_pdf")
-    @patch("narratorx.cli.llm_process_text")
+    @patch("narratorx.cli.llm_process_text", autospec=True)
     @patch("narratorx.cli.text_to_speech")
     def test_cli_success(self, mock_tts, mock_llm_process_text, mock_process_pdf):
         # Mock the functions
@@ -44,6 +51,7 @@ class TestCLI(unittest.TestCase):
             self.assertIn("LLM text processing completed.", result.output)
             self.assertIn("Text-to-speech synthesis completed.", result.output)
             self.assertIn("Audio saved to output.wav", result.output)
+            self.assertIsNone(mock_llm_process_text.call_args.kwargs["skip_threshold"])
 
     @patch("narratorx.cli.process_pdf")
     def test_cli_missing_env_var(self, mock_process_pdf):
@@ -113,6 +121,110 @@ class TestCLI(unittest.TestCase):
             self.assertNotEqual(result.exit_code, 0)
             self.assertIn("An error occurred: TTS error", result.output)
 
+    @patch("narratorx.cli.process_pdf")
+    @patch("narratorx.cli.llm_process_text")
+    @patch("narratorx.cli.text_to_speech")
+    def test_cli_prints_run_summary(self, mock_tts, mock_llm_process_text, mock_process_pdf):
+        """Test that the run summary is shown at the default log level."""
+        mock_process_pdf.return_value = "Extracted text"
+        mock_llm_process_text.return_value = "Processed text"
+
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            runner = CliRunner()
+            result = runner.invoke(main, ["tests/docs/sample_en.pdf"])
+
+            self.assertEqual(result.exit_code, 0)
+            self.assertIn("Run summary:", result.output)
+
+    @patch("narratorx.cli.JsonLinesSink", autospec=True)
+    @patch("narratorx.cli.process_pdf")
+    @patch("narratorx.cli.llm_process_text")
+    def test_cli_closes_metrics_file_on_failure(
+        self, mock_llm_process_text, mock_process_pdf, mock_sink
+    ):
+        """Test that the metrics file is closed when a stage fails."""
+        mock_process_pdf.side_effect = Exception("OCR error")
+
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            runner = CliRunner()
+            result = runner.invoke(
+                main, ["tests/docs/sample_en.pdf", "--metrics-file", "metrics.jsonl"]
+            )
+
+            self.assertNotEqual(result.exit_code, 0)
+            mock_sink.return_value.close.assert_called_once()
+
+    @patch("narratorx.cli.process_pdf")
+    def test_cli_missing_nltk_data(self, mock_process_pdf):
+        """Test that a run without the tokenizer data stops before OCR and points to setup."""
+        self.mock_ensure_nltk_data.side_effect = RuntimeError("Run `narratorx-setup` once.")
+
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            runner = CliRunner()
+            result = runner.invoke(main, ["tests/docs/sample_en.pdf"])
+
+            self.assertEqual(result.exit_code, 1)
+            self.assertIn("narratorx-setup", result.output)
+            mock_process_pdf.assert_not_called()
+
+    @patch("narratorx.cli.download_nltk_data")
+    def test_setup_downloads_nltk_data(self, mock_download_nltk_data):
+        """Test that the setup command downloads the tokenizer data."""
+        result = CliRunner().invoke(setup)
+
+        self.assertEqual(result.exit_code, 0)
+        mock_download_nltk_data.assert_called_once()
+
+    def test_cli_resume_requires_run_dir(self):
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            runner = CliRunner()
+            result = runner.invoke(main, ["tests/docs/sample_en.pdf", "--resume"])
+
+            self.assertEqual(result.exit_code, 2)
+            self.assertIn("--resume requires --run-dir", result.output)
+
+    @patch("narratorx.cli.process_pdf")
+    @patch("narratorx.cli.llm_process_text")
+    @patch("narratorx.cli.text_to_speech")
+    def test_cli_run_dir(self, mock_tts, mock_llm_process_text, mock_process_pdf):
+        mock_process_pdf.return_value = "Extracted text"
+        mock_llm_process_text.return_value = "Processed text"
+
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            runner = CliRunner()
+            with runner.isolated_filesystem():
+                pdf_path = os.path.join(os.path.dirname(__file__), "docs", "sample_en.pdf")
+                result = runner.invoke(main, [pdf_path, "--run-dir", "run", "--resume"])
+
+                self.assertEqual(result.exit_code, 0)
+                self.assertTrue(os.path.exists(os.path.join("run", "manifest.json")))
+                checkpoint = mock_process_pdf.call_args.kwargs["checkpoint"]
+                self.assertIs(mock_llm_process_text.call_args.kwargs["checkpoint"], checkpoint)
+                self.assertIs(mock_tts.call_args.kwargs["checkpoint"], checkpoint)
+
+    @patch("narratorx.cli.run_pipeline", autospec=True)
+    @patch("narratorx.cli.process_pdf")
+    def test_cli_pipelined(self, mock_process_pdf, mock_run_pipeline):
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            runner = CliRunner()
+            result = runner.invoke(
+                main,
+                [
+                    "tests/docs/sample_en.pdf",
+                    "--pipelined",
+                    "--llm-skip-threshold",
+                    "0.9",
+                    "--log-level",
+                    "INFO",
+                ],
+            )
+
+            self.assertEqual(result.exit_code, 0)
+            mock_run_pipeline.assert_called_once()
+            mock_process_pdf.assert_not_called()
+            self.assertEqual(mock_run_pipeline.call_args.kwargs["llm_skip_threshold"], 0.9)
+            self.assertIn("Pipelined processing completed.", result.output)
+
     @patch("narratorx.cli.process_pdf")
     def test_cli_help(self, mock_process_pdf):
         runner = CliRunner()
@@ -128,6 +240,18 @@ class TestCLI(unittest.TestCase):
         self.assertIn("--log-level", result.output)
         self.assertIn("--log-file", result.output)
 
+    def test_import_does_not_load_heavy_dependencies(self):
+        """Test that importing the CLI leaves torch, TTS, Surya, litellm and Streamlit unloaded."""
+        code = (
+            "import sys, narratorx.cli; "
+            "print([m for m in ('torch', 'TTS', 'surya', 'litellm', 'streamlit', 'nltk') "
+            "if m in sys.modules])"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        )
+        self.assertEqual(result.stdout.strip(), "[]")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,102 @@
+# tests/test_layout.py
+
+import random
+import string
+import unittest
+
+from narratorx.layout import (
+    find_page_furniture,
+    is_page_number,
+    strip_headers_and_footers,
+)
+from narratorx.ocr import OCRLine, OCRPage
+
+BODY_LINES = 4
+
+
+def body(number):
+    """Returns lines of made-up body text that differ from page to page."""
+    rng = random.Random(number)
+    return [
+        " ".join(
+            "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9))) for _ in range(12)
+        )
+        for _ in range(BODY_LINES)
+    ]
+
+
+def make_page(number, header=None, footer=None, positions=True):
+    """Builds a page of body text with an optional header line and footer line."""
+    texts = ([header] if header else []) + body(number) + ([footer] if footer else [])
+    lines = []
+    for index, text in enumerate(texts):
+        if text == header:
+            top = 40
+        elif text == footer:
+            top = 750
+        else:
+            top = 120 + 20 * index
+        bbox = (72, top, 540, top + 12) if positions else None
+        lines.append(OCRLine(text, bbox))
+    return OCRPage(number, 612, 792, "ocr" if positions else "checkpoint", tuple(lines))
+
+
+class TestLayout(unittest.TestCase):
+
+    def test_is_page_number(self):
+        """Test that page number formats are recognized and ordinary lines are not."""
+        for text in ["12", " - 12 - ", "xiv", "Page 12 of 300", "12 / 300", "[3]"]:
+            self.assertTrue(is_page_number(text), text)
+        for text in ["Chapter 12", "1984 was a year", "civil", "I", ""]:
+            self.assertFalse(is_page_number(text), text)
+
+    def test_strips_running_headers_and_page_numbers(self):
+        """Test that alternating running headers and page numbers are removed."""
+        pages = [
+            make_page(
+                number,
+                header=f"NINETEEN EIGHTY-FOUR {number}" if number % 2 else f"{number} PART ONE",
+                footer=str(number + 1),
+            )
+            for number in range(8)
+        ]
+
+        stripped = list(strip_headers_and_footers(pages))
+
+        self.assertEqual([page.number for page in stripped], list(range(8)))
+        for page in stripped:
+            self.assertEqual([line.text for line in page.lines], body(page.number))
+
+    def test_keeps_lines_that_do_not_repeat(self):
+        """Test that a heading found on a single page is left alone."""
+        pages = [make_page(0, header="Chapter One")] + [make_page(n) for n in range(1, 6)]
+
+        stripped = list(strip_headers_and_footers(pages))
+
+        self.assertEqual(stripped, pages)
+
+    def test_pages_without_positions(self):
+        """Test that pages restored without bounding boxes are stripped by line order."""
+        pages = [
+            make_page(number, header="THE BOOK TITLE", footer=str(number), positions=False)
+            for number in range(5)
+        ]
+
+        stripped = list(strip_headers_and_footers(pages, window=2))
+
+        for page in stripped:
+            self.assertEqual([line.text for line in page.lines], body(page.number))
+
+    def test_find_page_furniture(self):
+        """Test that leftover page numbers and repeated short lines are detected in a chunk."""
+        first, second = "\n".join(body(0)), "\n".join(body(1))
+        self.assertEqual(find_page_furniture(f"{first}\n{second}"), (False, False))
+        self.assertEqual(find_page_furniture(f"{first}\n17\n{second}"), (True, False))
+        self.assertEqual(
+            find_page_furniture(f"THE BOOK TITLE 12\n{first}\nTHE BOOK TITLE 14\n{second}"),
+            (False, True),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,25 @@
 # tests/test_llm.py
 
+import json
+import os
+import random
+import tempfile
+import threading
+import time
 import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
 from unittest.mock import call, patch
 
-from narratorx.llm import llm_process_text
+from narratorx.cache import DiskCache
+from narratorx.llm import (
+    RateLimiter,
+    chunk_token_budget,
+    fix_chunk,
+    llm_process_text,
+    load_prompts,
+)
+from narratorx.metrics import Metrics, set_metrics
 from narratorx.utils import split_text_into_chunks
 
 
@@ -159,5 +175,209 @@ class TestFixText(unittest.TestCase):
         )
 
 
+def _completion_response(fixed_text):
+    content = json.dumps({"thinking": "", "fixed_text": fixed_text})
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class _MockCompletionHandler(BaseHTTPRequestHandler):
+    """OpenAI-compatible chat completion endpoint that upper-cases the user message."""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        user_prompt = body["messages"][-1]["content"]
+        time.sleep(random.uniform(0, 0.05))  # finish requests out of order
+        content = json.dumps({"thinking": "", "fixed_text": user_prompt.upper().replace("\n", " ")})
+        payload = json.dumps(
+            {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            }
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestConcurrentLLM(unittest.TestCase):
+
+    def setUp(self):
+        self.text = "".join(f"This is test sentence number {i}. " for i in range(40))
+        self.max_chars = 100
+        self.chunks = [
+            str(chunk) for chunk in split_text_into_chunks(self.text, max_chars=self.max_chars)
+        ]
+
+    @patch("narratorx.llm.completion")
+    def test_concurrent_results_keep_chunk_order(self, mock_completion):
+        """Test that concurrent processing reassembles chunks in their original order."""
+        lock = threading.Lock()
+        in_flight = {"now": 0, "max": 0}
+
+        def side_effect(model, messages, max_tokens, response_format):
+            with lock:
+                in_flight["now"] += 1
+                in_flight["max"] = max(in_flight["max"], in_flight["now"])
+            time.sleep(random.uniform(0, 0.02))
+            with lock:
+                in_flight["now"] -= 1
+            chunk = next(c for c in self.chunks if c in messages[1]["content"])
+            return _completion_response(chunk.upper())
+
+        mock_completion.side_effect = side_effect
+
+        result = llm_process_text(
+            self.text, "en", model_name="gpt-4o", max_chars=self.max_chars, concurrency=4
+        )
+
+        self.assertGreater(len(self.chunks), 4, "The test text should span several chunks.")
+        self.assertEqual(result, "\n\n".join(chunk.upper() for chunk in self.chunks))
+        self.assertLessEqual(in_flight["max"], 4, "Concurrency limit should be respected.")
+        self.assertGreater(in_flight["max"], 1, "Chunks should be processed concurrently.")
+
+    @patch("narratorx.llm.completion")
+    def test_concurrent_failure_propagates(self, mock_completion):
+        """Test that an error in any chunk is raised to the caller."""
+        mock_completion.side_effect = Exception("API Error")
+
+        with self.assertRaises(Exception) as context:
+            llm_process_text(self.text, "en", max_chars=self.max_chars, concurrency=4)
+        self.assertIn("API Error", str(context.exception))
+
+    def test_invalid_concurrency(self):
+        """Test that a non-positive concurrency is rejected."""
+        with self.assertRaises(ValueError):
+            llm_process_text(self.text, "en", concurrency=0)
+
+    def test_rate_limiter_spacing(self):
+        """Test that the rate limiter spaces out requests."""
+        limiter = RateLimiter(requests_per_minute=1200)  # one request every 50ms
+        start = time.monotonic()
+        for _ in range(4):
+            limiter.wait()
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+
+    @patch("narratorx.llm.completion")
+    def test_cached_chunks_skip_completion(self, mock_completion):
+        """Test that a second run over the same text is served entirely from the cache."""
+        mock_completion.side_effect = lambda **kwargs: _completion_response("fixed")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with DiskCache(os.path.join(tmp_dir, "llm.sqlite")) as cache:
+                first = llm_process_text(self.text, "en", max_chars=self.max_chars, cache=cache)
+                calls_after_first_run = mock_completion.call_count
+                second = llm_process_text(self.text, "en", max_chars=self.max_chars, cache=cache)
+
+                self.assertEqual(first, second)
+                self.assertEqual(calls_after_first_run, len(self.chunks))
+                self.assertEqual(mock_completion.call_count, calls_after_first_run)
+                self.assertEqual(cache.stats()["hits"], len(self.chunks))
+
+                # A different model must not reuse the cached results
+                llm_process_text(
+                    self.text, "en", model_name="gpt-4o", max_chars=self.max_chars, cache=cache
+                )
+                self.assertEqual(mock_completion.call_count, 2 * len(self.chunks))
+
+    @patch("narratorx.llm.completion")
+    def test_prompt_flags_follow_chunk(self, mock_completion):
+        """Test that the prompt only mentions page numbers when the chunk still has some."""
+        mock_completion.side_effect = lambda **kwargs: _completion_response("fixed")
+        system_prompt, user_prompt_template = load_prompts("en")
+
+        for chunk, expected in [(self.chunks[0], "False"), (f"{self.chunks[0]}\n17", "True")]:
+            fix_chunk(chunk, system_prompt, user_prompt_template, "gpt-4o-mini", 100)
+            user_prompt = mock_completion.call_args.kwargs["messages"][1]["content"]
+            self.assertIn(f"Do the pages often have page numbers: {expected}", user_prompt)
+            self.assertIn("Do the pages often have headers or footer content: False", user_prompt)
+
+    @patch("narratorx.llm.completion")
+    def test_clean_chunks_skip_completion(self, mock_completion):
+        """Test that chunks scoring above the threshold are never sent to the model."""
+        mock_completion.side_effect = lambda **kwargs: _completion_response("fixed")
+        text = self.text + "Th1s sentence w@s garbled by 0CR. "
+        chunks = [str(chunk) for chunk in split_text_into_chunks(text, max_chars=self.max_chars)]
+        metrics = Metrics()
+        previous = set_metrics(metrics)
+        try:
+            result = llm_process_text(text, "en", max_chars=self.max_chars, skip_threshold=0.9)
+        finally:
+            set_metrics(previous)
+
+        self.assertEqual(mock_completion.call_count, 1)
+        self.assertEqual(result.split("\n\n"), chunks[:-1] + ["fixed"])
+        counters = metrics.summary()["counters"]
+        self.assertEqual(counters["llm.chunks_skipped"], len(chunks) - 1)
+        self.assertGreater(counters["llm.tokens_saved_estimate"], len(text) // 4)
+
+    @patch("narratorx.llm.count_tokens", return_value=500)
+    @patch("narratorx.llm.get_model_info")
+    def test_chunk_token_budget(self, mock_get_model_info, _):
+        """Test that chunks are sized for the answer to fit max_tokens and the context window."""
+        mock_get_model_info.return_value = {"max_input_tokens": 128000, "max_output_tokens": 16384}
+        self.assertEqual(chunk_token_budget("gpt-4o", 4000, "system", "user"), int(4000 / 1.3))
+
+        # Unknown models get a small context window, which then limits the chunk size
+        mock_get_model_info.side_effect = Exception("model not mapped")
+        self.assertEqual(chunk_token_budget("local-model", 2000, "system", "user"), 1538)
+        self.assertEqual(
+            chunk_token_budget("local-model", 6000, "system", "user"), int((8192 - 500) / 2.3)
+        )
+
+    @patch("narratorx.llm.count_tokens", return_value=500)
+    @patch("narratorx.llm.get_model_info")
+    def test_chunk_token_budget_with_max_tokens_near_the_context_window(
+        self, mock_get_model_info, mock_count_tokens
+    ):
+        """Test that max_tokens close to the context window still leaves room for the text."""
+        mock_get_model_info.return_value = {"max_input_tokens": 8192, "max_output_tokens": None}
+        budget = chunk_token_budget("ollama/llama3.1", 8000, "system", "user")
+        self.assertEqual(budget, int((8192 - 500) / 2.3))
+
+        # Prompts that fill the window are an error, not a budget of a few tokens
+        mock_count_tokens.return_value = 7900
+        with self.assertRaises(ValueError):
+            chunk_token_budget("ollama/llama3.1", 8000, "system", "user")
+
+    def test_concurrent_against_mock_server(self):
+        """Test concurrent processing end to end against a local mock completion server."""
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _MockCompletionHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+                result = llm_process_text(
+                    self.text,
+                    "en",
+                    model_name="openai/mock-model",
+                    max_chars=self.max_chars,
+                    concurrency=4,
+                    api_base=f"http://127.0.0.1:{server.server_port}/v1",
+                )
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        fixed_chunks = result.split("\n\n")
+        self.assertEqual(len(fixed_chunks), len(self.chunks))
+        for chunk, fixed_chunk in zip(self.chunks, fixed_chunks):
+            self.assertIn(chunk.upper(), fixed_chunk, "Chunks should come back in order.")
+
+
 if __name__ == "__main__":
     unittest.main()
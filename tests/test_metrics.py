@@ -0,0 +1,96 @@
+# tests/test_metrics.py
+
+import json
+import os
+import tempfile
+import unittest
+
+from narratorx.metrics import (
+    JsonLinesSink,
+    ListSink,
+    Metrics,
+    get_metrics,
+    set_metrics,
+)
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_span_aggregates(self):
+        """Test that spans are counted and their numeric attributes summed."""
+        metrics = Metrics()
+        for chars in (100, 200):
+            with metrics.span("llm.call", model="gpt-4o-mini", chars=chars) as span:
+                span["tokens_out"] = chars // 10
+
+        summary = metrics.summary()["spans"]["llm.call"]
+        self.assertEqual(summary["count"], 2)
+        self.assertEqual(summary["chars"], 300)
+        self.assertEqual(summary["tokens_out"], 30)
+        self.assertNotIn("model", summary)
+        self.assertGreaterEqual(summary["max_seconds"], 0)
+
+    def test_span_records_errors(self):
+        """Test that a failing block is still timed and the exception is re-raised."""
+        metrics = Metrics()
+        with self.assertRaises(RuntimeError):
+            with metrics.span("tts.synthesize"):
+                raise RuntimeError("boom")
+        self.assertEqual(metrics.summary()["spans"]["tts.synthesize"]["count"], 1)
+
+    def test_counters_and_summary_table(self):
+        """Test that counters accumulate and the summary table derives the real-time factor."""
+        metrics = Metrics()
+        metrics.count("ocr.pages_ocr", 3)
+        metrics.count("ocr.pages_ocr")
+        with metrics.span("tts.synthesize", audio_seconds=2.0):
+            pass
+
+        self.assertEqual(metrics.summary()["counters"], {"ocr.pages_ocr": 4})
+        table = metrics.format_summary()
+        self.assertIn("ocr.pages_ocr", table)
+        self.assertIn("rtf=", table)
+
+    def test_json_lines_sink(self):
+        """Test that every record is written to the sink as one JSON line."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "metrics.jsonl")
+            metrics = Metrics(sinks=[JsonLinesSink(path)])
+            with metrics.span("ocr.rasterize", page=0):
+                pass
+            metrics.count("llm.cache_hits")
+            metrics.close()
+
+            with open(path, "r", encoding="utf-8") as f:
+                records = [json.loads(line) for line in f]
+        self.assertEqual([r["type"] for r in records], ["span", "counter"])
+        self.assertEqual(records[0]["name"], "ocr.rasterize")
+        self.assertEqual(records[0]["page"], 0)
+
+    def test_record_from_another_collector(self):
+        """Test that records collected elsewhere are aggregated as if recorded locally."""
+        sink = ListSink()
+        worker = Metrics(sinks=[sink])
+        with worker.span("tts.synthesize", chars=120):
+            pass
+        worker.count("tts.batches", 2)
+
+        metrics = Metrics()
+        for record in sink.records:
+            metrics.record(record)
+
+        self.assertEqual(metrics.summary(), worker.summary())
+
+    def test_set_metrics(self):
+        """Test that the process-wide collector can be replaced and restored."""
+        metrics = Metrics()
+        previous = set_metrics(metrics)
+        try:
+            self.assertIs(get_metrics(), metrics)
+        finally:
+            set_metrics(previous)
+        self.assertIs(get_metrics(), previous)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,35 @@
 # tests/test_ocr.py
 
 import os
+import tempfile
 import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
 
-from narratorx.ocr import get_valid_languages, process_pdf
+import pymupdf
+from PIL import Image
+
+from narratorx.checkpoint import RunDirectory
+from narratorx.ocr import (
+    DETECTION_ITEM_BYTES,
+    OCRBatchSizes,
+    RenderSettings,
+    RenderWorkerPool,
+    choose_page_render,
+    extract_native_lines,
+    extract_native_text,
+    get_ocr_models,
+    get_valid_languages,
+    has_trustworthy_text_layer,
+    iter_pdf_pages,
+    process_pdf,
+    read_pdf_document,
+    render_frame,
+    render_page,
+    resolve_ocr_batch_sizes,
+    run_bucketed_ocr,
+    unload_ocr_models,
+)
 
 
 class TestOCR(unittest.TestCase):
@@ -53,6 +79,49 @@ class TestOCR(unittest.TestCase):
         for text in to_look_for:
             self.assertIn(text, result, f"The output should contain '{text}'.")
 
+    def test_iter_pdf_pages_yields_each_page(self):
+        """Test that streaming OCR yields one string per page, in order, across batches."""
+        with pymupdf.open(self.sample_pdf_en) as doc:
+            page_count = doc.page_count
+
+        pages = list(iter_pdf_pages(self.sample_pdf_en, self.language_en, batch_size=2))
+
+        self.assertEqual(len(pages), page_count, "There should be one result per page.")
+        self.assertTrue(all(isinstance(page, str) for page in pages))
+        self.assertEqual(
+            "\n\n".join(pages),
+            process_pdf(self.sample_pdf_en, self.language_en, batch_size=3),
+            "Batch size should not change the extracted text.",
+        )
+
+    def test_iter_pdf_pages_invalid_batch_size(self):
+        """Test that a non-positive batch size is rejected."""
+        with self.assertRaises(ValueError):
+            list(iter_pdf_pages(self.sample_pdf_en, self.language_en, batch_size=0))
+
+    def test_has_trustworthy_text_layer(self):
+        """Test that born-digital pages are trusted and image-only pages are sent to OCR."""
+        with pymupdf.open(self.sample_pdf_en) as doc:
+            self.assertTrue(has_trustworthy_text_layer(doc[2]), "Text pages should be trusted.")
+            self.assertFalse(
+                has_trustworthy_text_layer(doc[4]), "Image-only pages should need OCR."
+            )
+
+    def test_extract_native_text(self):
+        """Test that native extraction returns one non-empty line per row."""
+        with pymupdf.open(self.sample_pdf_tr) as doc:
+            page_text = extract_native_text(doc[0])
+
+        self.assertIn("Jared Diamond\n", page_text)
+        self.assertTrue(page_text.endswith("\n"))
+        self.assertNotIn("\n\n", page_text, "Blank lines should be dropped.")
+
+    def test_process_pdf_force_ocr(self):
+        """Test OCR processing with the text layer fast path disabled."""
+        result = process_pdf(self.sample_pdf_en, self.language_en, use_text_layer=False)
+
+        self.assertIn("The Little Prince", result)
+
     def test_process_pdf_invalid_path(self):
         """Test OCR with an invalid PDF path, expecting an exception."""
         with self.assertRaises(Exception):
@@ -75,6 +144,30 @@ class TestOCR(unittest.TestCase):
     #     print(f"Output saved to '{output_file}' for manual inspection.")
     #     print("Please inspect the output to ensure the OCR process is working correctly.")
 
+    @patch("narratorx.ocr.load_rec_processor")
+    @patch("narratorx.ocr.load_rec_model")
+    @patch("narratorx.ocr.load_det_model")
+    @patch("narratorx.ocr.load_det_processor")
+    def test_ocr_model_registry(self, mock_det_processor, mock_det_model, mock_rec_model, _):
+        """Test that OCR models are loaded once per device and reloaded after unloading."""
+        unload_ocr_models(all_variants=True)
+        try:
+            first = get_ocr_models(device="cpu")
+            second = get_ocr_models(device="cpu")
+            self.assertIs(first, second, "The same models should be reused across calls.")
+            self.assertEqual(mock_det_model.call_count, 1)
+            self.assertEqual(mock_rec_model.call_count, 1)
+            mock_det_model.assert_called_with(device="cpu")
+
+            get_ocr_models(device="cuda")
+            self.assertEqual(mock_det_model.call_count, 2, "Each device gets its own models.")
+
+            unload_ocr_models(device="cpu")
+            get_ocr_models(device="cpu")
+            self.assertEqual(mock_det_model.call_count, 3, "Unloaded models should be reloaded.")
+        finally:
+            unload_ocr_models(all_variants=True)
+
     def test_get_valid_languages(self):
         """Test the get_valid_languages function."""
         valid_languages = get_valid_languages()
@@ -84,5 +177,205 @@ class TestOCR(unittest.TestCase):
         self.assertIn(self.language_en, valid_languages, "English should be a valid language.")
 
 
+class TestPageRendering(unittest.TestCase):
+
+    def setUp(self):
+        self.doc = pymupdf.open()
+        self.page = self.doc.new_page(width=612, height=792)
+
+    def tearDown(self):
+        self.doc.close()
+
+    def test_dpi_follows_font_size(self):
+        """Test that small text is rendered at a higher resolution than large text."""
+        self.page.insert_text((72, 72), "Body text of the page. " * 3, fontsize=10)
+        self.assertEqual(choose_page_render(self.page).dpi, 144)
+
+        small = self.doc.new_page(width=612, height=792)
+        small.insert_text((72, 72), "Footnote text of the page. " * 3, fontsize=6)
+        self.assertEqual(choose_page_render(small).dpi, RenderSettings().max_dpi)
+
+        large = self.doc.new_page(width=612, height=792)
+        large.insert_text((72, 72), "Title", fontsize=40)
+        self.assertEqual(choose_page_render(large).dpi, RenderSettings().min_dpi)
+
+    def test_grayscale_unless_coloured(self):
+        """Test that black text is rendered in grayscale and coloured pages in colour."""
+        self.page.insert_text((72, 72), "Black text.", fontsize=12)
+        image, render = render_page(self.page)
+        self.assertTrue(render.grayscale)
+        self.assertEqual(image.mode, "L")
+
+        self.page.draw_rect(pymupdf.Rect(72, 100, 540, 400), color=(1, 0, 0), fill=(1, 0, 0))
+        image, render = render_page(self.page)
+        self.assertFalse(render.grayscale)
+        self.assertEqual(image.mode, "RGB")
+
+    def test_clip_to_content(self):
+        """Test that blank margins are cut off unless clipping is disabled."""
+        self.page.insert_text((72, 72), "A short line.", fontsize=12)
+        clip = choose_page_render(self.page).clip
+        self.assertLess(clip.width, self.page.rect.width / 2)
+        self.assertLess(clip.height, self.page.rect.height / 2)
+
+        settings = RenderSettings(clip_to_content=False)
+        self.assertEqual(choose_page_render(self.page, settings).clip, self.page.rect)
+
+    def test_scans_are_not_upsampled(self):
+        """Test that a scanned page is not rendered above the resolution of its image."""
+        scan = pymupdf.Pixmap(pymupdf.csGRAY, pymupdf.IRect(0, 0, 425, 550), False)
+        scan.set_rect(scan.irect, (255,))
+        self.page.insert_image(self.page.rect, pixmap=scan)
+
+        render = choose_page_render(self.page, RenderSettings(min_dpi=10))
+        self.assertEqual(render.dpi, 50)
+
+    def test_render_worker_pool_matches_in_process_rendering(self):
+        """Test that pages rendered by worker processes match those rendered in-process."""
+        for number in range(4):
+            page = self.page if number == 0 else self.doc.new_page(width=612, height=792)
+            page.insert_text((72, 72 + 40 * number), f"Page number {number}.", fontsize=11)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pdf_path = os.path.join(tmp_dir, "pages.pdf")
+            self.doc.save(pdf_path)
+
+            with RenderWorkerPool(pdf_path, workers=2) as pool:
+                futures = pool.render([0, 2, 3])
+                frames = [frame for future in futures for frame in future.result()]
+
+        self.assertEqual([frame.page for frame in frames], [0, 2, 3])
+        for frame in frames:
+            expected = render_frame(self.doc[frame.page])
+            self.assertEqual(frame, expected)
+            self.assertEqual(frame.to_image().size, (frame.width, frame.height))
+
+
+class TestOCRBatching(unittest.TestCase):
+
+    @patch("narratorx.ocr.run_page_ocr")
+    def test_pages_are_bucketed_by_size(self, mock_run_page_ocr):
+        """Test that pages of different sizes are recognized apart and returned in order."""
+        mock_run_page_ocr.side_effect = lambda images, *args: [
+            SimpleNamespace(size=image.size) for image in images
+        ]
+        sizes = [(1000, 1400), (2000, 3000), (1010, 1390), (1000, 1400)]
+        images = [Image.new("L", size) for size in sizes]
+        batch_sizes = OCRBatchSizes(detection=2, recognition=16)
+
+        predictions = run_bucketed_ocr(images, "en", None, batch_sizes)
+
+        self.assertEqual([prediction.size for prediction in predictions], sizes)
+        batches = [call.args[0] for call in mock_run_page_ocr.call_args_list]
+        self.assertEqual([len(batch) for batch in batches], [3, 1])
+        for call in mock_run_page_ocr.call_args_list:
+            self.assertEqual(call.args[3], batch_sizes)
+
+    @patch("narratorx.ocr._available_memory", return_value=8 * DETECTION_ITEM_BYTES)
+    def test_batch_sizes_from_memory(self, _):
+        """Test that unset batch sizes are derived from memory and set ones are kept."""
+        # Half of the memory goes to OCR: 4 pages of 440 MB, or 35 lines of 50 MB
+        self.assertEqual(resolve_ocr_batch_sizes(), OCRBatchSizes(detection=4, recognition=35))
+        self.assertEqual(resolve_ocr_batch_sizes(OCRBatchSizes(detection=1)).detection, 1)
+
+    @patch("narratorx.ocr._available_memory", return_value=None)
+    def test_batch_sizes_without_memory_information(self, _):
+        """Test that Surya's defaults are kept when the free memory is unknown."""
+        self.assertEqual(resolve_ocr_batch_sizes(), OCRBatchSizes())
+
+
+class TestDocumentModel(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.pdf_path = os.path.join(self.tmp_dir.name, "document.pdf")
+        with pymupdf.open() as doc:
+            page = doc.new_page(width=612, height=792)
+            page.insert_text((72, 72), "A page with an embedded text layer.", fontsize=12)
+            page.insert_text((72, 100), "It has two lines.", fontsize=12)
+            scan = pymupdf.Pixmap(pymupdf.csGRAY, pymupdf.IRect(0, 0, 400, 500), False)
+            scan.set_rect(scan.irect, (0,))
+            doc.new_page(width=612, height=792).insert_image(
+                pymupdf.Rect(100, 100, 500, 600), pixmap=scan
+            )
+            doc.save(self.pdf_path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_extract_native_lines(self):
+        """Test that text layer lines come with their bounding boxes."""
+        with pymupdf.open(self.pdf_path) as doc:
+            lines = extract_native_lines(doc[0])
+            page_text = extract_native_text(doc[0])
+
+        self.assertEqual(
+            [line.text for line in lines],
+            ["A page with an embedded text layer.", "It has two lines."],
+        )
+        self.assertEqual(page_text, "".join(f"{line.text}\n" for line in lines))
+        self.assertLess(lines[0].bbox[1], 72)
+        self.assertLess(lines[0].bbox[3], lines[1].bbox[3])
+        self.assertIsNone(lines[0].confidence)
+
+    @patch("narratorx.ocr.get_ocr_models")
+    @patch("narratorx.ocr.run_page_ocr")
+    def test_read_pdf_document(self, mock_run_page_ocr, _):
+        """Test that OCR lines are mapped to page coordinates and joined into the full text."""
+        mock_run_page_ocr.side_effect = lambda images, *args: [
+            SimpleNamespace(
+                text_lines=[
+                    SimpleNamespace(text="Scanned line", bbox=[0, 0, 96, 48], confidence=0.8)
+                ]
+            )
+            for _ in images
+        ]
+        settings = RenderSettings(default_dpi=96, min_dpi=96, max_dpi=96)
+
+        document = read_pdf_document(self.pdf_path, "en", render_settings=settings)
+
+        self.assertEqual([page.source for page in document.pages], ["text_layer", "ocr"])
+        scanned = document.pages[1]
+        self.assertEqual((scanned.number, scanned.width, scanned.height), (1, 612, 792))
+        (line,) = scanned.lines
+        self.assertEqual(line.confidence, 0.8)
+        # 96 pixels at 96 dpi are 72 points, counted from the clipped area's corner
+        x0, y0 = line.bbox[:2]
+        self.assertEqual((line.bbox[2] - x0, line.bbox[3] - y0), (72, 36))
+        self.assertLess(x0, 100)
+        self.assertEqual(document.full_text, process_pdf(self.pdf_path, "en"))
+        self.assertTrue(document.full_text.endswith("\n\nScanned line\n"))
+
+    @patch("narratorx.ocr.get_ocr_models")
+    @patch("narratorx.ocr.run_page_ocr")
+    def test_resumed_pages_keep_their_layout(self, mock_run_page_ocr, _):
+        """Test that pages restored from a checkpoint keep their line boxes and confidences."""
+        mock_run_page_ocr.side_effect = lambda images, *args: [
+            SimpleNamespace(
+                text_lines=[
+                    SimpleNamespace(text="Scanned line", bbox=[0, 0, 96, 48], confidence=0.8)
+                ]
+            )
+            for _ in images
+        ]
+        settings = RenderSettings(default_dpi=96, min_dpi=96, max_dpi=96)
+        run_dir = os.path.join(self.tmp_dir.name, "run")
+
+        fresh = read_pdf_document(
+            self.pdf_path, "en", render_settings=settings, checkpoint=RunDirectory(run_dir, {})
+        )
+        resumed = read_pdf_document(
+            self.pdf_path,
+            "en",
+            render_settings=settings,
+            checkpoint=RunDirectory(run_dir, {}, resume=True),
+        )
+
+        self.assertEqual(mock_run_page_ocr.call_count, 1)
+        self.assertEqual([page.source for page in resumed.pages], ["checkpoint", "checkpoint"])
+        self.assertEqual(
+            [page.lines for page in resumed.pages], [page.lines for page in fresh.pages]
+        )
+
+
 if __name__ == "__main__":
     unittest.main()
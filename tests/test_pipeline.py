@@ -0,0 +1,94 @@
+# tests/test_pipeline.py
+
+import random
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+from narratorx.pipeline import run_pipeline
+
+
+class TestRunPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.pages = [f"Page {i} sentence one. Page {i} sentence two." for i in range(12)]
+        self.tts_model = MagicMock()
+        self.tts_model.synthesizer.output_sample_rate = 24000
+
+        patchers = {
+            "iter_pdf_pages": patch(
+                "narratorx.pipeline.iter_pdf_pages",
+                side_effect=lambda *a, **k: (page for page in self.pages),
+            ),
+            "load_prompts": patch(
+                "narratorx.pipeline.load_prompts", return_value=("system", "{content}")
+            ),
+            "fix_chunk": patch("narratorx.pipeline.fix_chunk", side_effect=self._fix_chunk),
+            "iter_synthesized_chunks": patch(
+                "narratorx.pipeline.iter_synthesized_chunks",
+                side_effect=self._iter_synthesized_chunks,
+            ),
+            "open_audio_output": patch("narratorx.pipeline.open_audio_output"),
+        }
+        self.mocks = {name: patcher.start() for name, patcher in patchers.items()}
+        for patcher in patchers.values():
+            self.addCleanup(patcher.stop)
+        self.output_file = self.mocks["open_audio_output"].return_value.__enter__.return_value
+        self.spoken = []
+
+    def _fix_chunk(self, chunk, *args, **kwargs):
+        time.sleep(random.uniform(0, 0.01))  # finish requests out of order
+        return chunk.upper()
+
+    def _iter_synthesized_chunks(self, tts_model, chunk_texts, language, **kwargs):
+        self.spoken.extend(chunk_texts)
+        return [np.zeros(10, dtype=np.float32) for _ in chunk_texts]
+
+    def test_pipeline_keeps_order(self):
+        """Test that every sentence reaches TTS once, in document order."""
+        run_pipeline(
+            "book.pdf",
+            "en",
+            "output.wav",
+            max_chars_llm=100,
+            max_characters_tts=200,
+            llm_concurrency=4,
+            tts_model=self.tts_model,
+            queue_size=2,
+        )
+
+        expected = [
+            sentence.upper()
+            for page in self.pages
+            for sentence in (page[: page.index(".") + 1], page[page.index(".") + 2 :])
+        ]
+        self.assertEqual(self.spoken, expected)
+        self.assertEqual(self.output_file.write.call_count, len(expected))
+
+    def test_pipeline_propagates_stage_errors(self):
+        """Test that a failure in an upstream stage stops the pipeline and is raised."""
+        self.mocks["fix_chunk"].side_effect = Exception("LLM processing error")
+
+        with self.assertRaises(Exception) as context:
+            run_pipeline(
+                "book.pdf", "en", "output.wav", max_chars_llm=100, tts_model=self.tts_model
+            )
+        self.assertIn("LLM processing error", str(context.exception))
+
+    def test_pipeline_no_audio(self):
+        """Test that an empty document raises like the sequential path does."""
+        self.pages = []
+
+        with self.assertRaises(ValueError):
+            run_pipeline("book.pdf", "en", "output.wav", tts_model=self.tts_model)
+
+    def test_pipeline_invalid_concurrency(self):
+        """Test that invalid concurrency settings are rejected."""
+        with self.assertRaises(ValueError):
+            run_pipeline("book.pdf", "en", "output.wav", llm_concurrency=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+# tests/test_quality.py
+
+import unittest
+
+from narratorx.quality import reflow_text, score_text
+
+WRAPPED = (
+    "Once when I was six years old I saw a magnificent picture in a book, called True\n"
+    "Stories from Nature, about the primeval forest. It was a picture of a boa constrictor\n"
+    "in the act of swallowing an animal. Here is a copy of the drawing.\n"
+    "In the book it said: boa constrictors swallow their prey whole, without chewing it.\n"
+)
+
+
+class TestQuality(unittest.TestCase):
+
+    def test_clean_text_scores_high(self):
+        """Test that well recognized text gets a perfect score."""
+        self.assertEqual(score_text(WRAPPED), 1.0)
+        self.assertEqual(score_text(""), 1.0)
+
+    def test_ocr_errors_lower_the_score(self):
+        """Test that garbled words, mixed scripts and stray symbol lines count against a text."""
+        clean = score_text(WRAPPED)
+        for noisy in [
+            WRAPPED.replace("picture", "p1cture"),
+            WRAPPED.replace("forest", "fоrest"),  # Cyrillic "о"
+            WRAPPED.replace("animal", "anIMal"),
+            WRAPPED + "~ | ~\n",
+        ]:
+            self.assertLess(score_text(noisy), clean, noisy)
+
+    def test_leftover_page_furniture_scores_zero(self):
+        """Test that text with a page number left in it always goes to the LLM."""
+        self.assertEqual(score_text(WRAPPED + "17\n" + WRAPPED), 0.0)
+
+    def test_reflow_text(self):
+        """Test that wrapped lines are joined and sentence ends and headings are kept."""
+        text = (
+            "Chapter One\nThe boa swal-\nlowed the ele-\nphant whole, and\nthen slept.\nNext line."
+        )
+        self.assertEqual(
+            reflow_text(text),
+            "Chapter One\nThe boa swallowed the elephant whole, and then slept.\nNext line.",
+        )
+        # Lines as long as the rest are wrapped even before a capitalized word
+        self.assertNotIn("True\nStories", reflow_text(WRAPPED))
+        self.assertEqual(reflow_text(WRAPPED).count("\n"), 2)
+
+    def test_hyphenation_and_broken_lines_lower_the_score(self):
+        """Test that joins that could be wrong count against a text."""
+        self.assertLess(score_text(WRAPPED.replace("swallowing", "swal-\nlowing")), 1.0)
+        self.assertLess(score_text(WRAPPED + "Figure\nof a\nhat\n"), 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
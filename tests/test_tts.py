@@ -1,20 +1,47 @@
 # tests/test_tts.py
 
+import os
+import random
+import tempfile
+import time
 import unittest
+import wave
+from concurrent.futures import Future, ThreadPoolExecutor
 from unittest.mock import MagicMock, patch
 
 import numpy as np
+import soundfile as sf
 from unstructured.chunking.basic import chunk_elements
 from unstructured.documents.elements import NarrativeText
 
-from narratorx.tts import text_to_speech
+from narratorx.cache import DiskCache
+from narratorx.metrics import Metrics, get_metrics, set_metrics
+from narratorx.progress import ProgressReporter
+from narratorx.tts import (
+    _finish_worker_future,
+    _padded_prefix,
+    _worker_synthesize,
+    batch_by_length,
+    get_conditioning,
+    get_tts_model,
+    iter_synthesized_chunks,
+    open_audio_output,
+    split_by_natural_breakpoints,
+    split_locally,
+    split_text_into_chunks,
+    synthesize_batch,
+    synthesize_chunk,
+    text_to_speech,
+    unload_tts_model,
+)
+from narratorx.utils import join_segmented, segment_text
 
 
 class TestTextToSpeech(unittest.TestCase):
 
     @patch("narratorx.tts.TTS")
-    @patch("narratorx.tts.sf.write")
-    def test_text_to_speech_success(self, mock_sf_write, mock_tts_class):
+    @patch("narratorx.tts.sf.SoundFile")
+    def test_text_to_speech_success(self, mock_soundfile, mock_tts_class):
         """Test that text_to_speech generates audio correctly with chunking."""
         # Mock TTS model and audio generation
         mock_tts_instance = MagicMock()
@@ -63,16 +90,19 @@ class TestTextToSpeech(unittest.TestCase):
             self.assertEqual(kwargs["speaker"], "Asya Anara")
             self.assertEqual(kwargs["split_sentences"], False)
 
-        # Check that the concatenated audio data is written to the output path
-        mock_sf_write.assert_called_once()
-        sf_write_args, sf_write_kwargs = mock_sf_write.call_args
+        # Check that every chunk is streamed into the output file
+        mock_soundfile.assert_called_once()
+        sf_args, sf_kwargs = mock_soundfile.call_args
         self.assertEqual(
-            sf_write_args[0], output_path, "Audio should be written to the specified output path."
+            sf_args[0], output_path, "Audio should be written to the specified output path."
         )
+        self.assertEqual(sf_kwargs["mode"], "w")
+        output_file = mock_soundfile.return_value.__enter__.return_value
+        self.assertEqual(output_file.write.call_count, expected_chunk_count)
 
     @patch("narratorx.tts.TTS")
-    @patch("narratorx.tts.sf.write")
-    def test_text_to_speech_empty_text(self, mock_sf_write, mock_tts_class):
+    @patch("narratorx.tts.sf.SoundFile")
+    def test_text_to_speech_empty_text(self, mock_soundfile, mock_tts_class):
         """Test text_to_speech with empty text input."""
         text = ""
         language = "en"
@@ -82,13 +112,13 @@ class TestTextToSpeech(unittest.TestCase):
         with self.assertRaises(ValueError):
             text_to_speech(text, language, output_path)
 
-        # Ensure TTS and soundfile.write were never called
+        # Ensure TTS was never called and no output file was opened
         mock_tts_class.return_value.tts.assert_not_called()
-        mock_sf_write.assert_not_called()
+        mock_soundfile.assert_not_called()
 
     @patch("narratorx.tts.TTS")
-    @patch("narratorx.tts.sf.write")
-    def test_text_to_speech_invalid_text_type(self, mock_sf_write, mock_tts_class):
+    @patch("narratorx.tts.sf.SoundFile")
+    def test_text_to_speech_invalid_text_type(self, mock_soundfile, mock_tts_class):
         """Test text_to_speech raises TypeError with non-string text input."""
         text = 12345  # Invalid input type
         language = "en"
@@ -98,13 +128,13 @@ class TestTextToSpeech(unittest.TestCase):
         with self.assertRaises(TypeError):
             text_to_speech(text, language, output_path)
 
-        # Ensure TTS and soundfile.write were never called
+        # Ensure TTS was never called and no output file was opened
         mock_tts_class.return_value.tts.assert_not_called()
-        mock_sf_write.assert_not_called()
+        mock_soundfile.assert_not_called()
 
     @patch("narratorx.tts.TTS")
-    @patch("narratorx.tts.sf.write")
-    def test_text_to_speech_no_audio_generated(self, mock_sf_write, mock_tts_class):
+    @patch("narratorx.tts.sf.SoundFile")
+    def test_text_to_speech_no_audio_generated(self, mock_soundfile, mock_tts_class):
         """Test that text_to_speech raises an error if no audio data was generated."""
         # Mock the TTS instance
         mock_tts_instance = MagicMock()
@@ -128,12 +158,12 @@ class TestTextToSpeech(unittest.TestCase):
         # Ensure that TTS was called
         mock_tts_instance.tts.assert_called()
 
-        # Ensure soundfile.write was not called since no audio data should be written
-        mock_sf_write.assert_not_called()
+        # Ensure no audio data was written to the output file
+        mock_soundfile.return_value.__enter__.return_value.write.assert_not_called()
 
     @patch("narratorx.tts.TTS")
-    @patch("narratorx.tts.sf.write")
-    def test_text_to_speech_single_chunk(self, mock_sf_write, mock_tts_class):
+    @patch("narratorx.tts.sf.SoundFile")
+    def test_text_to_speech_single_chunk(self, mock_soundfile, mock_tts_class):
         """Test text_to_speech processes a single chunk correctly."""
         # Mock TTS model
         mock_tts_instance = MagicMock()
@@ -155,13 +185,456 @@ class TestTextToSpeech(unittest.TestCase):
         mock_tts_instance.tts.assert_called_once_with(
             text=text, language=language, speaker="Asya Anara", split_sentences=False
         )
-        mock_sf_write.assert_called_once()
+        mock_soundfile.assert_called_once()
 
         # Verify audio output path
-        sf_write_args, sf_write_kwargs = mock_sf_write.call_args
+        sf_args, sf_kwargs = mock_soundfile.call_args
         self.assertEqual(
-            sf_write_args[0], output_path, "Audio should be written to the specified output path."
+            sf_args[0], output_path, "Audio should be written to the specified output path."
         )
+        mock_soundfile.return_value.__enter__.return_value.write.assert_called_once()
+
+    @patch("narratorx.tts.sf.SoundFile")
+    def test_text_to_speech_reports_progress(self, mock_soundfile):
+        """Test that progress goes to the given reporter instead of a terminal progress bar."""
+        tts_model = MagicMock()
+        tts_model.tts.return_value = np.zeros(12000, dtype=np.float32)
+        tts_model.synthesizer.output_sample_rate = 24000
+        calls = []
+
+        class RecordingProgress(ProgressReporter):
+            def start(self, total, description=""):
+                calls.append(("start", total))
+
+            def advance(self, count=1):
+                calls.append(("advance", count))
+
+            def event(self, name, **fields):
+                calls.append((name, fields["text"], fields["audio_seconds"]))
+
+            def finish(self):
+                calls.append(("finish",))
+
+        text_to_speech(
+            "Sentence one. Sentence two.",
+            "en",
+            "output.wav",
+            tts_model=tts_model,
+            progress=RecordingProgress(),
+        )
+
+        self.assertEqual(
+            calls,
+            [
+                ("start", 2),
+                ("chunk_synthesized", "Sentence one.", 0.5),
+                ("advance", 1),
+                ("chunk_synthesized", "Sentence two.", 0.5),
+                ("advance", 1),
+                ("finish",),
+            ],
+        )
+
+    @patch("narratorx.tts.TTS")
+    def test_get_tts_model_is_shared(self, mock_tts_class):
+        """Test that the process-wide TTS model is loaded once per device."""
+        self.addCleanup(unload_tts_model, "cpu")
+        first = get_tts_model("cpu")
+        second = get_tts_model("cpu")
+
+        self.assertIs(first, second)
+        mock_tts_class.assert_called_once()
+        unload_tts_model("cpu")
+        get_tts_model("cpu")
+        self.assertEqual(mock_tts_class.call_count, 2)
+
+
+class TestAudioCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = DiskCache(os.path.join(self.tmp_dir.name, "tts.sqlite"))
+        self.tts_model = MagicMock()
+        self.tts_model.tts.return_value = [0.0, 0.5, -0.5]
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp_dir.cleanup()
+
+    def test_synthesize_chunk_uses_cache(self):
+        """Test that repeated chunks are synthesized once and served from the cache after."""
+        first = synthesize_chunk(self.tts_model, "Chapter  One.", "en", cache=self.cache)
+        second = synthesize_chunk(self.tts_model, " Chapter One. ", "en", cache=self.cache)
+
+        self.tts_model.tts.assert_called_once()
+        np.testing.assert_array_equal(first, second)
+        self.assertEqual(second.dtype, np.float32)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_synthesize_chunk_with_conditioning(self):
+        """Test that precomputed speaker conditioning is fed straight into XTTS inference."""
+        xtts = self.tts_model.synthesizer.tts_model
+        xtts.inference.return_value = {"wav": np.array([0.0, 0.5], dtype=np.float32)}
+        conditioning = ("latent", "embedding")
+
+        wav = synthesize_chunk(self.tts_model, "Chapter One.", "en", conditioning=conditioning)
+
+        self.tts_model.tts.assert_not_called()
+        args = xtts.inference.call_args.args
+        self.assertEqual(args, ("Chapter One.", "en", "latent", "embedding"))
+        np.testing.assert_array_equal(wav[:2], [0.0, 0.5])
+        self.assertFalse(wav[2:].any(), "Sentences are followed by silence like TTS.tts adds.")
+
+    def test_synthesize_chunk_cache_key_includes_language_and_speaker(self):
+        """Test that a different language or speaker is not served from the cache."""
+        synthesize_chunk(self.tts_model, "Chapter One.", "en", cache=self.cache)
+        synthesize_chunk(self.tts_model, "Chapter One.", "tr", cache=self.cache)
+        synthesize_chunk(self.tts_model, "Chapter One.", "en", speaker="Other", cache=self.cache)
+
+        self.assertEqual(self.tts_model.tts.call_count, 3)
+
+    @patch("narratorx.tts.sf.SoundFile")
+    def test_text_to_speech_with_cache(self, mock_soundfile):
+        """Test that a second run over the same text does not call the TTS model."""
+        text = "Sentence one. Sentence two. Sentence one."
+        text_to_speech(text, "en", "output.wav", tts_model=self.tts_model, cache=self.cache)
+        self.assertEqual(self.tts_model.tts.call_count, 2, "Repeated sentences are cached.")
+
+        text_to_speech(text, "en", "output.wav", tts_model=self.tts_model, cache=self.cache)
+        self.assertEqual(self.tts_model.tts.call_count, 2)
+        self.assertEqual(mock_soundfile.call_count, 2)
+
+    def test_text_to_speech_streams_to_disk(self):
+        """Test that audio is written incrementally and the output is a valid WAV file."""
+        text = "Sentence one. Sentence two. Sentence three."
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_path = os.path.join(tmp_dir, "out", "book.wav")
+            self.tts_model.synthesizer.output_sample_rate = 24000
+
+            text_to_speech(text, "en", output_path, tts_model=self.tts_model)
+
+            info = sf.info(output_path)
+            self.assertEqual(info.samplerate, 24000)
+            self.assertEqual(info.channels, 1)
+            self.assertEqual(info.frames, 3 * len(self.tts_model.tts.return_value))
+
+    def test_partial_output_is_readable(self):
+        """Test that an output file still being written already has a valid header."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_path = os.path.join(tmp_dir, "book.wav")
+            with open_audio_output(output_path, 24000) as out:
+                for _ in range(3):
+                    out.write(np.zeros(1000, dtype=np.float32))
+                    out.flush()
+
+                    # Read back as a killed run would leave it, before the file is closed
+                    with wave.open(output_path) as partial:
+                        frames = partial.getnframes()
+                self.assertEqual(frames, 3000)
+                self.assertEqual(sf.info(output_path).frames, 3000)
+
+
+class TestBatchedSynthesis(unittest.TestCase):
+
+    def setUp(self):
+        self.tts_model = MagicMock()
+        self.tts_model.synthesizer.output_sample_rate = 24000
+        # One token per word
+        self.tts_model.synthesizer.tts_model.tokenizer.encode.side_effect = (
+            lambda text, lang: text.split()
+        )
+        self.batches = []
+
+    def _generate_batch(self, tts_model, token_batch, conditioning):
+        self.batches.append(token_batch)
+        return [np.full(len(tokens), len(tokens), dtype=np.float32) for tokens in token_batch]
+
+    @patch("narratorx.tts.get_conditioning", return_value=("latent", "embedding"))
+    def test_batches_group_similar_lengths_and_keep_order(self, mock_get_conditioning):
+        """Test that chunks of similar token length share a batch and results keep input order."""
+        texts = ["one two", "a b c", "three four", "d e f", "five six", "g"]
+        with patch("narratorx.tts._generate_batch", side_effect=self._generate_batch):
+            wavs = synthesize_batch(self.tts_model, texts, "en", batch_size=2)
+
+        self.assertEqual([len(wav) for wav in wavs], [2, 3, 2, 3, 2, 1])
+        self.assertEqual(sorted(len(batch) for batch in self.batches), [1, 1, 2, 2])
+        for batch in self.batches:
+            self.assertEqual(len({len(tokens) for tokens in batch}), 1)
+        mock_get_conditioning.assert_called_once()
+
+    @patch("narratorx.tts.get_conditioning", return_value=("latent", "embedding"))
+    def test_batches_pad_lengths_within_the_limit(self, _):
+        """Test that chunks whose lengths differ by at most MAX_BATCH_PADDING share a batch."""
+        texts = [" ".join(["word"] * length) for length in (8, 3, 9, 8)]
+        with patch("narratorx.tts._generate_batch", side_effect=self._generate_batch):
+            wavs = synthesize_batch(self.tts_model, texts, "en", batch_size=3)
+
+        self.assertEqual([len(wav) for wav in wavs], [8, 3, 9, 8])
+        self.assertEqual(
+            [[len(tokens) for tokens in batch] for batch in self.batches], [[3], [8, 8, 9]]
+        )
+
+    @patch("narratorx.tts.sf.SoundFile")
+    @patch("narratorx.tts.get_conditioning", return_value=("latent", "embedding"))
+    def test_text_to_speech_batched_matches_sequential_order(
+        self, mock_get_conditioning, mock_soundfile
+    ):
+        """Test that batched synthesis writes audio in the same order as sequential synthesis."""
+        text = "One two. A b c. Three four. D e f. Five six."
+        with patch("narratorx.tts._generate_batch", side_effect=self._generate_batch):
+            text_to_speech(text, "en", "output.wav", tts_model=self.tts_model, batch_size=4)
+
+        output_file = mock_soundfile.return_value.__enter__.return_value
+        written = [len(call.args[0]) for call in output_file.write.call_args_list]
+        self.assertEqual(written, [2, 3, 2, 3, 2])
+        mock_get_conditioning.assert_called_once()
+        self.tts_model.tts.assert_not_called()
+
+    def test_batch_by_length(self):
+        """Test that chunks of similar token length share a batch and outliers get their own."""
+        lengths = [45, 90, 40, 63, 42, 62, 44]
+
+        batches = batch_by_length(lengths, batch_size=3)
+
+        self.assertEqual(batches, [[2, 4, 6], [0], [5, 3], [1]])
+
+    def test_invalid_batch_size(self):
+        """Test that a non-positive batch size is rejected."""
+        with self.assertRaises(ValueError):
+            synthesize_batch(self.tts_model, ["text"], "en", batch_size=0)
+
+
+@unittest.skipUnless(
+    os.environ.get("NARRATORX_XTTS_TESTS"), "loads the XTTS model; set NARRATORX_XTTS_TESTS=1"
+)
+class TestPaddedBatchWithModel(unittest.TestCase):
+    """Checks the padded batch path against the real XTTS model. Slow, so skipped by default."""
+
+    SHORT = "The quick brown fox jumps over the lazy dog."
+    LONG = "The quick brown fox jumps over the lazy dog, and then it runs away."
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tts_model = get_tts_model("cpu")
+        cls.xtts = cls.tts_model.synthesizer.tts_model
+        cls.conditioning = get_conditioning(cls.tts_model)
+
+    def _tokens(self, text):
+        return self.xtts.tokenizer.encode(text.lower(), lang="en")
+
+    def test_padding_does_not_change_the_first_step(self):
+        """Test that a padded row gets the same first audio token logits as the chunk alone."""
+        import torch
+
+        gpt = self.xtts.gpt
+        latent = self.conditioning[0].to(self.xtts.device)
+        short, long = self._tokens(self.SHORT), self._tokens(self.LONG)
+        self.assertLess(len(short), len(long))
+
+        def first_logits(token_batch):
+            prefix, attention_mask, gpt_inputs = _padded_prefix(
+                gpt, latent, token_batch, self.xtts.device
+            )
+            with torch.inference_mode():
+                gpt.gpt_inference.store_prefix_emb(prefix)
+                output = gpt.gpt_inference(
+                    gpt_inputs, attention_mask=attention_mask, return_dict=True
+                )
+            return output.logits[:, -1]
+
+        torch.testing.assert_close(
+            first_logits([short, long])[:1], first_logits([short]), rtol=1e-4, atol=1e-4
+        )
+
+    def test_padded_batch_matches_unbatched_synthesis(self):
+        """Test that with greedy decoding a padded batch gives the audio of unbatched synthesis."""
+        greedy = {
+            "temperature": 1.0,
+            "length_penalty": 1.0,
+            "repetition_penalty": 10.0,
+            "top_k": 1,
+            "top_p": 1.0,
+        }
+        with patch("narratorx.tts._inference_settings", return_value=greedy):
+            alone = synthesize_chunk(
+                self.tts_model, self.SHORT, "en", conditioning=self.conditioning
+            )
+            batched = synthesize_batch(
+                self.tts_model,
+                [self.SHORT, self.LONG],
+                "en",
+                batch_size=2,
+                conditioning=self.conditioning,
+            )
+
+        self.assertEqual(len(batched[0]), len(alone))
+        np.testing.assert_allclose(batched[0], alone, atol=1e-3)
+
+
+class _ThreadWorkerPool:
+    """Stands in for TTSWorkerPool, finishing chunks out of order on threads."""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.submitted = []
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    def _synthesize(self, chunk_texts):
+        time.sleep(random.uniform(0, 0.01))
+        return [np.full(len(text), len(text), dtype=np.float32) for text in chunk_texts]
+
+    def submit(self, chunk_texts, language, voice=None, batch_size=1) -> Future:
+        self.submitted.append(chunk_texts)
+        return self._executor.submit(self._synthesize, chunk_texts)
+
+    def close(self):
+        self._executor.shutdown()
+
+
+class TestWorkerPool(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = _ThreadWorkerPool(workers=4)
+        self.addCleanup(self.pool.close)
+        self.texts = [f"Sentence number {'x' * i}." for i in range(20)]
+
+    def test_results_keep_order(self):
+        """Test that chunks synthesized by the pool are yielded in input order."""
+        wavs = list(iter_synthesized_chunks(None, self.texts, "en", pool=self.pool))
+
+        self.assertEqual([len(wav) for wav in wavs], [len(text) for text in self.texts])
+        self.assertEqual(len(self.pool.submitted), len(self.texts))
+
+    def test_cache_is_used_in_the_parent(self):
+        """Test that cached chunks are not sent to the workers and new audio is cached."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with DiskCache(os.path.join(tmp_dir, "tts.sqlite")) as cache:
+                list(
+                    iter_synthesized_chunks(None, self.texts[:5], "en", cache=cache, pool=self.pool)
+                )
+                wavs = list(
+                    iter_synthesized_chunks(None, self.texts, "en", cache=cache, pool=self.pool)
+                )
+
+        self.assertEqual([len(wav) for wav in wavs], [len(text) for text in self.texts])
+        self.assertEqual(len(self.pool.submitted), len(self.texts))
+
+    @patch("narratorx.tts.synthesize_batch")
+    def test_worker_metrics_reach_the_parent(self, mock_synthesize_batch):
+        """Test that spans recorded in a worker process are added to the parent's metrics."""
+
+        def synthesize_batch(tts_model, chunk_texts, *args, **kwargs):
+            with get_metrics().span("tts.synthesize", chars=sum(map(len, chunk_texts))):
+                return [np.zeros(len(text), dtype=np.float32) for text in chunk_texts]
+
+        mock_synthesize_batch.side_effect = synthesize_batch
+        worker_future = Future()
+        worker_future.set_result(_worker_synthesize(self.texts[:3], "en", None, 1))
+
+        metrics = Metrics()
+        previous = set_metrics(metrics)
+        try:
+            future = Future()
+            _finish_worker_future(future, worker_future)
+        finally:
+            set_metrics(previous)
+
+        self.assertEqual(len(future.result()), 3)
+        span = metrics.summary()["spans"]["tts.synthesize"]
+        self.assertEqual(span["chars"], sum(map(len, self.texts[:3])))
+
+
+class TestNaturalBreakpoints(unittest.TestCase):
+
+    def test_split_on_conjunctions_and_punctuation(self):
+        """Test that overlong text is cut after the last breakpoint that fits."""
+        text = "The rain fell on the town and the river rose, slowly; nobody moved at all"
+        self.assertEqual(
+            split_by_natural_breakpoints(text, 30, "en"),
+            ["The rain fell on the town and", "the river rose,", "slowly; nobody moved at all"],
+        )
+
+    def test_split_without_breakpoints(self):
+        """Test that text without breakpoints is packed word by word."""
+        text = "alpha   beta gamma\ndelta epsilon zeta eta theta"
+        self.assertEqual(
+            split_by_natural_breakpoints(text, 12, "en"),
+            ["alpha beta", "gamma delta", "epsilon zeta", "eta theta"],
+        )
+
+    @patch("narratorx.tts.split_with_llm", side_effect=lambda model, text, *args: [text.upper()])
+    def test_overlong_pieces_go_to_llm_when_asked(self, mock_split_with_llm):
+        """Test that pieces still too long after splitting go to the LLM splitter if enabled."""
+        self.assertEqual(
+            split_by_natural_breakpoints(
+                "a Supercalifragilistic word", 5, "en", use_llm_splitter=True
+            ),
+            ["a", "SUPERCALIFRAGILISTIC", "word"],
+        )
+        mock_split_with_llm.assert_called_once()
+
+    @patch("narratorx.tts.split_with_llm")
+    def test_overlong_pieces_are_split_locally(self, mock_split_with_llm):
+        """Test that pieces still too long after splitting are split without the LLM."""
+        chunks = split_by_natural_breakpoints("a Supercalifragilistic word", 5, "en")
+
+        self.assertEqual(chunks, ["a", "Super", "calif", "ragil", "istic", "word"])
+        mock_split_with_llm.assert_not_called()
+
+
+class TestSplitTextIntoChunks(unittest.TestCase):
+
+    def test_segmented_text_is_not_tokenized_again(self):
+        """Test that text segmented by the LLM stage is chunked from its sentence index."""
+        text = join_segmented(
+            [segment_text("A short sentence. Another one."), segment_text("A new paragraph.")]
+        )
+        with patch("narratorx.utils.sent_tokenize") as mock_sent_tokenize:
+            chunks = split_text_into_chunks(text, 50)
+        mock_sent_tokenize.assert_not_called()
+
+        self.assertEqual(chunks, ["A short sentence.", "Another one.", "A new paragraph."])
+
+    def test_plain_text(self):
+        """Test that plain text is segmented and overlong sentences are split."""
+        chunks = split_text_into_chunks("Tiny. This sentence is rather long, it has a clause.", 30)
+        self.assertEqual(chunks, ["Tiny.", "This sentence is rather long,", "it has a clause."])
+
+
+class TestSplitLocally(unittest.TestCase):
+
+    def test_clause_punctuation_first(self):
+        """Test that clause punctuation is preferred over conjunctions and whitespace."""
+        text = "The ship left the harbour, and the crew sang until the lights faded"
+        self.assertEqual(
+            split_locally(text, 40, "en"),
+            ["The ship left the harbour,", "and the crew sang until the lights faded"],
+        )
+
+    def test_conjunctions_start_the_next_piece(self):
+        """Test that language conjunctions are used when there is no clause punctuation."""
+        text = "Gemi limandan ayrıldı ve tayfalar sabaha kadar şarkı söyledi"
+        self.assertEqual(
+            split_locally(text, 40, "tr"),
+            ["Gemi limandan ayrıldı", "ve tayfalar sabaha kadar şarkı söyledi"],
+        )
+
+    def test_whitespace_nearest_the_middle(self):
+        """Test that text without breakpoints is cut at the space nearest its middle."""
+        text = "alpha beta gamma delta epsilon zeta"
+        self.assertEqual(split_locally(text, 30, "en"), ["alpha beta gamma", "delta epsilon zeta"])
+
+    def test_hard_limit(self):
+        """Test that text without any breakpoint or whitespace is cut at the limit."""
+        self.assertEqual(split_locally("x" * 25, 10, "en"), ["x" * 10, "x" * 10, "x" * 5])
+
+    def test_all_pieces_fit(self):
+        """Test that every piece fits and the words are kept in order."""
+        text = " ".join(f"word{i}, and more" if i % 7 == 0 else f"word{i}" for i in range(500))
+        pieces = split_locally(text, 50, "en")
+
+        self.assertTrue(all(0 < len(piece) <= 50 for piece in pieces))
+        self.assertEqual(" ".join(pieces).split(), text.split())
 
 
 if __name__ == "__main__":
@@ -1,8 +1,19 @@
 # tests/test_utils.py
 
 import unittest
+from unittest.mock import patch
 
-from narratorx.utils import split_text_into_chunks
+from narratorx import utils
+from narratorx.utils import (
+    download_nltk_data,
+    ensure_nltk_data,
+    join_segmented,
+    pack_sentences,
+    pack_text,
+    resegment,
+    segment_text,
+    split_text_into_chunks,
+)
 
 
 class TestSplitTextIntoChunks(unittest.TestCase):
@@ -60,5 +71,102 @@ class TestSplitTextIntoChunks(unittest.TestCase):
             split_text_into_chunks(text, max_chars=self.max_chars, model_name=self.model_name)
 
 
+class TestNltkData(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch.object(utils, "_nltk_data_ready", False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch("nltk.download")
+    @patch("nltk.data.find", side_effect=LookupError)
+    def test_missing_data_points_to_setup(self, _, mock_download):
+        """Test that missing tokenizer data raises an error naming the setup command."""
+        with self.assertRaisesRegex(RuntimeError, "narratorx-setup"):
+            ensure_nltk_data()
+        mock_download.assert_not_called()
+
+    @patch("nltk.download", return_value=True)
+    def test_download(self, mock_download):
+        """Test that the setup download fetches the sentence tokenizer data."""
+        download_nltk_data()
+        mock_download.assert_called_once_with("punkt_tab", quiet=True, raise_on_error=True)
+
+
+class TestSegmentation(unittest.TestCase):
+
+    def setUp(self):
+        self.text = "First sentence here. Second one follows.\n  Third is on a new line.  "
+
+    def test_sentence_offsets(self):
+        """Test that sentences are recorded as offsets into the text, by paragraph."""
+        segmented = segment_text(self.text)
+
+        self.assertEqual(
+            segmented.sentence_texts(),
+            ["First sentence here.", "Second one follows.", "Third is on a new line."],
+        )
+        self.assertEqual([s.paragraph for s in segmented.sentences], [0, 0, 1])
+        self.assertEqual(segmented, self.text)
+
+    def test_join_shifts_offsets(self):
+        """Test that joined texts keep their sentences without being tokenized again."""
+        parts = [segment_text("One. Two."), segment_text("Three.")]
+        with patch("narratorx.utils.sent_tokenize") as mock_sent_tokenize:
+            joined = join_segmented(parts)
+        mock_sent_tokenize.assert_not_called()
+
+        self.assertEqual(joined, "One. Two.\n\nThree.")
+        self.assertEqual(joined.sentence_texts(), ["One.", "Two.", "Three."])
+        self.assertEqual(joined.sentences[-1].paragraph, 2)
+
+    def test_pack_sentences(self):
+        """Test that sentences are packed into windows and overlong ones split at whitespace."""
+        segmented = segment_text("Short one. Another short. " + "word " * 20)
+        chunks = pack_sentences(segmented, 30)
+
+        self.assertEqual(chunks[0], "Short one. Another short.")
+        self.assertEqual(chunks[0].sentence_texts(), ["Short one.", "Another short."])
+        self.assertTrue(all(len(chunk) <= 30 for chunk in chunks))
+        self.assertEqual(" ".join(chunks).split(), segmented.split())
+
+    def test_pack_sentences_prefers_paragraph_ends(self):
+        """Test that a chunk full enough ends where a paragraph does, not mid-paragraph."""
+        segmented = segment_text(
+            "First line of a paragraph that\nwraps here. End one.\n"
+            "Next paragraph starts. And goes on and on."
+        )
+
+        greedy = pack_sentences(segmented, 80)
+        chunks = pack_sentences(segmented, 80, paragraph_fill=0.5)
+
+        self.assertTrue(greedy[0].endswith("Next paragraph starts."))
+        self.assertTrue(chunks[0].endswith("End one."))
+        self.assertEqual(chunks[1], "Next paragraph starts. And goes on and on.")
+
+    @patch("narratorx.utils.token_counter")
+    def test_pack_text_by_tokens(self, mock_token_counter):
+        """Test that chunks stay within the token budget, also where tokens are denser."""
+        # One token per word, and two more for every "X"
+        mock_token_counter.side_effect = lambda model, text: len(text.split()) + 2 * text.count("X")
+        sentences = [f"Sentence number {i} is here." for i in range(12)]
+        sentences[5] = "Heavy X X X sentence."
+        segmented = segment_text(" ".join(sentences))
+
+        chunks = pack_text(segmented, max_tokens=12, model_name="gpt-4o")
+
+        self.assertTrue(all(mock_token_counter.side_effect(None, c) <= 12 for c in chunks))
+        self.assertEqual(" ".join(chunks).split(), segmented.split())
+        self.assertLessEqual(len(chunks), 8)
+
+    def test_resegment_reuses_unchanged_text(self):
+        """Test that text left unchanged keeps its index and edited text is segmented again."""
+        source = segment_text("Some text. More text.")
+        self.assertIs(resegment("Some text. More text.", source), source)
+        self.assertEqual(
+            resegment("Some text, more text.", source).sentence_texts(), ["Some text, more text."]
+        )
+
+
 if __name__ == "__main__":
     unittest.main()
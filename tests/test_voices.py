@@ -0,0 +1,75 @@
+# tests/test_voices.py
+
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+import torch
+
+from narratorx.voices import VoiceRegistry, voice_id
+
+
+class TestVoiceRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.wav_path = os.path.join(self.tmp_dir.name, "narrator.wav")
+        with open(self.wav_path, "wb") as f:
+            f.write(b"RIFF reference audio")
+
+        self.tts_model = MagicMock()
+        self.xtts = self.tts_model.synthesizer.tts_model
+        self.xtts.speaker_manager.speakers = {
+            "Asya Anara": {
+                "gpt_cond_latent": torch.ones(1, 32, 1024),
+                "speaker_embedding": torch.ones(1, 512, 1),
+            }
+        }
+        self.xtts.get_conditioning_latents.return_value = (
+            torch.full((1, 32, 1024), 0.5),
+            torch.full((1, 512, 1), 0.25),
+        )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_builtin_speaker(self):
+        """Test that built-in speakers come from the model's speaker manager."""
+        registry = VoiceRegistry()
+        gpt_cond_latent, speaker_embedding = registry.get(self.tts_model, "Asya Anara")
+
+        self.assertTrue(torch.equal(gpt_cond_latent, torch.ones(1, 32, 1024)))
+        self.assertEqual(speaker_embedding.shape, (1, 512, 1))
+        self.xtts.get_conditioning_latents.assert_not_called()
+
+    def test_unknown_voice(self):
+        """Test that a voice that is neither a built-in speaker nor a file is rejected."""
+        with self.assertRaises(ValueError):
+            VoiceRegistry().get(self.tts_model, "Nobody")
+
+    def test_reference_wav_is_encoded_once_and_persisted(self):
+        """Test that a reference recording is encoded once and reloaded from disk later."""
+        path = os.path.join(self.tmp_dir.name, "voices")
+        registry = VoiceRegistry(path, model_name="xtts")
+        first = registry.get(self.tts_model, self.wav_path)
+        registry.get(self.tts_model, self.wav_path)
+        self.xtts.get_conditioning_latents.assert_called_once()
+        self.assertEqual(len(os.listdir(path)), 1)
+
+        reloaded = VoiceRegistry(path, model_name="xtts").get(self.tts_model, self.wav_path)
+        self.xtts.get_conditioning_latents.assert_called_once()
+        self.assertTrue(torch.equal(first[0], reloaded[0]))
+        self.assertTrue(torch.equal(first[1], reloaded[1]))
+
+    def test_voice_id_follows_file_content(self):
+        """Test that reference recordings are identified by content and speakers by name."""
+        self.assertEqual(voice_id("Asya Anara"), "Asya Anara")
+        before = voice_id(self.wav_path)
+        with open(self.wav_path, "ab") as f:
+            f.write(b" re-recorded")
+        self.assertNotEqual(voice_id(self.wav_path), before)
+
+
+if __name__ == "__main__":
+    unittest.main()